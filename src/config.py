@@ -1,7 +1,10 @@
+import functools
 import yaml
 import pathlib
 
 class Config:
+    """Settings loaded from the YAML config file. Instances are read-only once loaded."""
+
     def __init__(self, config_file: str):
         # Load YAML data from the config file
         with open(config_file, 'r') as file:
@@ -21,12 +24,29 @@ class Config:
         self.timeout = self.llm_model.get('timeout', None)
         self.max_retries = self.llm_model.get('max_tokens', 2)
         self.multi_turn = self.llm_model.get('multi_turn', True)
+        self.context_window = self.llm_model.get('context_window', None)  # Tokens; None looks the model up
+        self.context_token_budget = self.llm_model.get('context_token_budget', None)  # Cap; None fills the context window
+        self.intent_router = self.llm_model.get('intent_router', {})
+        self.intent_router_enabled = self.intent_router.get('enabled', False)
+        self.intent_router_threshold = self.intent_router.get('threshold', 0.6)  # Minimum cosine similarity to an example
+        self.intent_router_margin = self.intent_router.get('margin', 0.05)  # Lead required over the other intents
+        self.answer_cache = self.llm_model.get('answer_cache', {})
+        self.answer_cache_enabled = self.answer_cache.get('enabled', False)
+        self.answer_cache_threshold = self.answer_cache.get('similarity_threshold', 0.95)  # Cosine similarity
+        self.answer_cache_max_entries = self.answer_cache.get('max_entries', 1000)
+        self.answer_cache_ttl = self.answer_cache.get('ttl_seconds', 86400)
+        self.answer_cache_persist = self.answer_cache.get('persist', False)
+        self.answer_cache_file_name = self.answer_cache.get('file_name', "answer_cache.sqlite")
 
 
         # Embedding settings
         self.embedding = config_data.get('embedding', {})
         self.embedding_provider = self.embedding.get('provider', 'huggingface')
         self.embedding_model_name = self.embedding.get('model_name', 'sentence-transformers/all-mpnet-base-v2')
+        self.embedding_cache = self.embedding.get('cache', {})
+        self.embedding_cache_enabled = self.embedding_cache.get('enabled', False)
+        self.embedding_cache_file_name = self.embedding_cache.get('file_name', "embedding_cache.sqlite")
+        self.embedding_cache_max_entries = self.embedding_cache.get('max_entries', 200000)
 
         # Splitter settings
         self.splitter = config_data.get('splitter', {})
@@ -34,11 +54,38 @@ class Config:
         self.chunk_size = self.splitter.get('chunk_size', 1000)
         self.chunk_overlap = self.splitter.get('chunk_overlap', 200)
 
+        # PDF processing settings
+        self.pdf_processing = config_data.get('pdf_processing', {})
+        self.num_workers = self.pdf_processing.get('num_workers', 1)  # 1 keeps the serial path
+        self.incremental = self.pdf_processing.get('incremental', False)
+        self.vector_ids_file_name = self.pdf_processing.get('manifest_file', "vectorDB_ids.json")
+        self.embed_batch_size = self.pdf_processing.get('embed_batch_size', 64)
+        self.embed_buffer_size = self.pdf_processing.get('embed_buffer_size', 1024)  # Chunks buffered across files
+        self.streaming = self.pdf_processing.get('streaming', False)
+        self.max_memory_mb = self.pdf_processing.get('max_memory_mb', 256)
+        self.queue_size = self.pdf_processing.get('queue_size', 256)
+        self.dedup = self.pdf_processing.get('dedup', {})
+        self.deduplicate = self.dedup.get('enabled', False)
+        self.dedup_max_distance = self.dedup.get('max_distance', 7)  # SimHash bits that may differ
+        self.dedup_shingle_size = self.dedup.get('shingle_size', 4)  # Words per shingle
+        self.dedup_report_file_name = self.dedup.get('report_file', "dedup_report.json")
+
         # Vector store settings
         self.vector_store = config_data.get('vector_store', {})
-        self.vector_store_type = self.vector_store.get('type', 'faiss')
+        self.vector_store_type = self.vector_store.get('type', 'faiss')  # faiss, numpy or in_memory
         self.vector_store_file_name = self.vector_store.get('file_name', 'faiss_index')
         self.vector_store_index_name = self.vector_store.get('index_name', 'index')
+        self.docstore_type = self.vector_store.get('docstore', 'pickle')  # pickle or sqlite
+        self.build_lexical_index = self.vector_store.get('lexical_index', False)
+        self.build_metadata_index = self.vector_store.get('metadata_index', False)
+        self.vector_index_type = self.vector_store.get('index_type', 'flat')  # flat, hnsw, ivf_flat, ivf_pq, sq8 or pca
+        self.hnsw_m = self.vector_store.get('hnsw_m', 32)
+        self.ef_construction = self.vector_store.get('ef_construction', 40)
+        self.nlist = self.vector_store.get('nlist', 256)
+        self.pq_m = self.vector_store.get('pq_m', 16)
+        self.pq_nbits = self.vector_store.get('pq_nbits', 8)
+        self.pca_dim = self.vector_store.get('pca_dim', 128)
+        self.numpy_dtype = self.vector_store.get('numpy_dtype', 'float32')  # float32 or float16
 
         # Data file paths
         self.data_files = config_data.get('data_files', {})
@@ -51,12 +98,47 @@ class Config:
         self.num_documents = self.document_search.get('num_documents', 5)  # Default to retrieving top 5 documents
         self.keep_with_score = self.document_search.get('keep_with_score', None)
         self.sim_search_type = self.document_search.get("search_type", "score")
+        self.ef_search = self.document_search.get('ef_search', 64)  # HNSW search depth
+        self.nprobe = self.document_search.get('nprobe', 8)  # IVF lists visited per query
+        self.rescore_factor = self.document_search.get('rescore_factor', 4)  # PCA index shortlist = k * rescore_factor
+        self.hybrid_fetch_k = self.document_search.get('hybrid_fetch_k', 20)  # Candidates per retriever before fusion
+        self.rrf_k = self.document_search.get('rrf_k', 60)
+        self.search_batch_size = self.document_search.get('batch_size', 64)  # Queries per batch in --searchdoc --queries
+        self.retrieval_cache = self.document_search.get('cache', {})
+        self.retrieval_cache_enabled = self.retrieval_cache.get('enabled', False)
+        self.retrieval_cache_max_size = self.retrieval_cache.get('max_size', 512)
+        self.retrieval_cache_ttl = self.retrieval_cache.get('ttl_seconds', 3600)
+        self.speculative_retrieval = self.document_search.get('speculative', {})
+        self.speculative_retrieval_enabled = self.speculative_retrieval.get('enabled', False)
+        self.speculative_min_overlap = self.speculative_retrieval.get('min_overlap', 0.5)  # Jaccard overlap of the two queries
+        self.speculative_max_workers = self.speculative_retrieval.get('max_workers', 4)
+        self.rerank = self.document_search.get('rerank', {})
+        self.rerank_enabled = self.rerank.get('enabled', False)
+        self.rerank_model_name = self.rerank.get('model_name', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+        self.rerank_fetch_k = self.rerank.get('fetch_k', 20)  # Candidates scored by the cross-encoder
+        self.rerank_top_n = self.rerank.get('top_n', 3)  # Chunks kept for the prompt
+        self.rerank_batch_size = self.rerank.get('batch_size', 16)
+        self.rerank_time_budget_ms = self.rerank.get('time_budget_ms', 200)
+        self.rerank_max_length = self.rerank.get('max_length', 512)
 
         # Scraper settings
         self.scraper = config_data.get('scraper', {})
         self.base_url = self.scraper.get("base_url", "https://kb.uconn.edu")
         self.copy_scraper_data_to_data = self.scraper.get("copy_to_data", True)
+        self.crawl_mode = self.scraper.get("crawl_mode", "sequential")  # sequential or concurrent
+        self.scraper_output_format = self.scraper.get("output_format", "pdf")  # pdf or markdown
+        self.scraper_fetcher = self.scraper.get("fetcher", "selenium")  # selenium (PDF) or http (HTML)
+        self.scraper_num_workers = self.scraper.get("num_workers", 8)
+        self.scraper_num_sessions = self.scraper.get("num_sessions", 4)
+        self.scraper_per_host_limit = self.scraper.get("per_host_limit", 4)
+
 
+        # Serving settings
+        self.serving = config_data.get('serving', {})
+        self.blocking_workers = self.serving.get('blocking_workers', 16)  # Threads for embedding and search in async runs
+        self.api_host = self.serving.get('host', '127.0.0.1')
+        self.api_port = self.serving.get('port', 8000)
+        self.api_workers = self.serving.get('workers', 1)  # Processes, each with its own preloaded pipeline
 
         # Logging settings
         self.logging = config_data.get('logging', {})
@@ -64,14 +146,22 @@ class Config:
         self.log_file = self.logging.get('log_file', 'huskybot.log')
         self.max_log_size = self.logging.get('max_log_size', '10MB')
 
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"Config is immutable, cannot set '{name}'")
+        super().__setattr__(name, value)
+
     # def __str__(self):
     #     return (f"App: {self.app_name}, Version: {self.version}, Debug: {self.debug}, "
     #             f"Model: {self.llm_model_name}, Provider: {self.llm_model_provider}, "
     #             f"Embedding Model: {self.embedding_model_name}, Vector Store: {self.vector_store_type}")
 
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def default_config():
-        # Path to the default configuration file
+        # Path to the default configuration file, parsed once per process
         file = '../config/config.yaml'
         return Config(file)  # Path to the default config file
 
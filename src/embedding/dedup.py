@@ -0,0 +1,115 @@
+import hashlib
+from collections import defaultdict
+import numpy as np
+from embedding.lexical_index import tokenize
+from utils import get_logger
+
+logger = get_logger()
+
+SIMHASH_BITS = 64
+
+
+def get_shingles(text, shingle_size=4):
+    """Returns the overlapping word n-grams of the normalized text (the whole text if it is shorter)."""
+    tokens = tokenize(text)
+    if len(tokens) <= shingle_size:
+        return [" ".join(tokens)]
+    return [" ".join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)]
+
+
+def simhash(text, shingle_size=4):
+    """64-bit SimHash of the text's shingles. Near-identical texts differ in only a few bits."""
+    digests = b"".join(
+        hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in get_shingles(text, shingle_size)
+    )
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(-1, SIMHASH_BITS)
+    # A bit of the fingerprint is set when most shingle hashes have it set.
+    votes = bits.sum(axis=0) * 2 > len(bits)
+    return int.from_bytes(np.packbits(votes).tobytes(), "big")
+
+
+class NearDuplicateDetector:
+    """
+    Finds chunks whose SimHash is within `max_distance` bits of an already kept chunk.
+
+    Fingerprints are split into `max_distance + 1` bands: two fingerprints that differ in at
+    most `max_distance` bits agree exactly on at least one band, so only the chunks sharing a
+    band are compared. `sources` collects the URLs of every chunk collapsed into a kept one.
+    """
+
+    def __init__(self, max_distance=7, shingle_size=4):
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        self.num_bands = max_distance + 1
+        self.band_bits = -(-SIMHASH_BITS // self.num_bands)
+        self.bands = [defaultdict(list) for _ in range(self.num_bands)]
+        self.fingerprints = {}
+        self.sources = {}
+        # Dropped chunk ID -> ID of the kept chunk it was collapsed into, and the URL it came from.
+        self.duplicate_of = {}
+        self.duplicate_sources = {}
+        self.duplicate_counts = defaultdict(int)
+        self.chunks_seen = 0
+        self.chunks_dropped = 0
+        self.bytes_dropped = 0
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [fingerprint >> (band * self.band_bits) & mask for band in range(self.num_bands)]
+
+    def find(self, fingerprint):
+        """Returns the ID of a kept chunk close enough to the fingerprint, or None."""
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            for doc_id in self.bands[band].get(key, ()):
+                if bin(fingerprint ^ self.fingerprints[doc_id]).count("1") <= self.max_distance:
+                    return doc_id
+        return None
+
+    def filter(self, chunks):
+        """Returns the (id, document) pairs that are not near-duplicates of a chunk seen before."""
+        kept = []
+        for doc_id, doc in chunks:
+            self.chunks_seen += 1
+            url = doc.metadata.get("url")
+            fingerprint = simhash(doc.page_content, self.shingle_size)
+            duplicate_of = self.find(fingerprint)
+
+            if duplicate_of is None:
+                self.fingerprints[doc_id] = fingerprint
+                for band, key in enumerate(self._band_keys(fingerprint)):
+                    self.bands[band][key].append(doc_id)
+                self.sources[doc_id] = [url] if url else []
+                kept.append((doc_id, doc))
+                continue
+
+            self.chunks_dropped += 1
+            self.duplicate_of[doc_id] = duplicate_of
+            if url:
+                self.duplicate_sources[doc_id] = url
+            self.bytes_dropped += len(doc.page_content.encode("utf-8"))
+            self.duplicate_counts[duplicate_of] += 1
+            if url and url not in self.sources[duplicate_of]:
+                self.sources[duplicate_of].append(url)
+        return kept
+
+    def get_collapsed_sources(self):
+        """Returns {kept ID: source URLs} for the chunks that absorbed at least one duplicate."""
+        return {doc_id: self.sources[doc_id] for doc_id in self.duplicate_counts}
+
+    def report(self, vector_dim=None, top_n=20):
+        """Summary of how much the index shrank, with the most duplicated chunks."""
+        report = {
+            "chunks_seen": self.chunks_seen,
+            "chunks_kept": self.chunks_seen - self.chunks_dropped,
+            "chunks_collapsed": self.chunks_dropped,
+            "shrink_ratio": round(self.chunks_dropped / self.chunks_seen, 4) if self.chunks_seen else 0.0,
+            "text_bytes_saved": self.bytes_dropped,
+        }
+        if vector_dim is not None:
+            report["vector_bytes_saved"] = self.chunks_dropped * vector_dim * 4
+        most_duplicated = sorted(self.duplicate_counts.items(), key=lambda item: item[1], reverse=True)[:top_n]
+        report["most_duplicated"] = [
+            {"id": doc_id, "duplicates": count, "urls": self.sources[doc_id]}
+            for doc_id, count in most_duplicated
+        ]
+        return report
@@ -1,3 +1,6 @@
+import pathlib
+import yaml
+from typing import Iterator
 from langchain_community.document_loaders import PyMuPDFLoader
 from langchain_core.documents import Document
 from utils import get_logger
@@ -10,9 +13,49 @@ def get_default_metadata_keys():
 
 
 def get_defaultloader(file, mode):
+    if pathlib.Path(file).suffix.lower() == ".md":
+        return MarkdownFileLoader(file)
     return PyMuPDFLoader(file, mode=mode)
 
 
+def get_file_metadata(file, file_url_map):
+    """
+    Returns the metadata attached to every chunk of a file, or None if the file cannot be linked to a URL.
+    Markdown captures carry their URL in the front matter, so they do not need a URL mapping.
+    """
+    if file.stem in file_url_map:
+        return {
+            "file_name": file.name,
+            "url": file_url_map[file.stem]
+            }
+    if file.suffix.lower() == ".md":
+        return {"file_name": file.name}
+
+    logger.warning(f"No URL mapping found for file: {file.name}")
+    return None
+
+
+class MarkdownFileLoader:
+    """Loads a Markdown page capture as a single document, with its YAML front matter as metadata."""
+
+    def __init__(self, file_path):
+        self.file_path = str(file_path)
+
+    def load(self) -> list[Document]:
+        return list(self.lazy_load())
+
+    def lazy_load(self) -> Iterator[Document]:
+        text = pathlib.Path(self.file_path).read_text(encoding="utf-8")
+        metadata = {}
+        if text.startswith("---\n"):
+            front_matter, separator, body = text[4:].partition("\n---\n")
+            if separator:
+                metadata = yaml.safe_load(front_matter) or {}
+                text = body
+        metadata["source"] = self.file_path
+        yield Document(page_content=text.strip(), metadata=metadata)
+
+
 class PDFDocLoader:
 
     def __init__(self, file_path, loader=None, metadata_keys=None, new_metadata=None, mode="page"):
@@ -30,13 +73,23 @@ class PDFDocLoader:
         loader = self.loader
         docs = loader.load()
         for doc in docs:
-            metadata = dict()
-            if self.metadata_keys:
-                metadata = {key: doc.metadata[key] for key in self.metadata_keys if key in doc.metadata}
-            metadata.update(self.new_metadata)
-            if len(metadata):
-                doc.metadata = metadata
+            self.update_metadata(doc)
                 
         logger.info("Document loading and metadata update completed")
         return docs
 
+    def lazy_load(self) -> Iterator[Document]:
+        """Yields documents one at a time (one per page in "page" mode) without materializing the file."""
+        logger.info(f"Streaming documents from file: {self.file_path}")
+        for doc in self.loader.lazy_load():
+            self.update_metadata(doc)
+            yield doc
+
+    def update_metadata(self, doc):
+        metadata = dict()
+        if self.metadata_keys:
+            metadata = {key: doc.metadata[key] for key in self.metadata_keys if key in doc.metadata}
+        metadata.update(self.new_metadata)
+        if len(metadata):
+            doc.metadata = metadata
+
@@ -0,0 +1,129 @@
+import json
+import sqlite3
+import threading
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+from utils import get_logger
+
+logger = get_logger()
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """
+    Docstore backed by a SQLite file holding chunk text and metadata.
+
+    Documents are read lazily by ID, so only the top-k hits of a search are ever
+    materialized. Changes stay in an open transaction until `commit`. Ingestion writes to a
+    copy that replaces the saved file, so the file keeps SQLite's default rollback journal:
+    processes reading the old file keep a consistent snapshot, and there are no WAL files
+    shared by name between the old and the new file.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, page_content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS vector_ids (position INTEGER PRIMARY KEY, doc_id TEXT NOT NULL)"
+        )
+        self._connection.commit()
+
+    def search(self, search):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT page_content, metadata FROM documents WHERE id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def add(self, texts):
+        with self._lock:
+            existing = self._connection.execute(
+                f"SELECT id FROM documents WHERE id IN ({','.join('?' * len(texts))})", list(texts)
+            ).fetchall() if texts else []
+            if existing:
+                raise ValueError(f"Tried to add ids that already exist: {[row[0] for row in existing]}")
+            self._connection.executemany(
+                "INSERT INTO documents (id, page_content, metadata) VALUES (?, ?, ?)",
+                [(doc_id, doc.page_content, json.dumps(doc.metadata)) for doc_id, doc in texts.items()],
+            )
+
+    def update_metadata(self, metadata_by_id):
+        """Replaces the metadata of existing documents, given as {id: metadata}."""
+        with self._lock:
+            self._connection.executemany(
+                "UPDATE documents SET metadata = ? WHERE id = ?",
+                [(json.dumps(metadata), doc_id) for doc_id, metadata in metadata_by_id.items()],
+            )
+
+    def delete(self, ids):
+        with self._lock:
+            self._connection.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in ids])
+
+    def prune(self, live_ids):
+        """Deletes documents whose ID is not in `live_ids`. Returns the number of deleted rows."""
+        with self._lock:
+            stored_ids = [row[0] for row in self._connection.execute("SELECT id FROM documents")]
+        orphan_ids = [doc_id for doc_id in stored_ids if doc_id not in live_ids]
+        self.delete(orphan_ids)
+        return len(orphan_ids)
+
+    def iter_documents(self, batch_size=1000):
+        """Yields every stored document without loading the whole table."""
+        with self._lock:
+            cursor = self._connection.execute("SELECT id, page_content, metadata FROM documents")
+            rows = cursor.fetchmany(batch_size)
+        while rows:
+            for doc_id, page_content, metadata in rows:
+                yield Document(id=doc_id, page_content=page_content, metadata=json.loads(metadata))
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+
+    def load_index_to_docstore_id(self):
+        with self._lock:
+            rows = self._connection.execute("SELECT position, doc_id FROM vector_ids").fetchall()
+        return dict(rows)
+
+    def save_index_to_docstore_id(self, index_to_docstore_id):
+        with self._lock:
+            self._connection.execute("DELETE FROM vector_ids")
+            self._connection.executemany(
+                "INSERT INTO vector_ids (position, doc_id) VALUES (?, ?)", list(index_to_docstore_id.items())
+            )
+
+    def commit(self):
+        with self._lock:
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def copy_to(self, db_path):
+        """Copies the committed content into a new file at `db_path` and opens it."""
+        copy = SQLiteDocstore(db_path)
+        with self._lock:
+            self._connection.backup(copy._connection)
+        # Files saved by earlier versions were in WAL mode, which the backup copies.
+        copy._connection.execute("PRAGMA journal_mode=DELETE")
+        return copy
+
+    @staticmethod
+    def from_documents(db_path, documents, index_to_docstore_id):
+        """Creates a docstore file from an iterable of (id, document) pairs."""
+        docstore = SQLiteDocstore(db_path)
+        batch = {}
+        for doc_id, doc in documents:
+            batch[doc_id] = doc
+            if len(batch) >= 1000:
+                docstore.add(batch)
+                batch = {}
+        docstore.add(batch)
+        docstore.save_index_to_docstore_id(index_to_docstore_id)
+        docstore.commit()
+        logger.debug(f"Wrote {len(index_to_docstore_id)} documents to docstore {db_path}")
+        return docstore
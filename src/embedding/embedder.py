@@ -3,16 +3,37 @@ from embedding.embedding_factory import EmbeddingFactory
 from embedding.vector_store_factory import VectorStoreFactory
 from embedding.splitter_factory import SplitterFactory
 from utils import get_logger
+import hashlib
 import pathlib
 
 logger = get_logger()
 
 
+def get_chunk_id(file_name, chunk_index, content):
+    """Returns a deterministic vector ID derived from the file name, chunk position and chunk content."""
+    digest = hashlib.sha256(f"{file_name}\x00{chunk_index}\x00{content}".encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def estimate_token_length(text):
+    """Cheap token count estimate used to bucket chunks of similar length together."""
+    return len(text.split())
+
+
+class VectorStoreWriteError(Exception):
+    """Raised when a buffered batch could not be embedded or written to the vector store."""
+
+
 class PDFToVectorDB:
-    def __init__(self, embedding=None, splitter=None, vector_store=None, **kwargs):
+    def __init__(self, embedding=None, splitter=None, vector_store=None, batch_size=64, buffer_size=1024, deduplicator=None, **kwargs):
         logger.info("Initializing PDFToVectorDB")
 
         self.kwargs = kwargs
+        self.batch_size = batch_size
+        self.buffer_size = max(buffer_size, batch_size)
+        self.pending = []
+        # Optional NearDuplicateDetector; near-duplicate chunks are dropped before embedding.
+        self.deduplicator = deduplicator
 
         if embedding is None:
             logger.debug("No embedding provided. Fetching from config.")
@@ -61,12 +82,63 @@ class PDFToVectorDB:
         return self.splitter.split_documents(documents)
 
     def add_documents_to_vector_store(self, documents, file_name):
-        """Add the split documents to the vector store."""
+        """
+        Queue the split documents for the vector store under content-derived IDs.
+        Chunks are buffered across files and written once `buffer_size` chunks are pending;
+        call `flush` after the last file to write the remainder.
+        """
         
         logger.debug(f"Adding documents to vector store for file: {file_name}")
-        ids = self.vector_store.add_documents(documents)
-        logger.debug(f"Documents added with IDs: {ids}")
+        ids = [get_chunk_id(file_name, idx, doc.page_content) for idx, doc in enumerate(documents)]
+        self.pending.extend(zip(ids, documents))
+        if len(self.pending) >= self.buffer_size:
+            self.flush()
+        logger.debug(f"Documents queued with IDs: {ids}")
         return ids
 
-
-
+    def flush(self):
+        """Write every pending chunk to the vector store."""
+        pending, self.pending = self.pending, []
+        self.write_chunks(pending)
+
+    def write_chunks(self, chunks):
+        """
+        Embed (id, document) pairs in fixed-size batches of similar token length and
+        bulk-insert every batch into the vector store with a single call.
+        """
+        if self.deduplicator is not None:
+            chunks = self.deduplicator.filter(chunks)
+        if not chunks:
+            return
+
+        chunks = sorted(chunks, key=lambda item: estimate_token_length(item[1].page_content))
+        logger.debug(f"Writing {len(chunks)} chunks in batches of {self.batch_size}")
+
+        try:
+            for start in range(0, len(chunks), self.batch_size):
+                batch = chunks[start:start + self.batch_size]
+                ids = [doc_id for doc_id, _ in batch]
+                documents = [doc for _, doc in batch]
+
+                if not hasattr(self.vector_store, "add_embeddings"):
+                    self.vector_store.add_documents(documents, ids=ids)
+                    continue
+
+                texts = [doc.page_content for doc in documents]
+                embeddings = self.embedding.embed_documents(texts)
+                self.vector_store.add_embeddings(
+                    zip(texts, embeddings),
+                    metadatas=[doc.metadata for doc in documents],
+                    ids=ids,
+                )
+        except Exception as e:
+            logger.error(f"Failed to write {len(chunks)} buffered chunks to the vector store: {e}")
+            raise VectorStoreWriteError(str(e)) from e
+
+    def apply_collapsed_sources(self):
+        """Stores the source URLs of the collapsed duplicates in the `urls` metadata of the chunks that were kept."""
+        if self.deduplicator is None:
+            return
+        collapsed_sources = self.deduplicator.get_collapsed_sources()
+        VectorStoreFactory.update_metadata(self.vector_store, {doc_id: {"urls": urls} for doc_id, urls in collapsed_sources.items()})
+        logger.info(f"Collapsed {self.deduplicator.chunks_dropped} near-duplicate chunks into {len(collapsed_sources)} chunks.")
@@ -0,0 +1,172 @@
+import array
+import hashlib
+import sqlite3
+import threading
+import time
+from langchain_core.embeddings import Embeddings
+from utils import get_logger
+
+logger = get_logger()
+
+
+def normalize_text(text):
+    """Collapses whitespace so that formatting-only differences share a cache entry."""
+    return " ".join(text.split())
+
+
+def get_text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def embed_queries(embedding, texts):
+    """
+    Embeds several search queries as queries. Models may embed queries differently from
+    documents (instruction prefixes, asymmetric encoders), so `embed_documents` is not used;
+    a model with its own batched `embed_queries` is called once, others once per query.
+    """
+    if hasattr(embedding, "embed_queries"):
+        return embedding.embed_queries(texts)
+    return [embedding.embed_query(text) for text in texts]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps any embedding model with a persistent SQLite cache keyed by
+    (model name, kind, normalized text hash). Least recently used entries are
+    evicted once the cache holds more than `max_entries` vectors.
+
+    Reads do not write: access times of hits are buffered and written in one transaction
+    with the next store, or once `access_flush_size` of them are pending. The number of
+    rows is counted once at open and then kept up to date by this process.
+    """
+
+    def __init__(self, embedding, model_name, cache_path, max_entries=200000, access_flush_size=1000):
+        self.embedding = embedding
+        self.model_name = model_name
+        self.cache_path = str(cache_path)
+        self.max_entries = max_entries
+        self.access_flush_size = access_flush_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (kind, text hash) -> last access time not yet written.
+        self._pending_access = {}
+
+        self._connection = sqlite3.connect(self.cache_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " PRIMARY KEY (model, kind, text_hash))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self._connection.commit()
+        self._size = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Embedding cache opened at {self.cache_path} for model {self.model_name}")
+
+    def embed_documents(self, texts):
+        return self._get_or_compute(texts, "document", self.embedding.embed_documents)
+
+    def embed_query(self, text):
+        return self._get_or_compute([text], "query", lambda missing: [self.embedding.embed_query(missing[0])])[0]
+
+    def embed_queries(self, texts):
+        return self._get_or_compute(texts, "query", lambda missing: embed_queries(self.embedding, missing))
+
+    def stats(self):
+        """Returns hit/miss counters and the number of cached vectors."""
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, self._size
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "size": size,
+        }
+
+    def flush(self):
+        """Writes the buffered access times."""
+        with self._lock:
+            self._flush_access()
+            self._connection.commit()
+
+    def _get_or_compute(self, texts, kind, compute):
+        hashes = [get_text_hash(text) for text in texts]
+        cached = self._lookup(kind, set(hashes))
+
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            vectors = compute(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(kind, computed)
+            cached.update(computed)
+
+        return [[float(value) for value in cached[text_hash]] for text_hash in hashes]
+
+    def _lookup(self, kind, hashes):
+        found = {}
+        hashes = list(hashes)
+        now = time.time()
+        with self._lock:
+            # SQLite limits the number of bound parameters, so look up in slices.
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND kind = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, kind, *batch],
+                ).fetchall()
+                for text_hash, vector in rows:
+                    found[text_hash] = array.array("f", vector)
+                    self._pending_access[(kind, text_hash)] = now
+            if len(self._pending_access) >= self.access_flush_size:
+                self._flush_access()
+                self._connection.commit()
+        return found
+
+    def _flush_access(self):
+        if not self._pending_access:
+            return
+        self._connection.executemany(
+            "UPDATE embeddings SET last_access = ? WHERE model = ? AND kind = ? AND text_hash = ?",
+            [(last_access, self.model_name, kind, text_hash)
+             for (kind, text_hash), last_access in self._pending_access.items()],
+        )
+        self._pending_access.clear()
+
+    def _store(self, kind, vectors):
+        now = time.time()
+        with self._lock:
+            # A vector is a function of (model, kind, text), so a row written meanwhile by another process is kept.
+            cursor = self._connection.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, kind, text_hash, vector, last_access) VALUES (?, ?, ?, ?, ?)",
+                [(self.model_name, kind, text_hash, array.array("f", vector).tobytes(), now)
+                 for text_hash, vector in vectors.items()],
+            )
+            self._size += cursor.rowcount
+            self._flush_access()
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        overflow = self._size - self.max_entries
+        if overflow > 0:
+            cursor = self._connection.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_access LIMIT ?)",
+                (overflow,),
+            )
+            self._size -= cursor.rowcount
+            logger.debug(f"Evicted {cursor.rowcount} entries from the embedding cache.")
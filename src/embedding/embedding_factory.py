@@ -20,6 +20,14 @@ class EmbeddingFactory:
         logger.info(f"Embedding provider selected: {provider}")
         logger.info(f"Embedding model selected: {model_name}")
 
+        embedding = EmbeddingFactory.get_embeddings(provider, model_name)
+
+        if config.embedding_cache_enabled:
+            return EmbeddingFactory.get_cached_embeddings(embedding, model_name, config)
+        return embedding
+
+    @staticmethod
+    def get_embeddings(provider, model_name):
         if provider == "huggingface":
             return EmbeddingFactory.get_huggingface_embeddings(model_name)
 
@@ -36,6 +44,14 @@ class EmbeddingFactory:
             logger.warning(f"Embedding type {provider} not recognized, defaulting to HuggingFace.")
             return EmbeddingFactory.get_huggingface_embeddings(model_name)
 
+    @staticmethod
+    def get_cached_embeddings(embedding, model_name, config):
+        from embedding.embedding_cache import CachedEmbeddings
+
+        cache_path = config.default_data_path / config.embedding_cache_file_name
+        logger.debug(f"Wrapping embeddings with on-disk cache at: {cache_path}")
+        return CachedEmbeddings(embedding, model_name, cache_path, max_entries=config.embedding_cache_max_entries)
+
     @staticmethod
     def get_huggingface_embeddings(model_name):
         from langchain_huggingface import HuggingFaceEmbeddings
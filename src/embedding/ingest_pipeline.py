@@ -0,0 +1,169 @@
+import queue
+import threading
+from embedding.doc_loader import PDFDocLoader, get_file_metadata
+from embedding.embedder import get_chunk_id
+from embedding.vector_store_factory import VectorStoreFactory
+from utils import get_logger
+
+logger = get_logger()
+
+# Bytes held by one embedding vector while it waits for insertion (a Python list of floats).
+BYTES_PER_VECTOR_VALUE = 32
+
+_END_OF_STREAM = object()
+
+
+class MemoryBudget:
+    """
+    Byte budget shared by the pipeline stages. `acquire` blocks while the bytes in flight
+    would exceed the ceiling, which pushes back on the page reader and splitter.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.waiting = False
+        self.closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self, num_bytes):
+        with self._condition:
+            # A single oversized chunk is still admitted when nothing else is in flight.
+            while self.used and self.used + num_bytes > self.max_bytes and not self.closed:
+                self.waiting = True
+                self._condition.wait()
+            self.waiting = False
+            self.used += num_bytes
+
+    def release(self, num_bytes):
+        with self._condition:
+            self.used -= num_bytes
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class StreamingIngestPipeline:
+    """
+    Constant-memory ingestion: PDF page stream -> splitter -> embed batch -> index append.
+
+    A reader thread streams pages and splits them into chunks that flow through a bounded
+    queue to the consumer, which embeds and appends them to the vector store in batches.
+    The queue size and the memory budget bound the data in flight, whatever the size of
+    the corpus or of the largest PDF.
+    """
+
+    def __init__(self, processor, file_url_map, max_memory_bytes, queue_size=256, metadata_keys=None):
+        self.processor = processor
+        self.file_url_map = file_url_map
+        self.metadata_keys = metadata_keys
+        self.budget = MemoryBudget(max_memory_bytes)
+        self.chunk_queue = queue.Queue(maxsize=queue_size)
+        self.vector_bytes = VectorStoreFactory.get_dimension(processor.vector_store) * BYTES_PER_VECTOR_VALUE
+        self.stop_event = threading.Event()
+        self.file_vector_ids = {}
+        self.failed_ids = []
+        self.reader_error = None
+
+    def run(self, files):
+        """Streams the files into the vector store and returns the vector IDs added per file."""
+        logger.info(f"Streaming {len(files)} files with a memory ceiling of {self.budget.max_bytes} bytes")
+
+        reader = threading.Thread(target=self._read_files, args=(files,), daemon=True)
+        reader.start()
+        try:
+            self._consume()
+        except Exception:
+            self.stop_event.set()
+            self.budget.close()
+            raise
+        finally:
+            reader.join()
+
+        if self.reader_error is not None:
+            raise self.reader_error
+
+        return self.file_vector_ids
+
+    def iter_chunks(self, file, new_metadata):
+        """Yields (id, chunk) pairs for a file, one page at a time."""
+        loader = PDFDocLoader(file, mode="page", metadata_keys=self.metadata_keys, new_metadata=new_metadata)
+        chunk_index = 0
+        for page in loader.lazy_load():
+            for chunk in self.processor.split_documents([page]):
+                yield get_chunk_id(file.name, chunk_index, chunk.page_content), chunk
+                chunk_index += 1
+
+    def _read_files(self, files):
+        try:
+            for file in files:
+                if self.stop_event.is_set():
+                    return
+                new_metadata = get_file_metadata(file, self.file_url_map)
+                if new_metadata is None:
+                    continue
+
+                ids = []
+                try:
+                    for doc_id, chunk in self.iter_chunks(file, new_metadata):
+                        if self.stop_event.is_set():
+                            return
+                        num_bytes = self._chunk_bytes(chunk)
+                        self.budget.acquire(num_bytes)
+                        if not self._put((doc_id, chunk, num_bytes)):
+                            return
+                        ids.append(doc_id)
+                except Exception as e:
+                    # Chunks already queued for this file are deleted once the stream is drained.
+                    logger.error(f"Exception while streaming file {file.name}: {e}")
+                    self.failed_ids.extend(ids)
+                    continue
+
+                if ids:
+                    self.file_vector_ids[file.name] = ids
+        except Exception as e:
+            self.reader_error = e
+        finally:
+            self._put(_END_OF_STREAM)
+
+    def _put(self, item):
+        """Blocks on the bounded queue until there is room, unless the consumer has stopped."""
+        while not self.stop_event.is_set():
+            try:
+                self.chunk_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _consume(self):
+        pending = []
+        pending_bytes = 0
+        while True:
+            try:
+                item = self.chunk_queue.get(timeout=0.1)
+            except queue.Empty:
+                item = None
+
+            if item is _END_OF_STREAM:
+                break
+            if item is not None:
+                doc_id, chunk, num_bytes = item
+                pending.append((doc_id, chunk))
+                pending_bytes += num_bytes
+
+            if len(pending) >= self.processor.buffer_size or (pending and self.budget.waiting):
+                self._write(pending, pending_bytes)
+                pending, pending_bytes = [], 0
+
+        self._write(pending, pending_bytes)
+
+    def _write(self, chunks, num_bytes):
+        self.processor.write_chunks(chunks)
+        self.budget.release(num_bytes)
+
+    def _chunk_bytes(self, chunk):
+        return len(chunk.page_content.encode("utf-8")) + self.vector_bytes
@@ -0,0 +1,112 @@
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from config import Config
+from utils import get_logger
+
+logger = get_logger()
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+
+def tokenize(text):
+    """Lower-cases the text and keeps word, number and identifier-like tokens (e.g. "netid", "lot-9")."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def get_lexical_index_path(config=None):
+    if config is None:
+        config = Config.default_config()
+    return config.default_data_path / config.vector_store_file_name / f"{config.vector_store_index_name}.bm25.json"
+
+
+class BM25Index:
+    """Okapi BM25 inverted index over the chunks of the vector store, keyed by docstore ID."""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []
+        self.doc_lengths = []
+        self.postings = defaultdict(list)
+
+    def add(self, doc_id, text):
+        doc_index = len(self.doc_ids)
+        term_counts = Counter(tokenize(text))
+        self.doc_ids.append(doc_id)
+        self.doc_lengths.append(sum(term_counts.values()))
+        for term, count in term_counts.items():
+            self.postings[term].append((doc_index, count))
+
+    def search(self, query, k=20, allowed_ids=None):
+        """Returns up to k (doc_id, score) pairs, best first, optionally restricted to a set of doc IDs."""
+        if not self.doc_ids:
+            return []
+
+        num_docs = len(self.doc_ids)
+        avg_length = sum(self.doc_lengths) / num_docs or 1.0
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_index, count in postings:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_index] / avg_length
+                scores[doc_index] += idf * count * (self.k1 + 1) / (count + self.k1 * length_norm)
+
+        if allowed_ids is not None:
+            scores = {doc_index: score for doc_index, score in scores.items() if self.doc_ids[doc_index] in allowed_ids}
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[doc_index], score) for doc_index, score in best]
+
+    def save(self, file_path):
+        with open(file_path, "w") as file:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "doc_ids": self.doc_ids,
+                "doc_lengths": self.doc_lengths,
+                "postings": self.postings,
+            }, file)
+        logger.info(f"Lexical index with {len(self.doc_ids)} chunks saved to {file_path}")
+
+    @staticmethod
+    def load(file_path):
+        with open(file_path, "r") as file:
+            data = json.load(file)
+        index = BM25Index(k1=data["k1"], b=data["b"])
+        index.doc_ids = data["doc_ids"]
+        index.doc_lengths = data["doc_lengths"]
+        index.postings = defaultdict(list, {term: [tuple(p) for p in postings] for term, postings in data["postings"].items()})
+        return index
+
+    @staticmethod
+    def from_vector_store(vector_store):
+        """Indexes every chunk referenced by the vector store, in vector position order."""
+        index = BM25Index()
+        for _, doc_id in sorted(vector_store.index_to_docstore_id.items()):
+            doc = vector_store.docstore.search(doc_id)
+            index.add(doc_id, doc.page_content)
+        return index
+
+
+def load_lexical_index(config=None):
+    """Loads the lexical index saved next to the vector store, or returns None if it is missing."""
+    file_path = get_lexical_index_path(config)
+    try:
+        return BM25Index.load(file_path)
+    except FileNotFoundError:
+        logger.warning(f"Lexical index not found at {file_path}. Run --processpdf to build it.")
+        return None
+
+
+def reciprocal_rank_fusion(rankings, rrf_k=60):
+    """Fuses ranked ID lists. Returns (id, score) pairs sorted by the summed 1 / (rrf_k + rank)."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
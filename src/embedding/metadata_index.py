@@ -0,0 +1,201 @@
+import bisect
+import json
+import pathlib
+from collections import defaultdict
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from embedding.numpy_vector_store import NumpyVectorStore
+from config import Config
+from utils import get_logger
+
+logger = get_logger()
+
+# Filter keys resolved by the metadata index. Values are a string or a list of strings.
+# `url_prefix` matches the chunk URL and the `urls` of the near-duplicates collapsed into it.
+NATIVE_FILTER_KEYS = {"space", "file_name", "url_prefix"}
+
+
+def get_space(file_name):
+    """Returns the KB space of a scraped file, e.g. "IT-NetId" for "IT-NetId_12.pdf"."""
+    stem = pathlib.Path(file_name).stem
+    space, _, number = stem.rpartition("_")
+    return space if space and number.isdigit() else stem
+
+
+def as_list(value):
+    return [value] if isinstance(value, str) else list(value)
+
+
+def get_urls(metadata):
+    """Returns the chunk URL followed by the URLs of the duplicates collapsed into it."""
+    urls = [metadata.get("url"), *metadata.get("urls", ())]
+    return [url for url in dict.fromkeys(urls) if url]
+
+
+def matches_filter(metadata, filter):
+    """Evaluates a filter on the chunk metadata; native keys are derived from `file_name` and `url`."""
+    for key, value in filter.items():
+        allowed = as_list(value)
+        if key == "space":
+            if get_space(metadata.get("file_name", "")) not in allowed:
+                return False
+        elif key == "url_prefix":
+            if not any(url.startswith(prefix) for url in get_urls(metadata) for prefix in allowed):
+                return False
+        elif metadata.get(key) not in allowed:
+            return False
+    return True
+
+
+def build_filter_func(filter):
+    """Turns a filter that uses native keys into a callable accepted by LangChain's FAISS post-filtering."""
+    return lambda metadata: matches_filter(metadata, filter)
+
+
+def get_metadata_index_path(config=None):
+    if config is None:
+        config = Config.default_config()
+    return config.default_data_path / config.vector_store_file_name / f"{config.vector_store_index_name}.meta.json"
+
+
+class MetadataIndex:
+    """
+    Maps KB space, file name and URL to the FAISS positions of their chunks, so filtered
+    searches only look at the matching vectors. Positions are only valid for the index the
+    metadata index was built from; `num_vectors` is checked before each search.
+    """
+
+    def __init__(self):
+        self.num_vectors = 0
+        self.spaces = defaultdict(list)
+        self.file_names = defaultdict(list)
+        self.urls = defaultdict(list)
+        self._sorted_urls = None
+
+    def add(self, position, metadata):
+        file_name = metadata.get("file_name")
+        if file_name:
+            self.file_names[file_name].append(position)
+            self.spaces[get_space(file_name)].append(position)
+        for url in get_urls(metadata):
+            self.urls[url].append(position)
+        self.num_vectors = max(self.num_vectors, position + 1)
+        self._sorted_urls = None
+
+    def supports(self, filter, vector_store):
+        return bool(filter) and set(filter) <= NATIVE_FILTER_KEYS and len(vector_store.index_to_docstore_id) == self.num_vectors
+
+    def select(self, filter):
+        """Returns the sorted FAISS positions matching every key of the filter."""
+        selected = None
+        for key, value in filter.items():
+            positions = set()
+            for item in as_list(value):
+                if key == "space":
+                    positions.update(self.spaces.get(item, []))
+                elif key == "file_name":
+                    positions.update(self.file_names.get(item, []))
+                else:
+                    positions.update(self._positions_with_url_prefix(item))
+            selected = positions if selected is None else selected & positions
+        return np.array(sorted(selected or ()), dtype=np.int64)
+
+    def search(self, vector_store, embedding, k, filter):
+        """
+        Searches only the vectors matching the filter. A flat index (or the full-precision
+        vectors of a two-stage store) is searched exactly over the selected vectors; other
+        index types get a FAISS ID selector.
+        Returns (document, distance) pairs like `FAISS.similarity_search_with_score`.
+        """
+        positions = self.select(filter)
+        if len(positions) == 0:
+            return []
+        if isinstance(vector_store, NumpyVectorStore):
+            return vector_store.similarity_search_with_score_by_vector(embedding, k=k, positions=positions)
+
+        index = vector_store.index
+        query = np.array([embedding], dtype=np.float32)
+        if vector_store._normalize_L2:
+            faiss.normalize_L2(query)
+
+        k = min(k, len(positions))
+        full_vectors = getattr(vector_store, "full_vectors", None)
+        if full_vectors is not None:
+            distances, indices = faiss.knn(query, np.asarray(full_vectors[positions], dtype=np.float32), k,
+                                           metric=index.metric_type)
+            indices = positions[indices[0]]
+        elif isinstance(index, faiss.IndexFlat):
+            distances, indices = faiss.knn(query, index.reconstruct_batch(positions), k, metric=index.metric_type)
+            indices = positions[indices[0]]
+        else:
+            distances, indices = index.search(query, k, params=self._search_params(index, positions))
+            indices = indices[0]
+
+        results = []
+        for position, distance in zip(indices, distances[0]):
+            if position == -1:
+                continue
+            doc = vector_store.docstore.search(vector_store.index_to_docstore_id[int(position)])
+            if isinstance(doc, Document):
+                results.append((doc, float(distance)))
+        return results
+
+    @staticmethod
+    def _search_params(index, positions):
+        selector = faiss.IDSelectorBatch(positions)
+        if isinstance(index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+        ivf_index = faiss.try_extract_index_ivf(index)
+        if ivf_index is not None:
+            return faiss.SearchParametersIVF(sel=selector, nprobe=ivf_index.nprobe)
+        return faiss.SearchParameters(sel=selector)
+
+    def _positions_with_url_prefix(self, prefix):
+        if self._sorted_urls is None:
+            self._sorted_urls = sorted(self.urls)
+        start = bisect.bisect_left(self._sorted_urls, prefix)
+        for url in self._sorted_urls[start:]:
+            if not url.startswith(prefix):
+                break
+            yield from self.urls[url]
+
+    def save(self, file_path):
+        with open(file_path, "w") as file:
+            json.dump({
+                "num_vectors": self.num_vectors,
+                "spaces": self.spaces,
+                "file_names": self.file_names,
+                "urls": self.urls,
+            }, file)
+        logger.info(f"Metadata index with {len(self.spaces)} spaces and {len(self.file_names)} files saved to {file_path}")
+
+    @staticmethod
+    def load(file_path):
+        with open(file_path, "r") as file:
+            data = json.load(file)
+        index = MetadataIndex()
+        index.num_vectors = data["num_vectors"]
+        index.spaces = defaultdict(list, data["spaces"])
+        index.file_names = defaultdict(list, data["file_names"])
+        index.urls = defaultdict(list, data["urls"])
+        return index
+
+    @staticmethod
+    def from_vector_store(vector_store):
+        index = MetadataIndex()
+        for position, doc_id in sorted(vector_store.index_to_docstore_id.items()):
+            doc = vector_store.docstore.search(doc_id)
+            index.add(position, doc.metadata or {})
+        index.num_vectors = len(vector_store.index_to_docstore_id)
+        return index
+
+
+def load_metadata_index(config=None):
+    """Loads the metadata index saved next to the vector store, or returns None if it is missing."""
+    file_path = get_metadata_index_path(config)
+    try:
+        return MetadataIndex.load(file_path)
+    except FileNotFoundError:
+        logger.warning(f"Metadata index not found at {file_path}. Run --processpdf to build it.")
+        return None
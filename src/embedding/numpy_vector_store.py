@@ -0,0 +1,165 @@
+import uuid
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from utils import get_logger
+
+logger = get_logger()
+
+VECTORS_SUFFIX = ".vectors.npy"
+# Rows converted to float32 at a time when scoring float16 vectors.
+BLOCK_ROWS = 65536
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact cosine-similarity search over L2-normalized vectors held in a NumPy array.
+
+    A saved store is opened with `np.load(mmap_mode="r")`: loading is instant, pages are
+    read on demand and processes searching the same file share them through the page
+    cache. Search is a matrix product followed by `argpartition`. Scores are squared L2
+    distances between the normalized vectors (2 - 2 * cosine), so thresholds and relevance
+    scores mean the same as with a flat FAISS index. The attributes `docstore` and
+    `index_to_docstore_id` follow the FAISS wrapper, so the lexical and metadata indexes
+    and the SQLite docstore work unchanged.
+    """
+
+    _normalize_L2 = False
+    _create_filter_func = staticmethod(FAISS._create_filter_func)
+
+    def __init__(self, embedding, dim, vectors=None, docstore=None, index_to_docstore_id=None, dtype="float32"):
+        self.embedding = embedding
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.vectors = vectors if vectors is not None else np.empty((0, dim), dtype=self.dtype)
+        # Preallocated rows that `vectors` is a view of while documents are being added.
+        self._buffer = None
+        self.docstore = docstore if docstore is not None else InMemoryDocstore()
+        self.index_to_docstore_id = index_to_docstore_id if index_to_docstore_id is not None else {}
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def add_embeddings(self, text_embeddings, metadatas=None, ids=None, **kwargs):
+        texts, embeddings = zip(*text_embeddings)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+
+        self.docstore.add({
+            doc_id: Document(id=doc_id, page_content=text, metadata=metadata)
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        })
+        start = len(self.vectors)
+        self._append_vectors(normalize_rows(embeddings).astype(self.dtype))
+        self.index_to_docstore_id.update({start + offset: doc_id for offset, doc_id in enumerate(ids)})
+        return list(ids)
+
+    def _append_vectors(self, vectors):
+        size = len(self.vectors)
+        needed = size + len(vectors)
+        if self._buffer is None or needed > len(self._buffer):
+            # Doubling the capacity copies each row a constant number of times over many batches.
+            # The first append copies a memory-mapped array into memory; only ingestion does this.
+            buffer = np.empty((max(needed, 2 * size), self.dim), dtype=self.dtype)
+            buffer[:size] = self.vectors
+            self._buffer = buffer
+        self._buffer[size:needed] = vectors
+        self.vectors = self._buffer[:needed]
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(zip(texts, self.embedding.embed_documents(texts)), metadatas=metadatas, ids=ids)
+
+    def delete(self, ids=None, **kwargs):
+        """Removes the vectors and documents of the given IDs and renumbers the remaining positions."""
+        ids_to_delete = set(ids or [])
+        kept = [(position, doc_id) for position, doc_id in sorted(self.index_to_docstore_id.items())
+                if doc_id not in ids_to_delete]
+        self.vectors = self.vectors[[position for position, _ in kept]]
+        self._buffer = None
+        self.index_to_docstore_id = {position: doc_id for position, (_, doc_id) in enumerate(kept)}
+        self.docstore.delete([doc_id for doc_id in ids_to_delete])
+        return True
+
+    def get_by_ids(self, ids):
+        docs = [self.docstore.search(doc_id) for doc_id in ids]
+        return [doc for doc in docs if isinstance(doc, Document)]
+
+    def search_vectors(self, vectors, k, positions=None):
+        """
+        Searches a query matrix, optionally among `positions` only.
+        Returns (distances, positions) arrays like `faiss.Index.search`, padded with -1.
+        """
+        queries = normalize_rows(vectors)
+        candidates = self.vectors if positions is None else self.vectors[positions]
+        num_candidates = len(candidates)
+
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        found = np.full((len(queries), k), -1, dtype=np.int64)
+        if num_candidates == 0:
+            return distances, found
+
+        similarities = np.empty((len(queries), num_candidates), dtype=np.float32)
+        for start in range(0, num_candidates, BLOCK_ROWS):
+            block = np.asarray(candidates[start:start + BLOCK_ROWS], dtype=np.float32)
+            similarities[:, start:start + len(block)] = queries @ block.T
+
+        top_k = min(k, num_candidates)
+        top = np.argpartition(-similarities, top_k - 1, axis=1)[:, :top_k]
+        top_similarities = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_similarities, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+
+        distances[:, :top_k] = 2 - 2 * np.take_along_axis(top_similarities, order, axis=1)
+        found[:, :top_k] = top if positions is None else np.asarray(positions)[top]
+        return distances, found
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, fetch_k=20, positions=None, **kwargs):
+        distances, found = self.search_vectors(np.array([embedding]), k if filter is None else max(k, fetch_k), positions)
+        filter_func = self._create_filter_func(filter) if filter is not None else None
+
+        docs = []
+        for distance, position in zip(distances[0], found[0]):
+            if position == -1:
+                continue
+            doc = self.docstore.search(self.index_to_docstore_id[int(position)])
+            if isinstance(doc, Document) and (filter_func is None or filter_func(doc.metadata)):
+                docs.append((doc, float(distance)))
+
+        score_threshold = kwargs.get("score_threshold")
+        if score_threshold is not None:
+            docs = [(doc, score) for doc, score in docs if score <= score_threshold]
+        return docs[:k]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, fetch_k=20, **kwargs):
+        embedding = self.embedding.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter, fetch_k=fetch_k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, fetch_k=20, **kwargs):
+        docs = self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter, fetch_k=fetch_k, **kwargs)
+        return [doc for doc, _ in docs]
+
+    def similarity_search(self, query, k=4, filter=None, fetch_k=20, **kwargs):
+        docs = self.similarity_search_with_score(query, k=k, filter=filter, fetch_k=fetch_k, **kwargs)
+        return [doc for doc, _ in docs]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, dtype="float32", **kwargs):
+        texts = list(texts)
+        embeddings = embedding.embed_documents(texts)
+        store = cls(embedding, len(embeddings[0]), dtype=dtype)
+        store.add_embeddings(zip(texts, embeddings), metadatas=metadatas, ids=ids)
+        return store
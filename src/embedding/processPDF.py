@@ -1,6 +1,16 @@
+import hashlib
+import itertools
 import tqdm
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.documents import Document
 from utils import *
-from embedding.embedder import PDFToVectorDB
+from embedding.dedup import NearDuplicateDetector
+from embedding.doc_loader import PDFDocLoader, get_file_metadata
+from embedding.embedder import PDFToVectorDB, VectorStoreWriteError
+from embedding.ingest_pipeline import StreamingIngestPipeline
+from embedding.lexical_index import BM25Index, get_lexical_index_path
+from embedding.metadata_index import MetadataIndex, get_metadata_index_path
+from embedding.splitter_factory import SplitterFactory
 from embedding.vector_store_factory import VectorStoreFactory
 from embedding.embedding_factory import EmbeddingFactory
 from config import Config
@@ -8,18 +18,154 @@ import json
 
 logger = get_logger()
 
-METADATA_KEYS = ['creationdate', 'source', 'total_pages', 'title', 'keywords']
+METADATA_KEYS = ['creationdate', 'source', 'total_pages', 'title', 'keywords', 'url']
 
-def store_vector_ids(file_vector_ids, file_path):    
+def get_index_settings(config):
+    """Settings that change the chunks or their vectors. Vectors built with other values cannot be reused."""
+    return {
+        "embedding_provider": config.embedding_provider,
+        "embedding_model_name": config.embedding_model_name,
+        "splitter_type": config.splitter_type,
+        "chunk_size": config.chunk_size,
+        "chunk_overlap": config.chunk_overlap,
+    }
+
+
+def store_vector_ids(file_vector_ids, file_path, settings=None):
     logger.info(f"Storing vector IDs to {file_path}")
     try:
         with open(file_path, "w") as file:
-            json.dump(file_vector_ids, file, indent=4)
+            json.dump({"settings": settings, "files": file_vector_ids}, file, indent=4)
         logger.debug("Vector IDs successfully stored.")
     except Exception as e:
         logger.error(f"Failed to store vector IDs: {e}")
 
 
+def load_vector_ids(file_path):
+    """
+    Loads the per-file manifest of content hashes and vector IDs, with the index settings
+    it was built with (None for manifests written before settings were recorded).
+    Manifests written before hashes were tracked map file names to bare ID lists; those
+    entries get a `None` hash so the files are treated as changed. `duplicates` maps the
+    IDs of a file's chunks that were collapsed as near-duplicates to the IDs they were
+    collapsed into; those chunks are not in the vector store. `duplicate_sources` maps them
+    to their URL, which is listed in the `urls` metadata of the chunk they were collapsed into.
+    """
+    if not os.path.exists(file_path):
+        return {}, None
+
+    logger.info(f"Loading vector IDs from {file_path}")
+    with open(file_path, "r") as file:
+        manifest = json.load(file)
+
+    settings = None
+    if "settings" in manifest and isinstance(manifest.get("files"), dict):
+        settings, manifest = manifest["settings"], manifest["files"]
+
+    entries = {
+        file_name: entry if isinstance(entry, dict) else {"hash": None, "ids": entry}
+        for file_name, entry in manifest.items()
+    }
+    for entry in entries.values():
+        entry.setdefault("duplicates", {})
+        entry.setdefault("duplicate_sources", {})
+    return entries, settings
+
+
+def compute_file_hash(file_path, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def plan_incremental_update(files, manifest):
+    """
+    Compares the files on disk with the manifest.
+    Returns the files to (re)process, the stale vector IDs to delete, the manifest entries
+    of unchanged files and the content hash of every file on disk.
+    """
+    file_hashes = {file.name: compute_file_hash(file) for file in files}
+
+    changed_files = []
+    unchanged_entries = {}
+    for file in files:
+        entry = manifest.get(file.name)
+        if entry is not None and entry["hash"] == file_hashes[file.name]:
+            unchanged_entries[file.name] = entry
+        else:
+            changed_files.append(file)
+
+    # Unchanged files whose duplicate chunks were collapsed into chunks of a changed or removed
+    # file lose that content when the stale vectors are deleted, so they are processed again.
+    # Their own chunk IDs do not change, so chunks collapsed into them stay valid.
+    replaced_ids = {
+        doc_id
+        for file_name, entry in manifest.items()
+        if file_name not in unchanged_entries
+        for doc_id in entry["ids"]
+    }
+    for file in files:
+        entry = unchanged_entries.get(file.name)
+        if entry is not None and replaced_ids.intersection(entry["duplicates"].values()):
+            logger.info(f"Reprocessing {file.name}: its duplicate chunks were collapsed into chunks of a changed file.")
+            del unchanged_entries[file.name]
+            changed_files.append(file)
+
+    stale_ids = [
+        doc_id
+        for file_name, entry in manifest.items()
+        if file_name not in unchanged_entries
+        for doc_id in entry["ids"]
+    ]
+
+    logger.info(f"Incremental update - unchanged: {len(unchanged_entries)}, to process: {len(changed_files)}, "
+                f"removed: {len(set(manifest) - set(file_hashes))}, stale vectors: {len(stale_ids)}")
+    return changed_files, stale_ids, unchanged_entries, file_hashes
+
+
+def delete_stale_vectors(vector_store, stale_ids):
+    """Deletes the given vector IDs that are still present in the vector store."""
+    live_ids = set(vector_store.index_to_docstore_id.values())
+    ids_to_delete = [doc_id for doc_id in stale_ids if doc_id in live_ids]
+    if ids_to_delete:
+        vector_store.delete(ids_to_delete)
+    logger.info(f"Deleted {len(ids_to_delete)} stale vectors from the vector store.")
+
+
+def prune_collapsed_sources(vector_store, manifest, unchanged_entries):
+    """
+    Rewrites the `urls` metadata of kept chunks that absorbed duplicates of changed or removed
+    files, so they only list the sources still collapsed into them and `url_prefix` filters no
+    longer match them for pages whose chunks were replaced.
+    """
+    affected_ids = {
+        kept_id
+        for file_name, entry in manifest.items()
+        if file_name not in unchanged_entries
+        for kept_id in entry["duplicates"].values()
+    }
+    affected_ids &= set(vector_store.index_to_docstore_id.values())
+
+    updates = {}
+    for kept_id in affected_ids:
+        doc = vector_store.docstore.search(kept_id)
+        if not isinstance(doc, Document):
+            continue
+        urls = [doc.metadata["url"]] if doc.metadata.get("url") else []
+        for entry in unchanged_entries.values():
+            for doc_id, duplicate_of in entry["duplicates"].items():
+                url = entry["duplicate_sources"].get(doc_id)
+                if duplicate_of == kept_id and url and url not in urls:
+                    urls.append(url)
+        updates[kept_id] = {"urls": urls}
+
+    VectorStoreFactory.update_metadata(vector_store, updates)
+    logger.info(f"Removed the sources of changed files from {len(updates)} collapsed chunks.")
+
+
 def load_file_url_map(file_path):
     """
     Loads the file URL map from a CSV file and returns it as a dictionary.
@@ -40,40 +186,125 @@ def process_file(file, processor, file_url_map):
     Processes a single PDF file by extracting metadata and storing vectors in the vector DB.
     """
     try:
-        if file.stem in file_url_map:
-            new_metadata = {
-                "file_name": file.name,
-                "url": file_url_map[file.stem]
-                }
+        new_metadata = get_file_metadata(file, file_url_map)
+        if new_metadata is not None:
             # Process the PDF and store vectors in the vector DB
             ids = processor.process_pdf_and_store_in_vectorDB(
                 file, mode="single", metadata_keys=METADATA_KEYS, new_metadata=new_metadata
             )
             return ids
-        else:
-            logger.warning(f"No URL mapping found for file: {file.name}")
 
+    except VectorStoreWriteError:
+        raise
     except Exception as e:
         logger.error(f"Exception while processing file {file.name}: {e}")
     return []
 
 
-def process_pdfs(files, processor, file_url_map):
+# Splitter owned by each worker process of the parallel path, created once by `init_split_worker`.
+_worker_splitter = None
+
+
+def init_split_worker(config):
+    global _worker_splitter
+    _worker_splitter = SplitterFactory.get_splitter_from_config(config)
+
+
+def load_and_split_file(file, file_url_map):
     """
-    Processes multiple PDF files and stores their vectors in the vector database.
+    Loads and splits a single PDF file inside a worker process.
+    Returns the file together with its chunks so the consumer can keep the input order.
     """
-    logger.info(f"Starting processing of {len(files)} PDF files...")
+    try:
+        new_metadata = get_file_metadata(file, file_url_map)
+        if new_metadata is None:
+            return file, []
+        documents = PDFDocLoader(file, mode="single", metadata_keys=METADATA_KEYS, new_metadata=new_metadata).load()
+        return file, _worker_splitter.split_documents(documents)
+    except Exception as e:
+        logger.error(f"Exception while loading file {file.name}: {e}")
+        return file, []
+
 
+def process_pdfs_serial(files, processor, file_url_map):
+    """
+    Processes multiple PDF files one after another and stores their vectors in the vector database.
+    """
     file_vector_ids = {}
-    total_ids = 0
 
     for file in tqdm.tqdm(files):
         if file.name not in file_vector_ids:
             ids = process_file(file, processor, file_url_map)
             if ids:
                 file_vector_ids[file.name] = ids
-                total_ids += len(ids)
 
+    return file_vector_ids
+
+
+def process_pdfs_parallel(files, processor, file_url_map, num_workers, config=None):
+    """
+    Loads and splits PDF files in a pool of worker processes while this process embeds
+    the chunks and inserts them in the vector database. Results are consumed in input
+    order, so the vector IDs file and the saved index match the serial path.
+    """
+    if config is None:
+        config = Config.default_config()
+
+    file_vector_ids = {}
+    unique_files = list({file.name: file for file in files}.values())
+
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=init_split_worker, initargs=(config,)) as executor:
+        results = executor.map(load_and_split_file, unique_files, itertools.repeat(file_url_map))
+        for file, split_documents in tqdm.tqdm(results, total=len(unique_files)):
+            if not split_documents:
+                continue
+            ids = processor.add_documents_to_vector_store(split_documents, file.name)
+            if ids:
+                file_vector_ids[file.name] = ids
+
+    return file_vector_ids
+
+
+def process_pdfs_streaming(files, processor, file_url_map, config=None):
+    """
+    Streams PDF pages through the splitter, embedder and vector store with bounded queues,
+    so memory stays under `pdf_processing.max_memory_mb` whatever the corpus size.
+    """
+    if config is None:
+        config = Config.default_config()
+
+    pipeline = StreamingIngestPipeline(
+        processor,
+        file_url_map,
+        max_memory_bytes=config.max_memory_mb * 1024 * 1024,
+        queue_size=config.queue_size,
+        metadata_keys=METADATA_KEYS + ["page"],
+    )
+    unique_files = list({file.name: file for file in files}.values())
+    file_vector_ids = pipeline.run(unique_files)
+    delete_stale_vectors(processor.vector_store, pipeline.failed_ids)
+    return file_vector_ids
+
+
+def process_pdfs(files, processor, file_url_map, num_workers=1, config=None):
+    """
+    Processes multiple PDF files and stores their vectors in the vector database.
+    """
+    if config is None:
+        config = Config.default_config()
+
+    logger.info(f"Starting processing of {len(files)} PDF files with {num_workers} worker(s)...")
+
+    if config.streaming:
+        file_vector_ids = process_pdfs_streaming(files, processor, file_url_map, config=config)
+    elif num_workers > 1:
+        file_vector_ids = process_pdfs_parallel(files, processor, file_url_map, num_workers, config=config)
+    else:
+        file_vector_ids = process_pdfs_serial(files, processor, file_url_map)
+    processor.flush()
+    processor.apply_collapsed_sources()
+
+    total_ids = sum(len(ids) for ids in file_vector_ids.values())
     logger.info(f"Finished processing. Total files: {len(files)} | Total vectors added: {total_ids}")
     return file_vector_ids
 
@@ -98,19 +329,96 @@ def main_process_pdf(config=None):
 
     file_url_mapper_path = data_dir / config.file_url_mapper_name
     vector_db_location = data_dir / config.vector_store_file_name
+    vector_ids_path = data_dir / config.vector_ids_file_name
 
     # Load the file URL map
     file_url_map = load_file_url_map(file_url_mapper_path)
 
     # Initialize embedding and vector store
-    embedding = EmbeddingFactory.get_embeddings_from_config()
-    vector_store = VectorStoreFactory.initialize_vector_store(embedding)
+    embedding = EmbeddingFactory.get_embeddings_from_config(config)
+
+    manifest, manifest_settings = load_vector_ids(vector_ids_path) if config.incremental else ({}, None)
+    index_settings = get_index_settings(config)
+    if manifest and manifest_settings != index_settings:
+        # Chunk IDs and vectors of unchanged files would not match the ones the new settings produce.
+        logger.warning(f"Embedding or splitter settings changed since the last run ({manifest_settings} -> {index_settings}). "
+                       f"Falling back to a full rebuild.")
+        manifest = {}
+    vector_store = None
+    if manifest and config.vector_store_type == "numpy":
+        vector_store = VectorStoreFactory.load_numpy_vector_db(
+            vector_db_location, embedding, index_name=config.vector_store_index_name, dtype=config.numpy_dtype,
+            for_update=True,
+        )
+    elif manifest:
+        vector_store = VectorStoreFactory.load_vector_db_from_local_if_exist(
+            vector_db_location, embedding, index_name=config.vector_store_index_name, docstore_type=config.docstore_type,
+            for_update=True,
+        )
+    if manifest:
+        if not vector_store.index_to_docstore_id:
+            logger.warning("No existing vectors found for the manifest. Falling back to a full rebuild.")
+            vector_store, manifest = None, {}
+        else:
+            VectorStoreFactory.to_flat(vector_store)
+
+    if vector_store is None:
+        docstore = None
+        if config.vector_store_type == "numpy" or config.docstore_type == "sqlite":
+            # Rebuilt into the working file that replaces the saved docstore, instead of holding every chunk in memory.
+            docstore = VectorStoreFactory.create_working_docstore(vector_db_location, config.vector_store_index_name)
+        if config.vector_store_type == "numpy":
+            vector_store = VectorStoreFactory.initialize_numpy_vector_store(embedding, dtype=config.numpy_dtype, docstore=docstore)
+        else:
+            vector_store = VectorStoreFactory.initialize_vector_store(embedding, docstore=docstore)
+
+    files_to_process, stale_ids, unchanged_entries, file_hashes = plan_incremental_update(files, manifest)
+    delete_stale_vectors(vector_store, stale_ids)
+    prune_collapsed_sources(vector_store, manifest, unchanged_entries)
+
+    deduplicator = None
+    if config.deduplicate:
+        if manifest:
+            # Chunks kept by earlier runs are not fingerprinted, so duplicates can only be collapsed on a full rebuild.
+            logger.warning("Near-duplicate collapsing is skipped during incremental updates. Delete the manifest to rebuild.")
+        else:
+            deduplicator = NearDuplicateDetector(max_distance=config.dedup_max_distance, shingle_size=config.dedup_shingle_size)
 
     # Initialize processor
-    processor = PDFToVectorDB(vector_store=vector_store, embedding=embedding)
+    processor = PDFToVectorDB(vector_store=vector_store, embedding=embedding,
+                              batch_size=config.embed_batch_size, buffer_size=config.embed_buffer_size,
+                              deduplicator=deduplicator)
 
     # Process the PDFs and save vectors
-    file_vector_ids = process_pdfs(files, processor, file_url_map)
-    store_vector_ids(file_vector_ids, data_dir / "vectorDB_ids.json")
+    file_vector_ids = process_pdfs(files_to_process, processor, file_url_map, num_workers=config.num_workers, config=config)
+    VectorStoreFactory.compact(vector_store)
+    vector_store = VectorStoreFactory.build_index(vector_store, config=config)
+
+    duplicate_of = deduplicator.duplicate_of if deduplicator is not None else {}
+    duplicate_sources = deduplicator.duplicate_sources if deduplicator is not None else {}
+    new_manifest = dict(unchanged_entries)
+    for file_name, ids in file_vector_ids.items():
+        # Only the chunks actually written are recorded as vectors of the file.
+        new_manifest[file_name] = {
+            "hash": file_hashes[file_name],
+            "ids": [doc_id for doc_id in ids if doc_id not in duplicate_of],
+            "duplicates": {doc_id: duplicate_of[doc_id] for doc_id in ids if doc_id in duplicate_of},
+            "duplicate_sources": {doc_id: duplicate_sources[doc_id] for doc_id in ids if doc_id in duplicate_sources},
+        }
+
+    store_vector_ids(new_manifest, vector_ids_path, settings=index_settings)
+    if deduplicator is not None:
+        report = deduplicator.report(vector_dim=VectorStoreFactory.get_dimension(vector_store))
+        write_dict_as_json(data_dir / config.dedup_report_file_name, report)
+        logger.info(f"Near-duplicate report: {report['chunks_collapsed']} of {report['chunks_seen']} chunks collapsed "
+                    f"({report['shrink_ratio']:.1%} smaller index), written to {data_dir / config.dedup_report_file_name}")
     VectorStoreFactory.save_local(vector_store, config=config)
+    if config.build_lexical_index:
+        BM25Index.from_vector_store(vector_store).save(get_lexical_index_path(config))
+    if config.build_metadata_index:
+        # Rebuilt from the compacted store: positions are re-keyed and collapsed sources may have changed.
+        MetadataIndex.from_vector_store(vector_store).save(get_metadata_index_path(config))
+    if config.embedding_cache_enabled:
+        logger.info(f"Embedding cache stats: {embedding.stats()}")
+        embedding.flush()
     logger.info("PDF processing and vector DB storage completed.")
@@ -0,0 +1,76 @@
+import time
+from config import Config
+from utils import get_logger
+
+logger = get_logger()
+
+
+class CrossEncoderReranker:
+    """
+    Re-scores (query, chunk) pairs with a local cross-encoder on CPU and keeps the best `top_n`.
+
+    Candidates are scored in batches in the caller's thread, so concurrent queries do not
+    queue behind each other. The time budget is checked before each batch: once it has passed,
+    scoring stops and the candidates are returned in their retrieval order. A query overruns
+    the budget by at most one batch.
+    """
+
+    def __init__(self, model_name, fetch_k=20, top_n=3, batch_size=16, time_budget_ms=200, max_length=512):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.fetch_k = fetch_k
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.time_budget = time_budget_ms / 1000
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self.fallbacks = 0
+        # The first prediction is much slower than the following ones, keep it out of the query path.
+        self.model.predict([("warm up", "warm up")])
+
+    def rerank(self, query, documents):
+        """Takes (document, score) pairs in retrieval order and returns the `top_n` best pairs."""
+        if len(documents) <= 1:
+            return documents[:self.top_n]
+
+        start = time.perf_counter()
+        scores = self._score(query, documents, deadline=start + self.time_budget)
+        if scores is None:
+            self.fallbacks += 1
+            logger.warning(f"Rerank time budget of {self.time_budget * 1000:.0f} ms exceeded for "
+                           f"{len(documents)} candidates, keeping the retrieval order.")
+            return documents[:self.top_n]
+
+        ranked = sorted(zip(documents, scores), key=lambda item: item[1], reverse=True)[:self.top_n]
+        logger.debug(f"Reranked {len(documents)} candidates in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return [(doc, score) for (doc, _), score in ranked]
+
+    def _score(self, query, documents, deadline):
+        """Returns the scores of all documents, or None if the deadline passed before the last batch."""
+        scores = []
+        for batch_start in range(0, len(documents), self.batch_size):
+            if time.perf_counter() >= deadline:
+                return None
+            batch = documents[batch_start:batch_start + self.batch_size]
+            pairs = [(query, doc.page_content) for doc, _ in batch]
+            scores.extend(float(score) for score in self.model.predict(pairs, batch_size=self.batch_size))
+        return scores
+
+
+def load_reranker(config=None):
+    """Loads the cross-encoder configured under `document_search.rerank`, or returns None if it is unavailable."""
+    if config is None:
+        config = Config.default_config()
+
+    try:
+        return CrossEncoderReranker(
+            config.rerank_model_name,
+            fetch_k=config.rerank_fetch_k,
+            top_n=config.rerank_top_n,
+            batch_size=config.rerank_batch_size,
+            time_budget_ms=config.rerank_time_budget_ms,
+            max_length=config.rerank_max_length,
+        )
+    except Exception as e:
+        logger.error(f"Failed to load reranker {config.rerank_model_name}, continuing without it: {e}")
+        return None
@@ -0,0 +1,100 @@
+import operator
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from utils import get_logger
+
+logger = get_logger()
+
+FULL_VECTORS_SUFFIX = ".full.npy"
+
+
+class TwoStageFAISS(FAISS):
+    """
+    FAISS store whose index holds PCA-reduced vectors (`IndexPreTransform`).
+
+    A query first searches the reduced index for `k * rescore_factor` candidates, which are
+    then rescored exactly against the full-precision vectors kept in `full_vectors` (usually
+    a memory-mapped `.npy` file, so only the shortlisted rows are read). Scores have the same
+    meaning as with a flat index of the full vectors.
+
+    PQ and SQ8 indexes are wrapped too, without rescoring: their full vectors are only used to
+    rebuild a lossless flat index for incremental updates.
+    """
+
+    def __init__(self, *args, full_vectors=None, rescore_factor=4, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.full_vectors = full_vectors
+        self.rescore_factor = rescore_factor
+
+    @staticmethod
+    def from_faiss(vector_store, full_vectors, rescore_factor=4):
+        return TwoStageFAISS(
+            embedding_function=vector_store.embedding_function,
+            index=vector_store.index,
+            docstore=vector_store.docstore,
+            index_to_docstore_id=vector_store.index_to_docstore_id,
+            relevance_score_fn=vector_store.override_relevance_score_fn,
+            normalize_L2=vector_store._normalize_L2,
+            distance_strategy=vector_store.distance_strategy,
+            full_vectors=full_vectors,
+            rescore_factor=rescore_factor,
+        )
+
+    @property
+    def rescoring(self):
+        return self.full_vectors is not None and isinstance(self.index, faiss.IndexPreTransform)
+
+    def search_vectors(self, vectors, k):
+        """Two-stage search of a query matrix. Returns (scores, positions) like `index.search`."""
+        if not self.rescoring:
+            return self.index.search(vectors, k)
+
+        shortlist_k = min(k * self.rescore_factor, self.index.ntotal)
+        _, shortlist = self.index.search(vectors, shortlist_k)
+        inner_product = self.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT
+
+        all_scores = np.full((len(vectors), k), np.inf if not inner_product else -np.inf, dtype=np.float32)
+        all_positions = np.full((len(vectors), k), -1, dtype=np.int64)
+        for row, (vector, candidates) in enumerate(zip(vectors, shortlist)):
+            candidates = candidates[candidates != -1]
+            # Sorted reads keep the memory-mapped accesses sequential.
+            candidates.sort()
+            full = np.asarray(self.full_vectors[candidates], dtype=np.float32)
+            if inner_product:
+                scores = full @ vector
+                order = np.argsort(-scores)[:k]
+            else:
+                scores = ((full - vector) ** 2).sum(axis=1)
+                order = np.argsort(scores)[:k]
+            all_scores[row, :len(order)] = scores[order]
+            all_positions[row, :len(order)] = candidates[order]
+        return all_scores, all_positions
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, fetch_k=20, **kwargs):
+        if not self.rescoring:
+            return super().similarity_search_with_score_by_vector(embedding, k=k, filter=filter, fetch_k=fetch_k, **kwargs)
+
+        vector = np.array([embedding], dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vector)
+        scores, indices = self.search_vectors(vector, k if filter is None else fetch_k)
+        filter_func = self._create_filter_func(filter) if filter is not None else None
+
+        docs = []
+        for score, position in zip(scores[0], indices[0]):
+            if position == -1:
+                continue
+            doc = self.docstore.search(self.index_to_docstore_id[int(position)])
+            if not isinstance(doc, Document):
+                raise ValueError(f"Could not find document for position {position}, got {doc}")
+            if filter_func is None or filter_func(doc.metadata):
+                docs.append((doc, float(score)))
+
+        score_threshold = kwargs.get("score_threshold")
+        if score_threshold is not None:
+            cmp = operator.ge if self.distance_strategy in (DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.JACCARD) else operator.le
+            docs = [(doc, score) for doc, score in docs if cmp(score, score_threshold)]
+        return docs[:k]
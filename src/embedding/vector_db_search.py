@@ -1,17 +1,111 @@
+import json
+import time
+import faiss
+import numpy as np
 from config import Config
 from embedding.vector_store_factory import VectorStoreFactory
+from embedding.embedding_cache import embed_queries
 from embedding.embedding_factory import EmbeddingFactory
+from embedding.lexical_index import load_lexical_index, reciprocal_rank_fusion
+from embedding.metadata_index import NATIVE_FILTER_KEYS, build_filter_func, load_metadata_index
+from embedding.reranker import load_reranker
+from langchain_core.documents import Document
 from utils import get_logger
 
 logger = get_logger()
 
-def search_vector_db(query, vector_store, k=5, search_type="distance", keep_with_score=None, filter=None, return_score=False):
+def dense_search(query, vector_store, k=5, filter=None, metadata_index=None, relevance=False):
+    """
+    Returns (document, score) pairs from the vector store. Filters on space, file_name and
+    url_prefix are resolved by the metadata index, so only the matching vectors are searched;
+    without one they are evaluated on each candidate's metadata.
+    """
+    if isinstance(filter, dict) and metadata_index is not None and metadata_index.supports(filter, vector_store):
+        documents = metadata_index.search(vector_store, vector_store.embeddings.embed_query(query), k, filter)
+        if relevance:
+            relevance_fn = vector_store._select_relevance_score_fn()
+            documents = [(doc, relevance_fn(score)) for doc, score in documents]
+        return documents
+
+    if isinstance(filter, dict) and NATIVE_FILTER_KEYS & set(filter):
+        filter = build_filter_func(filter)
+    if relevance:
+        return vector_store.similarity_search_with_relevance_scores(query, k=k, filter=filter)
+    return vector_store.similarity_search_with_score(query, k=k, filter=filter)
+
+
+def hybrid_search(query, vector_store, lexical_index, k=5, fetch_k=20, rrf_k=60, filter=None, metadata_index=None):
+    """
+    Runs dense and BM25 search side by side and fuses both rankings with reciprocal rank fusion.
+    Returns (document, fused score) pairs, higher is better.
+    """
+    dense_results = dense_search(query, vector_store, k=fetch_k, filter=filter, metadata_index=metadata_index)
+
+    allowed_ids = None
+    if isinstance(filter, dict) and metadata_index is not None and metadata_index.supports(filter, vector_store):
+        allowed_ids = {vector_store.index_to_docstore_id[int(position)] for position in metadata_index.select(filter)}
+    lexical_results = lexical_index.search(query, k=fetch_k, allowed_ids=allowed_ids)
+    logger.debug(f"Hybrid search - dense hits: {len(dense_results)}, lexical hits: {len(lexical_results)}")
+
+    documents = {doc.id: doc for doc, _ in dense_results}
+    filter_func = None
+    if filter is not None and allowed_ids is None:
+        if isinstance(filter, dict) and NATIVE_FILTER_KEYS & set(filter):
+            filter = build_filter_func(filter)
+        filter_func = vector_store._create_filter_func(filter)
+
+    fused = reciprocal_rank_fusion(
+        [[doc.id for doc, _ in dense_results], [doc_id for doc_id, _ in lexical_results]], rrf_k=rrf_k
+    )
+
+    results = []
+    for doc_id, score in fused:
+        doc = documents.get(doc_id)
+        if doc is None:
+            doc = vector_store.docstore.search(doc_id)
+            if not isinstance(doc, Document) or (filter_func is not None and not filter_func(doc.metadata)):
+                continue
+        results.append((doc, score))
+        if len(results) == k:
+            break
+    return results
+
+
+def search_vector_db(query, vector_store, k=5, search_type="distance", keep_with_score=None, filter=None, return_score=False,
+                     lexical_index=None, fetch_k=20, rrf_k=60, reranker=None, metadata_index=None):
     logger.debug(f"Search query: {query}")
     logger.debug(f"Search parameters - k: {k}, search_type: {search_type}, keep_with_score: {keep_with_score}, filter: {filter}, return_score: {return_score}")
+    if reranker is not None:
+        # Over-fetch candidates, then keep the reranker's `top_n` best instead of the top k.
+        candidates = search_vector_db(query, vector_store, k=max(reranker.fetch_k, k), search_type=search_type,
+                                      keep_with_score=keep_with_score, filter=filter, return_score=True,
+                                      lexical_index=lexical_index, fetch_k=fetch_k, rrf_k=rrf_k,
+                                      metadata_index=metadata_index)
+        documents = reranker.rerank(query, candidates)
+        if return_score:
+            return documents
+        return [doc[0] for doc in documents]
+
     try:
-        if search_type.lower() == "distance":
+        if search_type.lower() == "hybrid" and lexical_index is None:
+            logger.warning("Hybrid search requested without a lexical index, falling back to relevance search.")
+            search_type = "relevance"
+
+        if search_type.lower() == "hybrid":
+            # Here, `keep_with_score` is the minimum fused reciprocal rank score.
+            documents = hybrid_search(query, vector_store, lexical_index, k=k, fetch_k=max(fetch_k, k), rrf_k=rrf_k, filter=filter,
+                                      metadata_index=metadata_index)
+
+            logger.debug(f"Found {len(documents)} documents based on hybrid rank fusion.")
+            if keep_with_score is not None:
+                documents = [doc for doc in documents if doc[1] >= keep_with_score]
+            if return_score:
+                return documents
+            return [doc[0] for doc in documents]
+
+        elif search_type.lower() == "distance":
             # Here, `keep_with_score` represents the distance between vectors, indicating the minimum vector distance.
-            documents = vector_store.similarity_search_with_score(query, k=k, filter=filter)
+            documents = dense_search(query, vector_store, k=k, filter=filter, metadata_index=metadata_index)
             
             logger.debug(f"Found {len(documents)} documents based on distance metric.")
             if keep_with_score is None:
@@ -26,7 +120,7 @@ def search_vector_db(query, vector_store, k=5, search_type="distance", keep_with
             return [doc[0] for doc in filtered_documents]
         else:
             # Here, `keep_with_score` serves as a relevance score between vectors, indicating the minimum threshold of relevance for the vectors.
-            documents = vector_store.similarity_search_with_relevance_scores(query, k=k, filter=filter)
+            documents = dense_search(query, vector_store, k=k, filter=filter, metadata_index=metadata_index, relevance=True)
 
             logger.debug(f"Found {len(documents)} documents based on relevance metric.")
             if keep_with_score is None:
@@ -42,7 +136,132 @@ def search_vector_db(query, vector_store, k=5, search_type="distance", keep_with
     except Exception as e:
         logger.error(f"Error during searching document from vectorDB: {str(e)}")
         raise e
-    
+
+
+def search_vector_db_batch(queries, vector_store, k=5, search_type="distance", keep_with_score=None, return_score=False,
+                           lexical_index=None, fetch_k=20, rrf_k=60, reranker=None):
+    """
+    Searches many queries at once: all queries are embedded together (`embed_queries`) and
+    the FAISS index is searched with a single query matrix. Returns one result list per query,
+    in the same format as `search_vector_db`. Only "distance" and "relevance" are batched;
+    other search types and non-FAISS stores are searched one query at a time. With a reranker,
+    the candidates are fetched in one batch and reranked query by query.
+    """
+    if not queries:
+        return []
+    if search_type.lower() not in ("distance", "relevance") or not hasattr(vector_store, "index_to_docstore_id"):
+        return [search_vector_db(query, vector_store, k=k, search_type=search_type, keep_with_score=keep_with_score,
+                                 return_score=return_score, lexical_index=lexical_index, fetch_k=fetch_k, rrf_k=rrf_k,
+                                 reranker=reranker) for query in queries]
+    if reranker is not None:
+        candidates = search_vector_db_batch(queries, vector_store, k=max(reranker.fetch_k, k), search_type=search_type,
+                                            keep_with_score=keep_with_score, return_score=True)
+        results = [reranker.rerank(query, documents) for query, documents in zip(queries, candidates)]
+        return results if return_score else [[doc[0] for doc in documents] for documents in results]
+
+    vectors = np.array(embed_queries(vector_store.embeddings, queries), dtype=np.float32)
+    if vector_store._normalize_L2:
+        faiss.normalize_L2(vectors)
+    if hasattr(vector_store, "search_vectors"):
+        distances, indices = vector_store.search_vectors(vectors, k)
+    else:
+        distances, indices = vector_store.index.search(vectors, k)
+
+    relevance_fn = vector_store._select_relevance_score_fn() if search_type.lower() == "relevance" else None
+    results = []
+    for query_distances, query_indices in zip(distances, indices):
+        documents = []
+        for position, distance in zip(query_indices, query_distances):
+            if position == -1:
+                continue
+            doc = vector_store.docstore.search(vector_store.index_to_docstore_id[int(position)])
+            if not isinstance(doc, Document):
+                continue
+            score = float(distance) if relevance_fn is None else relevance_fn(float(distance))
+            documents.append((doc, score))
+
+        if keep_with_score is not None:
+            if relevance_fn is None:
+                documents = [doc for doc in documents if doc[1] <= keep_with_score]
+            else:
+                documents = [doc for doc in documents if doc[1] >= keep_with_score]
+        results.append(documents if return_score else [doc[0] for doc in documents])
+
+    logger.debug(f"Batch searched {len(queries)} queries.")
+    return results
+
+
+def read_queries(file_path):
+    """
+    Reads a JSONL file of queries. Each line is a JSON string or an object with a "query"
+    and optional "id" and "filter" fields.
+    """
+    queries = []
+    with open(file_path, "r") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, str):
+                entry = {"query": entry}
+            entry.setdefault("id", line_number)
+            queries.append(entry)
+    return queries
+
+
+def run_batch_search(queries, vector_store, output_file, config, metadata_index=None, batch_size=64,
+                     lexical_index=None, reranker=None):
+    """
+    Searches the queries in batches and writes one JSONL line per query with its hits,
+    scores and the per-query share of the batch time. Queries with a filter are searched
+    one at a time.
+    """
+    start = time.perf_counter()
+    with open(output_file, "w") as file:
+        for batch_start in range(0, len(queries), batch_size):
+            batch = queries[batch_start:batch_start + batch_size]
+            plain = [entry for entry in batch if not entry.get("filter")]
+
+            batch_timer = time.perf_counter()
+            results = dict(zip(
+                (id(entry) for entry in plain),
+                search_vector_db_batch([entry["query"] for entry in plain], vector_store, k=config.num_documents,
+                                       search_type=config.sim_search_type, keep_with_score=config.keep_with_score,
+                                       return_score=True, lexical_index=lexical_index, fetch_k=config.hybrid_fetch_k,
+                                       rrf_k=config.rrf_k, reranker=reranker),
+            ))
+            batch_ms = (time.perf_counter() - batch_timer) * 1000
+
+            for entry in batch:
+                if entry.get("filter"):
+                    query_timer = time.perf_counter()
+                    documents = search_vector_db(entry["query"], vector_store, k=config.num_documents, search_type=config.sim_search_type,
+                                                 keep_with_score=config.keep_with_score, filter=entry["filter"], return_score=True,
+                                                 metadata_index=metadata_index, lexical_index=lexical_index,
+                                                 fetch_k=config.hybrid_fetch_k, rrf_k=config.rrf_k, reranker=reranker)
+                    latency_ms = (time.perf_counter() - query_timer) * 1000
+                else:
+                    documents = results[id(entry)]
+                    latency_ms = batch_ms / len(plain)
+
+                file.write(json.dumps({
+                    "id": entry["id"],
+                    "query": entry["query"],
+                    "latency_ms": round(latency_ms, 3),
+                    "hits": [
+                        {
+                            "doc_id": doc.id,
+                            "file_name": doc.metadata.get("file_name"),
+                            "url": doc.metadata.get("url"),
+                            "score": score,
+                        }
+                        for doc, score in documents
+                    ],
+                }) + "\n")
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Batch search of {len(queries)} queries written to {output_file} in {elapsed:.2f} s "
+                f"({len(queries) / elapsed if elapsed else 0:.1f} queries/s)")
 
 
 
@@ -52,15 +271,15 @@ def display_search_results(documents):
 
     """
     for doc, score in documents:
-        print(f"Document File: {doc.metadata["file_name"]}, Score: {score}\n")
+        print(f"Document File: {doc.metadata['file_name']}, Score: {score}\n")
         print(f"Document content: {doc.page_content}\n")
     
     print(f"SUMMARY - Number of Doc-{len(documents)}\n")
     for doc, score in documents:
-        print(f"Doc name-{doc.metadata["file_name"]} and Score: {score}\n")
+        print(f"Doc name-{doc.metadata['file_name']} and Score: {score}\n")
 
 
-def main_search_db(config=None):
+def main_search_db(config=None, queries_file=None, output_file=None):
     # Load the vector database and embedding function
 
     if config is None:
@@ -69,11 +288,33 @@ def main_search_db(config=None):
     embedding = EmbeddingFactory.get_embeddings_from_config(config)
     vector_store = VectorStoreFactory.get_vector_store_from_config(embedding, config)
 
+    # Same retrieval stack as the chatbot pipeline, so the results match what it serves.
+    lexical_index = None
+    if config.sim_search_type == "hybrid":
+        logger.info("Loading lexical index...")
+        lexical_index = load_lexical_index(config)
+        if lexical_index is None:
+            raise ValueError("search_type is hybrid but the lexical index is missing. Run --processpdf to build it.")
+
+    reranker = None
+    if config.rerank_enabled:
+        logger.info("Loading reranker...")
+        reranker = load_reranker(config)
+
+    if queries_file is not None:
+        queries = read_queries(queries_file)
+        metadata_index = load_metadata_index(config) if any(entry.get("filter") for entry in queries) else None
+        run_batch_search(queries, vector_store, output_file or "search_results.jsonl", config,
+                         metadata_index=metadata_index, batch_size=config.search_batch_size,
+                         lexical_index=lexical_index, reranker=reranker)
+        return
+
     while True:
         query = input("Enter Query: - ")
         if query == "exit":
             break
-        documents = search_vector_db(query, vector_store, k=config.num_documents, search_type="relevance", keep_with_score=config.min_search_score, return_score=True)
+        documents = search_vector_db(query, vector_store, k=config.num_documents, search_type=config.sim_search_type, keep_with_score=config.keep_with_score, return_score=True,
+                                     lexical_index=lexical_index, fetch_k=config.hybrid_fetch_k, rrf_k=config.rrf_k, reranker=reranker)
         # Display the results
         display_search_results(documents)
         
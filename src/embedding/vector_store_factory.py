@@ -1,12 +1,24 @@
 import faiss
+import json
+import numpy as np
+import os
+import pathlib
+from langchain_core.documents import Document
 from langchain_core.vectorstores import InMemoryVectorStore
 from langchain_community.vectorstores import FAISS
 from langchain_community.docstore.in_memory import InMemoryDocstore
+from embedding.docstore import SQLiteDocstore
+from embedding.numpy_vector_store import VECTORS_SUFFIX, NumpyVectorStore
+from embedding.two_stage_faiss import FULL_VECTORS_SUFFIX, TwoStageFAISS
 from utils import get_logger
 from config import Config
 
 logger = get_logger()
 
+SQLITE_DOCSTORE_SUFFIX = ".docstore.sqlite"
+# Lists the temporary files of a save that are being moved into place.
+COMMIT_SUFFIX = ".commit.json"
+
 class VectorStoreFactory:
     """Factory class to provide vector stores based on configuration."""
 
@@ -28,7 +40,16 @@ class VectorStoreFactory:
             if file_name is None:
                 return VectorStoreFactory.initialize_vector_store(embedding)
             file_path = config.default_data_path / file_name
-            return VectorStoreFactory.load_vector_db_from_local_if_exist(file_path, embedding)
+            vector_store = VectorStoreFactory.load_vector_db_from_local_if_exist(
+                file_path, embedding, index_name=config.vector_store_index_name, docstore_type=config.docstore_type
+            )
+            return VectorStoreFactory.apply_search_params(vector_store, config)
+
+        elif vector_store_type == "numpy":
+            file_path = config.default_data_path / config.vector_store_file_name
+            return VectorStoreFactory.load_numpy_vector_db(
+                file_path, embedding, index_name=config.vector_store_index_name, dtype=config.numpy_dtype
+            )
 
         else:
             logger.warning(f"Vector store type {vector_store_type} not recognized, defaulting to InMemory.")
@@ -39,30 +60,507 @@ class VectorStoreFactory:
         return InMemoryVectorStore(embedding)
 
     @staticmethod
-    def load_vector_db_from_local_if_exist(file_name, embedding):
+    def load_vector_db_from_local_if_exist(file_name, embedding, index_name="index", docstore_type="pickle", for_update=False):
+        """
+        Loads a saved FAISS store with the docstore format set by `vector_store.docstore` (pickle or sqlite).
+        With `for_update`, a SQLite docstore is opened on a working copy so that the saved file is only replaced on save.
+        """
         try:
-            return FAISS.load_local(file_name, embedding, allow_dangerous_deserialization=True)
+            if docstore_type == "sqlite":
+                vector_store = VectorStoreFactory.load_sqlite_vector_db(file_name, embedding, index_name, for_update=for_update)
+            else:
+                vector_store = FAISS.load_local(file_name, embedding, index_name=index_name, allow_dangerous_deserialization=True)
+            return VectorStoreFactory.load_full_vectors(vector_store, file_name, index_name)
         except Exception as e:
             logger.error(f"Failed to load vector DB from local file {file_name}: {str(e)}")
             print("Using new FAISS vector store\n")
             return VectorStoreFactory.initialize_vector_store(embedding)
 
     @staticmethod
-    def initialize_vector_store(embedding):
-        """Initializes the vector store using FAISS and the given embedding function."""
+    def load_sqlite_vector_db(folder_path, embedding, index_name="index", for_update=False):
+        """
+        Loads a FAISS index saved with the SQLite docstore. Only the vector ID mapping is read
+        at startup; chunk text and metadata stay on disk until a search returns them.
+        """
+        folder_path = pathlib.Path(folder_path)
+        VectorStoreFactory.recover_interrupted_save(folder_path, index_name)
+        index = faiss.read_index(str(folder_path / f"{index_name}.faiss"))
+        docstore = VectorStoreFactory.open_sqlite_docstore(folder_path, index_name, for_update=for_update)
+        index_to_docstore_id = docstore.load_index_to_docstore_id()
+        logger.info(f"Loaded {index.ntotal} vectors with SQLite docstore from {folder_path}")
+        return FAISS(
+            embedding_function=embedding,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+        )
+
+    @staticmethod
+    def is_quantized(index):
+        """True for PQ and SQ8 indexes, whose stored vectors are lossy."""
+        ivf_index = faiss.try_extract_index_ivf(index)
+        if ivf_index is not None:
+            ivf_index = faiss.downcast_index(ivf_index)
+        return isinstance(ivf_index, faiss.IndexIVFPQ) or isinstance(index, faiss.IndexScalarQuantizer)
+
+    @staticmethod
+    def keeps_full_vectors(index):
+        """Indexes saved with their full-precision vectors: PCA for rescoring, PQ/SQ8 for lossless incremental updates."""
+        return isinstance(index, faiss.IndexPreTransform) or VectorStoreFactory.is_quantized(index)
+
+    @staticmethod
+    def load_full_vectors(vector_store, folder_path, index_name="index"):
+        """
+        Wraps a PCA-reduced or quantized index into a TwoStageFAISS store backed by the
+        memory-mapped full-precision vectors saved next to it.
+        """
+        full_vectors_path = pathlib.Path(folder_path) / f"{index_name}{FULL_VECTORS_SUFFIX}"
+        if not VectorStoreFactory.keeps_full_vectors(vector_store.index) or not full_vectors_path.exists():
+            return vector_store
+
+        full_vectors = np.load(full_vectors_path, mmap_mode="r")
+        if full_vectors.shape[0] != vector_store.index.ntotal:
+            logger.warning(f"Full vectors in {full_vectors_path} do not match the index, rescoring is disabled.")
+            return vector_store
+        logger.info(f"Memory-mapped {full_vectors.shape[0]} full-precision vectors for rescoring from {full_vectors_path}")
+        return TwoStageFAISS.from_faiss(vector_store, full_vectors)
+
+    @staticmethod
+    def write_full_vectors(vector_store, folder_path, index_name="index"):
+        """
+        Writes the full-precision vectors of a two-stage store to a temporary file. Returns
+        {path: temporary path}, with None as the temporary path to remove a stale file.
+        """
+        full_vectors_path = pathlib.Path(folder_path) / f"{index_name}{FULL_VECTORS_SUFFIX}"
+        full_vectors = getattr(vector_store, "full_vectors", None)
+        if full_vectors is None:
+            return {full_vectors_path: None}
+
+        tmp_path = full_vectors_path.with_name(full_vectors_path.name + ".tmp")
+        with open(tmp_path, "wb") as file:
+            np.save(file, np.asarray(full_vectors, dtype=np.float32))
+        return {full_vectors_path: tmp_path}
+
+    @staticmethod
+    def save_full_vectors(vector_store, folder_path, index_name="index"):
+        """Saves the full-precision vectors of a two-stage store, or removes a stale file for other indexes."""
+        replacements = VectorStoreFactory.write_full_vectors(vector_store, folder_path, index_name=index_name)
+        VectorStoreFactory.commit_files(folder_path, index_name, replacements)
+
+    @staticmethod
+    def load_numpy_vector_db(folder_path, embedding, index_name="index", dtype="float32", for_update=False):
+        """
+        Opens a NumPy vector store: the vectors are memory-mapped read-only and documents stay
+        in the SQLite docstore. Returns an empty store when nothing has been saved yet.
+        """
+        folder_path = pathlib.Path(folder_path)
+        VectorStoreFactory.recover_interrupted_save(folder_path, index_name)
+        vectors_path = folder_path / f"{index_name}{VECTORS_SUFFIX}"
+        docstore_path = folder_path / f"{index_name}{SQLITE_DOCSTORE_SUFFIX}"
+        if not vectors_path.exists() or not docstore_path.exists():
+            logger.warning(f"No NumPy vector store found at {folder_path}, starting an empty one.")
+            return VectorStoreFactory.initialize_numpy_vector_store(embedding, dtype=dtype)
+
+        vectors = np.load(vectors_path, mmap_mode="r")
+        docstore = VectorStoreFactory.open_sqlite_docstore(folder_path, index_name, for_update=for_update)
+        logger.info(f"Memory-mapped {vectors.shape[0]} {vectors.dtype} vectors from {vectors_path}")
+        return NumpyVectorStore(
+            embedding,
+            vectors.shape[1],
+            vectors=vectors,
+            docstore=docstore,
+            index_to_docstore_id=docstore.load_index_to_docstore_id(),
+            dtype=vectors.dtype,
+        )
+
+    @staticmethod
+    def save_numpy_vector_db(vector_store, folder_path, index_name="index"):
+        """Saves the vectors as a `.npy` file next to the SQLite docstore."""
+        folder_path = pathlib.Path(folder_path)
+        folder_path.mkdir(parents=True, exist_ok=True)
+        replacements = VectorStoreFactory.write_sqlite_docstore(vector_store, folder_path, index_name=index_name)
+
+        vectors_path = folder_path / f"{index_name}{VECTORS_SUFFIX}"
+        tmp_path = vectors_path.with_name(vectors_path.name + ".tmp")
+        with open(tmp_path, "wb") as file:
+            np.save(file, np.asarray(vector_store.vectors, dtype=vector_store.dtype))
+        replacements[vectors_path] = tmp_path
+
+        VectorStoreFactory.commit_files(folder_path, index_name, replacements)
+        VectorStoreFactory.reopen_sqlite_docstore(vector_store, folder_path, index_name)
+
+    @staticmethod
+    def initialize_numpy_vector_store(embedding, dtype="float32", docstore=None):
+        embedding_dim = len(embedding.embed_query("hello world"))
+        return NumpyVectorStore(embedding, embedding_dim, docstore=docstore, dtype=dtype)
+
+    @staticmethod
+    def save_sqlite_vector_db(vector_store, folder_path, index_name="index"):
+        """Saves the FAISS index and its full-precision vectors next to a SQLite docstore, as one unit."""
+        folder_path = pathlib.Path(folder_path)
+        folder_path.mkdir(parents=True, exist_ok=True)
+        replacements = VectorStoreFactory.write_sqlite_docstore(vector_store, folder_path, index_name=index_name)
+
+        tmp_index_path = folder_path / f"{index_name}.faiss.tmp"
+        faiss.write_index(vector_store.index, str(tmp_index_path))
+        replacements[folder_path / f"{index_name}.faiss"] = tmp_index_path
+        replacements.update(VectorStoreFactory.write_full_vectors(vector_store, folder_path, index_name=index_name))
+
+        VectorStoreFactory.commit_files(folder_path, index_name, replacements)
+        VectorStoreFactory.reopen_sqlite_docstore(vector_store, folder_path, index_name)
+
+    @staticmethod
+    def save_pickle_vector_db(vector_store, folder_path, index_name="index"):
+        """Saves the FAISS index and an in-memory copy of the docstore with `FAISS.save_local` (index.pkl)."""
+        folder_path = pathlib.Path(folder_path)
+        docstore = vector_store.docstore
+        if isinstance(docstore, SQLiteDocstore):
+            # A SQLite connection cannot be pickled; copy the documents into memory first.
+            vector_store.docstore = InMemoryDocstore({
+                doc_id: docstore.search(doc_id) for doc_id in vector_store.index_to_docstore_id.values()
+            })
+            docstore.close()
+        vector_store.save_local(folder_path, index_name=index_name)
+
+    @staticmethod
+    def remove_other_docstore(folder_path, index_name="index", docstore_type="pickle"):
+        """Deletes the docstore file of the format that is not in use, so it cannot go stale next to the index."""
+        folder_path = pathlib.Path(folder_path)
+        if docstore_type == "sqlite":
+            stale_paths = [folder_path / f"{index_name}.pkl"]
+        else:
+            sqlite_path = folder_path / f"{index_name}{SQLITE_DOCSTORE_SUFFIX}"
+            stale_paths = [sqlite_path, sqlite_path.with_name(sqlite_path.name + "-wal"),
+                           sqlite_path.with_name(sqlite_path.name + "-shm")]
+        for path in stale_paths:
+            if path.exists():
+                logger.info(f"Removing {path}, the vector store now uses the {docstore_type} docstore.")
+                path.unlink()
+
+    @staticmethod
+    def get_working_docstore_path(folder_path, index_name="index"):
+        """Temporary docstore file written by ingestion and moved over the saved one on save."""
+        return pathlib.Path(folder_path) / f"{index_name}{SQLITE_DOCSTORE_SUFFIX}.tmp"
+
+    @staticmethod
+    def open_sqlite_docstore(folder_path, index_name="index", for_update=False):
+        """
+        Opens the saved SQLite docstore. With `for_update` the saved file is copied to the working
+        docstore and the copy is returned, so that processes reading the saved file are not affected
+        by the deletes and inserts of an ingestion run.
+        """
+        docstore = SQLiteDocstore(pathlib.Path(folder_path) / f"{index_name}{SQLITE_DOCSTORE_SUFFIX}")
+        if not for_update:
+            return docstore
+
+        working_path = VectorStoreFactory.get_working_docstore_path(folder_path, index_name)
+        working_path.unlink(missing_ok=True)
+        working_docstore = docstore.copy_to(working_path)
+        docstore.close()
+        return working_docstore
+
+    @staticmethod
+    def create_working_docstore(folder_path, index_name="index"):
+        """Returns an empty working docstore for a full rebuild, so the documents are written to disk as they are added."""
+        folder_path = pathlib.Path(folder_path)
+        folder_path.mkdir(parents=True, exist_ok=True)
+        working_path = VectorStoreFactory.get_working_docstore_path(folder_path, index_name)
+        working_path.unlink(missing_ok=True)
+        return SQLiteDocstore(working_path)
+
+    @staticmethod
+    def write_sqlite_docstore(vector_store, folder_path, index_name="index"):
+        """
+        Writes the documents and the vector ID mapping to the working docstore file. A working
+        docstore opened for update is committed and closed; any other docstore is copied into a
+        new file. Returns {saved docstore path: working path} for `commit_files`.
+        """
+        folder_path = pathlib.Path(folder_path)
+        folder_path.mkdir(parents=True, exist_ok=True)
+        docstore_path = folder_path / f"{index_name}{SQLITE_DOCSTORE_SUFFIX}"
+        working_path = VectorStoreFactory.get_working_docstore_path(folder_path, index_name)
+        docstore = vector_store.docstore
+
+        if isinstance(docstore, SQLiteDocstore) and pathlib.Path(docstore.db_path).resolve() == working_path.resolve():
+            docstore.save_index_to_docstore_id(vector_store.index_to_docstore_id)
+            docstore.commit()
+            docstore.close()
+        else:
+            working_path.unlink(missing_ok=True)
+            documents = ((doc_id, docstore.search(doc_id)) for doc_id in vector_store.index_to_docstore_id.values())
+            SQLiteDocstore.from_documents(working_path, documents, vector_store.index_to_docstore_id).close()
+        return {docstore_path: working_path}
+
+    @staticmethod
+    def reopen_sqlite_docstore(vector_store, folder_path, index_name="index"):
+        """Points a store whose working docstore was closed by the save to the saved file."""
+        docstore = vector_store.docstore
+        working_path = VectorStoreFactory.get_working_docstore_path(folder_path, index_name)
+        if isinstance(docstore, SQLiteDocstore) and pathlib.Path(docstore.db_path).resolve() == working_path.resolve():
+            vector_store.docstore = SQLiteDocstore(pathlib.Path(folder_path) / f"{index_name}{SQLITE_DOCSTORE_SUFFIX}")
+
+    @staticmethod
+    def commit_files(folder_path, index_name, replacements):
+        """
+        Moves the temporary files of a save into place, given as {path: temporary path or None
+        to remove the file}. The moves are recorded in a commit file first, so that a save
+        interrupted between two moves is completed by the next load instead of leaving a new
+        docstore next to an old index.
+        """
+        commit_path = pathlib.Path(folder_path) / f"{index_name}{COMMIT_SUFFIX}"
+        for tmp_path in replacements.values():
+            if tmp_path is not None:
+                with open(tmp_path, "rb") as file:
+                    os.fsync(file.fileno())
+
+        tmp_commit_path = commit_path.with_name(commit_path.name + ".tmp")
+        with open(tmp_commit_path, "w") as file:
+            json.dump([[str(path), str(tmp_path) if tmp_path is not None else None]
+                       for path, tmp_path in replacements.items()], file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_commit_path, commit_path)
+        VectorStoreFactory.apply_commit(commit_path)
+
+    @staticmethod
+    def apply_commit(commit_path):
+        with open(commit_path, "r") as file:
+            moves = json.load(file)
+        for path, tmp_path in moves:
+            try:
+                if tmp_path is None:
+                    os.unlink(path)
+                else:
+                    os.replace(tmp_path, path)
+            except FileNotFoundError:
+                # Already moved (or removed) before the interruption.
+                pass
+        commit_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def recover_interrupted_save(folder_path, index_name="index"):
+        """Completes a save that stopped after writing its commit file."""
+        commit_path = pathlib.Path(folder_path) / f"{index_name}{COMMIT_SUFFIX}"
+        if commit_path.exists():
+            logger.warning(f"Completing the interrupted save recorded in {commit_path}.")
+            VectorStoreFactory.apply_commit(commit_path)
+
+    @staticmethod
+    def get_dimension(vector_store):
+        index = getattr(vector_store, "index", None)
+        return index.d if index is not None else vector_store.dim
+
+    @staticmethod
+    def initialize_vector_store(embedding, docstore=None):
+        """Initializes the vector store using FAISS and the given embedding function, with an in-memory docstore unless one is given."""
         try:
             embedding_dim = len(embedding.embed_query("hello world"))
             index = faiss.IndexFlatL2(embedding_dim)
             return FAISS(
                 embedding_function=embedding,
                 index=index,
-                docstore=InMemoryDocstore(),
+                docstore=docstore if docstore is not None else InMemoryDocstore(),
                 index_to_docstore_id={},
             )
         except Exception as e:
             logger.error(f"Failed to initialize vector store: {str(e)}")
             raise ValueError(f"Failed to initialize vector store: {str(e)}")
 
+    @staticmethod
+    def get_index_factory_string(config, num_vectors):
+        """
+        Returns the FAISS index factory string for the configured index type, or None
+        when a flat index should be kept.
+        """
+        index_type = config.vector_index_type
+        # FAISS wants roughly 39 training points per IVF list.
+        nlist = max(1, min(config.nlist, num_vectors // 39))
+
+        if index_type == "flat":
+            return None
+        elif index_type == "hnsw":
+            return f"HNSW{config.hnsw_m}"
+        elif index_type == "ivf_flat":
+            return f"IVF{nlist},Flat"
+        elif index_type == "ivf_pq":
+            if num_vectors < 2 ** config.pq_nbits:
+                logger.warning(f"Not enough vectors ({num_vectors}) to train PQ{config.pq_m}x{config.pq_nbits}, keeping a flat index.")
+                return None
+            return f"IVF{nlist},PQ{config.pq_m}x{config.pq_nbits}"
+        elif index_type == "sq8":
+            return "SQ8"
+        elif index_type == "pca":
+            if num_vectors < config.pca_dim:
+                logger.warning(f"Not enough vectors ({num_vectors}) to train PCA{config.pca_dim}, keeping a flat index.")
+                return None
+            return f"PCA{config.pca_dim},Flat"
+        else:
+            logger.warning(f"Vector index type {index_type} not recognized, keeping a flat index.")
+            return None
+
+    @staticmethod
+    def get_all_vectors(index):
+        """Reconstructs every vector stored in a FAISS index, in position order."""
+        ivf_index = faiss.try_extract_index_ivf(index)
+        if ivf_index is not None:
+            ivf_index.make_direct_map()
+        return index.reconstruct_n(0, index.ntotal)
+
+    @staticmethod
+    def build_index(vector_store, config=None):
+        """
+        Replaces the flat index filled during ingestion by the configured approximate
+        index type, trained on the corpus vectors. Positions are preserved, so
+        `index_to_docstore_id` stays valid.
+        """
+        if config is None:
+            config = Config.default_config()
+
+        if isinstance(vector_store, NumpyVectorStore):
+            return vector_store
+        index = vector_store.index
+        factory_string = VectorStoreFactory.get_index_factory_string(config, index.ntotal)
+        if factory_string is None or index.ntotal == 0:
+            return vector_store
+        if factory_string.startswith("PCA") and config.pca_dim >= index.d:
+            logger.warning(f"pca_dim {config.pca_dim} is not below the vector size {index.d}, keeping a flat index.")
+            return vector_store
+
+        logger.info(f"Building {factory_string} index over {index.ntotal} vectors")
+        vectors = VectorStoreFactory.get_all_vectors(index)
+        ann_index = faiss.index_factory(index.d, factory_string)
+        if isinstance(ann_index, faiss.IndexHNSW):
+            ann_index.hnsw.efConstruction = config.ef_construction
+        ann_index.train(vectors)
+        ann_index.add(vectors)
+
+        vector_store.index = ann_index
+        if VectorStoreFactory.keeps_full_vectors(ann_index):
+            # Keep the full-precision vectors to rescore the shortlist found in the reduced space, and
+            # for quantized indexes to rebuild a lossless flat index on the next incremental update.
+            vector_store = TwoStageFAISS.from_faiss(vector_store, vectors)
+        return VectorStoreFactory.apply_search_params(vector_store, config)
+
+    @staticmethod
+    def to_flat(vector_store):
+        """
+        Converts an approximate index back to a flat one so that vectors can be deleted and
+        appended during incremental updates. PCA, PQ and SQ8 indexes are rebuilt from their
+        full-precision vectors; reconstructions are only used for indexes saved without them.
+        """
+        if isinstance(vector_store, NumpyVectorStore):
+            return vector_store
+        index = vector_store.index
+        if isinstance(index, faiss.IndexFlat):
+            return vector_store
+
+        full_vectors = getattr(vector_store, "full_vectors", None)
+        if full_vectors is not None:
+            flat_index = faiss.IndexFlatL2(index.d)
+            flat_index.add(np.asarray(full_vectors, dtype=np.float32))
+            vector_store.index = flat_index
+            vector_store.full_vectors = None
+            return vector_store
+
+        if VectorStoreFactory.is_quantized(index):
+            logger.warning("Rebuilding a flat index from quantized vectors saved without full-precision vectors; "
+                           "precision lost by quantization is not recovered. Rebuild from scratch to restore it.")
+
+        flat_index = faiss.IndexFlatL2(index.d)
+        if index.ntotal:
+            flat_index.add(VectorStoreFactory.get_all_vectors(index))
+        vector_store.index = flat_index
+        return vector_store
+
+    @staticmethod
+    def apply_search_params(vector_store, config=None):
+        """Applies efSearch / nprobe from `document_search` to HNSW and IVF indexes."""
+        if config is None:
+            config = Config.default_config()
+
+        index = getattr(vector_store, "index", None)
+        if index is None:
+            return vector_store
+
+        parameter_space = faiss.ParameterSpace()
+        if isinstance(index, faiss.IndexHNSW):
+            parameter_space.set_index_parameter(index, "efSearch", config.ef_search)
+            logger.debug(f"HNSW efSearch set to {config.ef_search}")
+        elif faiss.try_extract_index_ivf(index) is not None:
+            parameter_space.set_index_parameter(index, "nprobe", config.nprobe)
+            logger.debug(f"IVF nprobe set to {config.nprobe}")
+        if isinstance(vector_store, TwoStageFAISS):
+            vector_store.rescore_factor = config.rescore_factor
+            logger.debug(f"Two-stage rescoring of {config.rescore_factor}x k candidates")
+        return vector_store
+
+    @staticmethod
+    def compact(vector_store):
+        """
+        Re-keys `index_to_docstore_id` to the contiguous positions of the FAISS index and drops
+        docstore entries that no longer have a vector, so deletes leave no holes behind.
+        The NumPy store renumbers on delete and needs no compaction.
+        """
+        if isinstance(vector_store, NumpyVectorStore):
+            return vector_store
+        if vector_store.index.ntotal != len(vector_store.index_to_docstore_id):
+            raise ValueError(f"Vector store is inconsistent: {vector_store.index.ntotal} vectors "
+                             f"for {len(vector_store.index_to_docstore_id)} docstore IDs")
+
+        vector_store.index_to_docstore_id = {
+            position: doc_id
+            for position, (_, doc_id) in enumerate(sorted(vector_store.index_to_docstore_id.items()))
+        }
+
+        live_ids = set(vector_store.index_to_docstore_id.values())
+        docstore_dict = getattr(vector_store.docstore, "_dict", None)
+        if isinstance(vector_store.docstore, SQLiteDocstore):
+            num_orphans = vector_store.docstore.prune(live_ids)
+            logger.debug(f"Compaction removed {num_orphans} orphan docstore entries.")
+        elif docstore_dict is not None:
+            orphan_ids = [doc_id for doc_id in docstore_dict if doc_id not in live_ids]
+            for doc_id in orphan_ids:
+                del docstore_dict[doc_id]
+            logger.debug(f"Compaction removed {len(orphan_ids)} orphan docstore entries.")
+
+        logger.info(f"Vector store compacted to {vector_store.index.ntotal} vectors.")
+        return vector_store
+
+    @staticmethod
+    def update_metadata(vector_store, updates):
+        """Merges {doc_id: metadata fields} into the metadata of documents already in the docstore."""
+        docstore = vector_store.docstore
+        metadata_by_id = {}
+        for doc_id, fields in updates.items():
+            doc = docstore.search(doc_id)
+            if isinstance(doc, Document):
+                metadata_by_id[doc_id] = {**doc.metadata, **fields}
+
+        if isinstance(docstore, SQLiteDocstore):
+            docstore.update_metadata(metadata_by_id)
+        else:
+            for doc_id, metadata in metadata_by_id.items():
+                docstore.search(doc_id).metadata = metadata
+        logger.debug(f"Updated the metadata of {len(metadata_by_id)} documents.")
+
+    @staticmethod
+    def get_index_version(config=None):
+        """
+        Returns a token that changes every time the saved index is rewritten
+        (the modification time of the index file), or None if it does not exist.
+        Read it when the store is loaded: a running pipeline does not pick up a rewritten
+        index until it is restarted.
+        """
+        if config is None:
+            config = Config.default_config()
+
+        suffix = VECTORS_SUFFIX if config.vector_store_type == "numpy" else ".faiss"
+        index_file = config.default_data_path / config.vector_store_file_name / f"{config.vector_store_index_name}{suffix}"
+        try:
+            return os.stat(index_file).st_mtime_ns
+        except OSError:
+            return None
+
     @staticmethod
     def save_local(vector_store, config=None):
         """
@@ -74,8 +572,15 @@ class VectorStoreFactory:
         file_path = config.default_data_path / config.vector_store_file_name
         index_name = config.vector_store_index_name
         try:
-
-            vector_store.save_local(file_path, index_name=index_name)
+            if isinstance(vector_store, NumpyVectorStore):
+                VectorStoreFactory.save_numpy_vector_db(vector_store, file_path, index_name=index_name)
+            elif config.docstore_type == "sqlite":
+                VectorStoreFactory.save_sqlite_vector_db(vector_store, file_path, index_name=index_name)
+                VectorStoreFactory.remove_other_docstore(file_path, index_name=index_name, docstore_type="sqlite")
+            else:
+                VectorStoreFactory.save_pickle_vector_db(vector_store, file_path, index_name=index_name)
+                VectorStoreFactory.remove_other_docstore(file_path, index_name=index_name, docstore_type="pickle")
+                VectorStoreFactory.save_full_vectors(vector_store, file_path, index_name=index_name)
             logger.info(f"Vector store saved successfully to {file_path} with index name {index_name}.")
         except Exception as e:
             logger.error(f"Failed to save vector store to {file_path}: {str(e)}")
@@ -1,12 +1,18 @@
+import time
+
+_START_TIME = time.perf_counter()
+
 import argparse
 import sys
 from config import Config
 from utils import setup_logger
-from embedding.processPDF import main_process_pdf
-from embedding.vector_db_search import main_search_db
-from scraper.scraper import main_scraper
-from model.model import run_terminal_chatbot
-from streamlit.web import cli as stcli
+
+
+def log_startup_time(logger, entry_point):
+    """Logs the time spent importing and configuring before the entry point starts working."""
+    elapsed_ms = (time.perf_counter() - _START_TIME) * 1000
+    logger.info(f"Startup for {entry_point} completed in {elapsed_ms:.1f} ms")
+
 
 def main():
     default_config = Config.default_config()
@@ -20,14 +26,20 @@ def main():
     # Add argument flags for each task
     parser.add_argument('--processpdf', action='store_true', help="Trigger PDF processing")
     parser.add_argument('--searchdoc', action='store_true', help="Trigger document search")
+    parser.add_argument('--queries', help="JSONL file of queries to search in batch with --searchdoc")
+    parser.add_argument('--output', default="search_results.jsonl", help="JSONL file receiving the --searchdoc batch results")
     parser.add_argument('--scrapedoc', action='store_true', help="Trigger document scraping")
-    parser.add_argument('--runchatbot', choices=['terminal', 'web'], help="Run the RAG-based chatbot in terminal or web mode")
+    parser.add_argument('--runchatbot', choices=['terminal', 'web', 'api'], help="Run the RAG-based chatbot in terminal, web or HTTP API mode")
 
-    # Parse argumentsgit 
+    # Parse arguments
     args = parser.parse_args()
+
+    # Each task imports its own dependencies so that it does not pay for the others'.
     if args.processpdf:
         logger.info("Starting Process PDF")
         try:
+            from embedding.processPDF import main_process_pdf
+            log_startup_time(logger, "--processpdf")
             main_process_pdf(default_config)
             logger.info("PDF processing completed successfully.")
         except Exception as e:
@@ -36,7 +48,9 @@ def main():
     elif args.searchdoc:
         logger.info("Starting Document Search")
         try:
-            main_search_db(default_config)
+            from embedding.vector_db_search import main_search_db
+            log_startup_time(logger, "--searchdoc")
+            main_search_db(default_config, queries_file=args.queries, output_file=args.output)
             logger.info("Document search completed successfully.")
         except Exception as e:
             logger.error(f"Error during document search: {str(e)}")
@@ -44,6 +58,8 @@ def main():
     elif args.scrapedoc:
         logger.info("Starting Document Scraping")
         try:
+            from scraper.scraper import main_scraper
+            log_startup_time(logger, "--scrapedoc")
             main_scraper(default_config)
             logger.info("Document scraping completed successfully.")
         except Exception as e:
@@ -55,6 +71,8 @@ def main():
         
             try:
                 logger.info("Starting chatbot in Terminal mode.")
+                from model.model import run_terminal_chatbot
+                log_startup_time(logger, "--runchatbot terminal")
                 run_terminal_chatbot(default_config)  
             except Exception as e:
                 logger.error(f"Error during running chatbot in terminal mode: {str(e)}")
@@ -63,6 +81,8 @@ def main():
         
             try:
                 logger.info("Starting chatbot in Web mode.")
+                from streamlit.web import cli as stcli
+                log_startup_time(logger, "--runchatbot web")
 
                 sys.argv = ["streamlit", "run", "./web/app.py"]
                 sys.exit(stcli.main())
@@ -70,6 +90,16 @@ def main():
             except Exception as e:
                 logger.error(f"Error during running chatbot in Web mode: {str(e)}")
 
+        elif args.runchatbot == 'api':
+
+            try:
+                logger.info("Starting chatbot in API mode.")
+                from web.api import run_api_server
+                log_startup_time(logger, "--runchatbot api")
+                run_api_server(default_config)
+            except Exception as e:
+                logger.error(f"Error during running chatbot in API mode: {str(e)}")
+
     else:
         logger.error("Error: No valid argument provided. Use --processpdf, --searchdoc, --scrapedoc, or --runchatbot.")
         print("Error: No valid argument provided. Use -processpdf, -searchdoc, -scrapedoc, or -runchatbot.")
@@ -0,0 +1,184 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from model.retrieval_cache import normalize_query
+from utils import get_logger
+
+logger = get_logger()
+
+
+class SemanticAnswerCache:
+    """
+    Cache of final answers to single-turn questions, looked up by embedding similarity.
+
+    A question is answered from the cache when its embedding has a cosine similarity of at
+    least `threshold` with a previously answered question, the entry was produced by the
+    current index version and every document the answer was grounded on still exists.
+    Least recently used entries are evicted beyond `max_entries`; entries older than
+    `ttl_seconds` expire. When `persist_path` is set the cache is kept in a SQLite file as
+    well: each change writes only the rows it adds or removes, and the cache is restored
+    from the file at startup.
+    """
+
+    def __init__(self, embedding, threshold=0.95, max_entries=1000, ttl_seconds=None, persist_path=None,
+                 version_fn=None, documents_exist_fn=None):
+        self.embedding = embedding
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.version_fn = version_fn
+        self.documents_exist_fn = documents_exist_fn
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._matrix = None
+        self._matrix_keys = []
+        self._lock = threading.Lock()
+        self._connection = None
+        if persist_path:
+            self._open()
+            self._load()
+
+    def lookup(self, question):
+        """Returns a cached answer for the question, or None."""
+        vector = self._embed(question)
+        with self._lock:
+            self._drop_invalid_entries()
+            key, similarity = self._nearest(vector)
+            entry = self.entries.get(key) if key is not None else None
+
+            if (entry is not None and similarity >= self.threshold and entry["doc_ids"]
+                    and self._documents_exist(entry["doc_ids"])):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                logger.info(f"Answer cache hit (similarity {similarity:.3f}) for: {question}")
+                return entry["answer"]
+
+            self.misses += 1
+            return None
+
+    def store(self, question, answer, doc_ids):
+        """Caches the answer. Answers without supporting documents are not cached."""
+        if not doc_ids:
+            logger.debug(f"Not caching an answer without supporting documents for: {question}")
+            return
+        vector = self._embed(question)
+        with self._lock:
+            key = normalize_query(question)
+            self.entries[key] = {
+                "embedding": vector,
+                "answer": answer,
+                "doc_ids": list(doc_ids),
+                "version": self._current_version(),
+                "created": time.time(),
+            }
+            self.entries.move_to_end(key)
+            evicted_keys = []
+            while len(self.entries) > self.max_entries:
+                evicted_keys.append(self.entries.popitem(last=False)[0])
+            self._matrix = None
+            self._persist(stored_key=key, deleted_keys=evicted_keys)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self.entries),
+        }
+
+    def _embed(self, question):
+        vector = np.asarray(self.embedding.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _nearest(self, vector):
+        if not self.entries:
+            return None, 0.0
+        if self._matrix is None:
+            self._matrix_keys = list(self.entries)
+            self._matrix = np.stack([self.entries[key]["embedding"] for key in self._matrix_keys])
+        similarities = self._matrix @ vector
+        best = int(np.argmax(similarities))
+        return self._matrix_keys[best], float(similarities[best])
+
+    def _current_version(self):
+        return self.version_fn() if self.version_fn else None
+
+    def _documents_exist(self, doc_ids):
+        return self.documents_exist_fn is None or self.documents_exist_fn(doc_ids)
+
+    def _drop_invalid_entries(self):
+        version = self._current_version()
+        now = time.time()
+        stale_keys = [
+            key for key, entry in self.entries.items()
+            if entry["version"] != version or (self.ttl_seconds and now - entry["created"] > self.ttl_seconds)
+        ]
+        for key in stale_keys:
+            del self.entries[key]
+        if stale_keys:
+            logger.info(f"Dropped {len(stale_keys)} expired or outdated answer cache entries.")
+            self._matrix = None
+            self._persist(deleted_keys=stale_keys)
+
+    def _open(self):
+        try:
+            self._connection = sqlite3.connect(str(self.persist_path), check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " question TEXT PRIMARY KEY,"
+                " embedding BLOB NOT NULL,"
+                " answer TEXT NOT NULL,"
+                " doc_ids TEXT NOT NULL,"
+                " version,"
+                " created REAL NOT NULL)"
+            )
+            self._connection.commit()
+        except Exception as e:
+            logger.error(f"Failed to open answer cache at {self.persist_path}, keeping it in memory only: {e}")
+            self._connection = None
+
+    def _load(self):
+        if self._connection is None:
+            return
+        try:
+            rows = self._connection.execute(
+                "SELECT question, embedding, answer, doc_ids, version, created FROM answers ORDER BY created"
+            ).fetchall()
+        except Exception as e:
+            logger.error(f"Failed to load answer cache from {self.persist_path}: {e}")
+            return
+        for question, embedding, answer, doc_ids, version, created in rows:
+            self.entries[question] = {
+                "embedding": np.frombuffer(embedding, dtype=np.float32),
+                "answer": answer,
+                "doc_ids": json.loads(doc_ids),
+                "version": version,
+                "created": created,
+            }
+        logger.info(f"Loaded {len(self.entries)} answer cache entries from {self.persist_path}")
+
+    def _persist(self, stored_key=None, deleted_keys=()):
+        """Writes the stored entry and removes the deleted ones; called with the lock held."""
+        if self._connection is None:
+            return
+        try:
+            if deleted_keys:
+                self._connection.executemany("DELETE FROM answers WHERE question = ?", [(key,) for key in deleted_keys])
+            if stored_key is not None:
+                entry = self.entries[stored_key]
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO answers (question, embedding, answer, doc_ids, version, created) VALUES (?, ?, ?, ?, ?, ?)",
+                    (stored_key, entry["embedding"].astype(np.float32).tobytes(), entry["answer"],
+                     json.dumps(entry["doc_ids"]), entry["version"], entry["created"]),
+                )
+            self._connection.commit()
+        except Exception as e:
+            logger.error(f"Failed to save answer cache to {self.persist_path}: {e}")
@@ -0,0 +1,180 @@
+"""
+Concurrency benchmark of the RAG graph: sync `invoke` on a thread pool vs async `ainvoke`.
+
+The LLM is replaced by a fake chat model that waits a fixed latency per call (blocking sleep
+for sync calls, `asyncio.sleep` for async calls) and the embeddings by a deterministic fake,
+so the run measures how many sessions a process keeps in flight while waiting on the LLM.
+Caches, the intent router and speculative retrieval are disabled so every session makes
+both LLM calls and one search.
+
+    cd src
+    python -m model.benchmark --sessions 200 --sync-threads 16 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import yaml
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from config import Config
+from model.model import PipelineFactory
+
+
+class SlowFakeChatModel(BaseChatModel):
+    """Answers after `latency` seconds. The copy returned by `bind_tools` asks for a retrieval instead."""
+
+    latency: float = 0.5
+    routing: bool = False
+
+    @property
+    def _llm_type(self):
+        return "slow-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"routing": True})
+
+    def _result(self, messages):
+        if self.routing:
+            tool_call = {"name": "retrieve", "args": {"query": messages[-1].content}, "id": f"call_{uuid.uuid4().hex}"}
+            message = AIMessage("", tool_calls=[tool_call])
+        else:
+            message = AIMessage("Benchmark answer.")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+
+def load_benchmark_config(config_file):
+    """Loads the config with the caches, intent router and speculative retrieval turned off."""
+    with open(config_file, "r") as file:
+        config_data = yaml.safe_load(file)
+
+    llm_model = config_data.setdefault("llm_model", {})
+    llm_model.setdefault("answer_cache", {})["enabled"] = False
+    llm_model.setdefault("intent_router", {})["enabled"] = False
+    document_search = config_data.setdefault("document_search", {})
+    document_search.setdefault("cache", {})["enabled"] = False
+    document_search.setdefault("speculative", {})["enabled"] = False
+    document_search.setdefault("rerank", {})["enabled"] = False
+    if document_search.get("search_type") == "hybrid":
+        document_search["search_type"] = "distance"
+
+    with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as file:
+        yaml.safe_dump(config_data, file)
+    try:
+        return Config(file.name)
+    finally:
+        os.remove(file.name)
+
+
+def build_benchmark_pipeline(config, llm_latency, num_chunks=2000, dim=384):
+    embedding = DeterministicFakeEmbedding(size=dim)
+    texts = [f"Benchmark chunk {i} about UConn parking, NetID and wifi." for i in range(num_chunks)]
+    vector_store = FAISS.from_texts(texts, embedding)
+    return PipelineFactory.build_RAG_pipeline(SlowFakeChatModel(latency=llm_latency), vector_store, config=config)
+
+
+def get_session_input(session):
+    return (
+        {"messages": [HumanMessage(f"Benchmark question {session} about parking permits")]},
+        {"configurable": {"thread_id": f"benchmark-{session}"}},
+    )
+
+
+def summarize(mode, latencies, wall_time, peak_threads):
+    latencies = sorted(latencies)
+    return {
+        "mode": mode,
+        "sessions": len(latencies),
+        "wall_time_s": round(wall_time, 2),
+        "sessions_per_s": round(len(latencies) / wall_time, 1),
+        "p50_latency_s": round(statistics.median(latencies), 2),
+        "p95_latency_s": round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+        "peak_threads": peak_threads,
+    }
+
+
+class ThreadCounter:
+    """Samples `threading.active_count()` in the background and keeps the maximum."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_sync(pipeline, sessions, sync_threads):
+    def run_session(session):
+        start = time.perf_counter()
+        pipeline.invoke(*get_session_input(session))
+        return time.perf_counter() - start
+
+    with ThreadCounter() as counter:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sync_threads) as executor:
+            latencies = list(executor.map(run_session, range(sessions)))
+        wall_time = time.perf_counter() - start
+    return summarize(f"sync ({sync_threads} threads)", latencies, wall_time, counter.peak)
+
+
+def run_async(pipeline, sessions):
+    async def run_session(session):
+        start = time.perf_counter()
+        await pipeline.ainvoke(*get_session_input(session))
+        return time.perf_counter() - start
+
+    async def run_all():
+        return await asyncio.gather(*(run_session(session) for session in range(sessions)))
+
+    with ThreadCounter() as counter:
+        start = time.perf_counter()
+        latencies = asyncio.run(run_all())
+        wall_time = time.perf_counter() - start
+    return summarize("async", latencies, wall_time, counter.peak)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare concurrent sessions of the sync and async RAG graph")
+    parser.add_argument("--config", default="../config/config.yaml")
+    parser.add_argument("--sessions", type=int, default=200, help="Concurrent chat sessions, one question each")
+    parser.add_argument("--sync-threads", type=int, default=16, help="Threads serving sessions in the sync run")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per fake LLM call")
+    args = parser.parse_args()
+
+    config = load_benchmark_config(args.config)
+    pipeline = build_benchmark_pipeline(config, args.llm_latency)
+
+    for result in (run_sync(pipeline, args.sessions, args.sync_threads), run_async(pipeline, args.sessions)):
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import re
+from langchain_core.documents import Document
+
+# Rough size of an English token, used when the LLM has no tokenizer of its own.
+CHARS_PER_TOKEN = 4
+# Tail chunks with less room than this are dropped instead of truncated.
+MIN_TAIL_TOKENS = 40
+
+SENTENCE_END = re.compile(r"[.!?:](?=\s)|\n\s*\n")
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def get_source_key(doc):
+    meta = doc.metadata or {}
+    return meta.get("file_name") or meta.get("source"), meta.get("page")
+
+
+def merge_documents(first, second):
+    """
+    Merges two chunks of the same file when `second` starts inside `first` and the overlapping
+    text matches, as produced by the splitter's chunk overlap. Returns None when they are not adjacent.
+    """
+    first_start = first.metadata.get("start_index")
+    second_start = second.metadata.get("start_index")
+    if first_start is None or second_start is None or second_start < first_start:
+        return None
+
+    offset = second_start - first_start
+    overlap = len(first.page_content) - offset
+    if overlap <= 0 or first.page_content[offset:] != second.page_content[:overlap]:
+        return None
+
+    return Document(
+        id=first.id,
+        page_content=first.page_content + second.page_content[overlap:],
+        metadata=first.metadata,
+    )
+
+
+def merge_adjacent_chunks(docs):
+    """
+    Merges overlapping chunks of the same file. `docs` is ordered best first; each merged
+    chunk takes the rank of its best part. Returns the chunks in that rank order.
+    """
+    groups = {}
+    for rank, doc in enumerate(docs):
+        groups.setdefault(get_source_key(doc), []).append((rank, doc))
+
+    merged = []
+    for members in groups.values():
+        members.sort(key=lambda member: member[1].metadata.get("start_index", -1))
+        best_rank, current = members[0]
+        for rank, doc in members[1:]:
+            combined = merge_documents(current, doc)
+            if combined is None:
+                merged.append((best_rank, current))
+                best_rank, current = rank, doc
+            else:
+                best_rank, current = min(best_rank, rank), combined
+        merged.append((best_rank, current))
+
+    return [doc for _, doc in sorted(merged, key=lambda item: item[0])]
+
+
+def cut_at_sentence(text, max_chars):
+    if len(text) <= max_chars:
+        return text
+
+    head = text[:max_chars]
+    sentence_ends = [match.end() for match in SENTENCE_END.finditer(head)]
+    if sentence_ends:
+        return head[:sentence_ends[-1]].rstrip()
+    return head.rsplit(None, 1)[0] + " ..."
+
+
+def truncate_at_sentence(text, max_tokens, count_tokens=estimate_tokens):
+    """Cuts the text to at most `max_tokens`, at the last sentence end if there is one."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    while True:
+        head = cut_at_sentence(text, max_chars)
+        tokens = count_tokens(head)
+        if tokens <= max_tokens or max_chars <= 1:
+            return head
+        # The tokenizer packs fewer characters per token than estimated; shrink in proportion.
+        max_chars = min(max_chars - 1, int(max_chars * max_tokens / tokens))
+
+
+def pack_context(docs, token_budget, format_block, count_tokens=estimate_tokens):
+    """
+    Selects and trims chunks to fit `token_budget`.
+
+    `docs` is the retrieval result, best first. Overlapping chunks of the same file are
+    merged, whole chunks are added in rank order while they fit, and the first chunk that
+    does not fit is truncated at a sentence boundary to fill the remaining budget.
+    `format_block(index, doc)` renders a chunk so its header is counted too. `count_tokens`
+    is the LLM's token counter when it has one.
+    """
+    if token_budget is None:
+        return list(docs)
+
+    packed = []
+    used_tokens = 0
+    for doc in merge_adjacent_chunks(docs):
+        block_tokens = count_tokens(format_block(len(packed) + 1, doc))
+        if used_tokens + block_tokens <= token_budget:
+            packed.append(doc)
+            used_tokens += block_tokens
+            continue
+
+        header_tokens = block_tokens - count_tokens(doc.page_content)
+        remaining_tokens = token_budget - used_tokens - header_tokens
+        if remaining_tokens >= MIN_TAIL_TOKENS:
+            content = truncate_at_sentence(doc.page_content, remaining_tokens, count_tokens)
+            packed.append(Document(id=doc.id, page_content=content, metadata=doc.metadata))
+        break
+
+    return packed
@@ -0,0 +1,92 @@
+from collections import Counter
+import numpy as np
+from embedding.embedding_cache import embed_queries
+from utils import get_logger
+
+logger = get_logger()
+
+GREETING = "greeting"
+CLOSING = "closing"
+OFF_TOPIC = "off_topic"
+KB_QUESTION = "kb_question"
+
+# Example messages per intent. A message takes the intent of its most similar examples.
+DEFAULT_EXEMPLARS = {
+    GREETING: [
+        "hi", "hello", "hey there", "good morning", "good afternoon", "good evening",
+        "how are you?", "who are you?", "what can you do?",
+    ],
+    CLOSING: [
+        "thanks", "thank you so much", "thanks for the help", "that's all, thanks", "bye", "goodbye",
+        "see you later", "have a nice day",
+    ],
+    OFF_TOPIC: [
+        "what is the weather tomorrow?", "tell me a joke", "write me a poem about the ocean",
+        "who won the football game last night?", "what is the price of bitcoin?",
+        "recommend a good movie to watch", "how do I cook pasta?", "what is the capital of France?",
+        "write a python function to sort a list", "what stocks should I buy?",
+    ],
+    KB_QUESTION: [
+        "how do I reset my NetID password?", "how do I connect to the UConn wifi?",
+        "how do I set up eduroam on my laptop?", "where can I buy a parking permit?",
+        "how do I install Microsoft Office as a student?", "how do I access HuskyCT?",
+        "how do I set up two-factor authentication for my UConn account?", "how do I print on campus?",
+        "how do I forward my UConn email?", "how do I connect to the UConn VPN?",
+        "where do I get my student ID card?", "how do I register my device on the network?",
+        "what software is available to UConn students?", "how do I request IT help at UConn?",
+        "how do I access my UConn OneDrive?", "what are the parking rules on the Storrs campus?",
+    ],
+}
+
+
+class IntentRouter:
+    """
+    Embedding-based classifier placed in front of the routing LLM call.
+
+    A message is compared with the example messages of each intent (cosine similarity with
+    the embedding model that is already loaded for retrieval). The intent of the best match
+    is returned when its similarity reaches `threshold` and beats the best example of any
+    other intent by `margin`; otherwise the router abstains and the LLM decides.
+    """
+
+    def __init__(self, embedding, exemplars=None, threshold=0.6, margin=0.05):
+        self.embedding = embedding
+        self.threshold = threshold
+        self.margin = margin
+        exemplars = exemplars or DEFAULT_EXEMPLARS
+        self.intents = [intent for intent, examples in exemplars.items() for _ in examples]
+        texts = [example for examples in exemplars.values() for example in examples]
+        # Examples are compared with user messages, so both are embedded as queries.
+        self.matrix = self._normalize(np.asarray(embed_queries(embedding, texts), dtype=np.float32))
+        self.counts = Counter()
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    def classify(self, text):
+        """Returns (intent, similarity), with intent None when the router is not confident."""
+        vector = self._normalize(np.asarray(self.embedding.embed_query(text), dtype=np.float32))
+        similarities = self.matrix @ vector
+
+        best_by_intent = {}
+        for intent, similarity in zip(self.intents, similarities):
+            best_by_intent[intent] = max(best_by_intent.get(intent, -1.0), float(similarity))
+        ranked = sorted(best_by_intent.items(), key=lambda item: item[1], reverse=True)
+
+        intent, similarity = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if similarity < self.threshold or similarity - runner_up < self.margin:
+            intent = None
+
+        self.counts[intent or "llm"] += 1
+        logger.debug(f"Intent router: {intent or 'abstained'} (similarity {similarity:.3f}, runner-up {runner_up:.3f})")
+        return intent, similarity
+
+    def stats(self):
+        total = sum(self.counts.values())
+        return {
+            "routed": dict(self.counts),
+            "llm_fallback_rate": self.counts["llm"] / total if total else 0.0,
+        }
@@ -1,9 +1,30 @@
+from langchain_core.language_models import BaseLanguageModel
 from config import Config
+from model.context_packer import estimate_tokens
 from utils import get_logger
+import functools
 import os
 
 logger = get_logger()
 
+# Context windows (tokens) of the models we configure, matched by the longest prefix of the model name.
+CONTEXT_WINDOWS = {
+    "gemini-1.5-flash": 1048576,
+    "gemini-1.5-pro": 2097152,
+    "gemini-2.0-flash": 1048576,
+    "gemini-2.5": 1048576,
+    "gpt-3.5-turbo": 16385,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "o3": 200000,
+    "o4-mini": 200000,
+}
+# Ollama runs a model with this context unless `num_ctx` is set.
+OLLAMA_DEFAULT_CONTEXT_WINDOW = 2048
+# Tokens kept free for the answer when `max_tokens` is not configured.
+DEFAULT_ANSWER_TOKENS = 1024
+
 class LLMFactory:
     """Factory class to provide LLMs based on configuration."""
 
@@ -71,6 +92,59 @@ class LLMFactory:
         )
 
 
+def get_context_window(llm, config):
+    """
+    Returns the LLM's context window in tokens: `context_window` from the config, else the
+    Ollama `num_ctx`, else the window of a known model name. None when it is unknown.
+    """
+    if config.context_window:
+        return config.context_window
+    if type(llm).__name__ == "ChatOllama":
+        return getattr(llm, "num_ctx", None) or OLLAMA_DEFAULT_CONTEXT_WINDOW
+
+    model_name = getattr(llm, "model_name", None) or getattr(llm, "model", None) or config.llm_model_name
+    if not isinstance(model_name, str):
+        return None
+    model_name = model_name.removeprefix("models/")
+    prefixes = [prefix for prefix in CONTEXT_WINDOWS if model_name.startswith(prefix)]
+    if not prefixes:
+        logger.warning(f"Context window of {model_name} is unknown; set llm_model.context_window to size the retrieved context.")
+        return None
+    return CONTEXT_WINDOWS[max(prefixes, key=len)]
+
+
+def get_token_counter(llm):
+    """
+    Returns a function counting the tokens of a text for `llm`.
+
+    The LLM's `get_num_tokens` is used when its class implements one (tiktoken for OpenAI, the
+    API for Gemini). The base class falls back to a GPT-2 tokenizer that matches none of our
+    models, so those LLMs, and any LLM whose counter fails, get the 4 characters per token estimate.
+    """
+    if not isinstance(llm, BaseLanguageModel):
+        return estimate_tokens
+    implemented = any(
+        getattr(type(llm), name) is not getattr(BaseLanguageModel, name) for name in ("get_num_tokens", "get_token_ids")
+    )
+    if not implemented and llm.custom_get_token_ids is None:
+        return estimate_tokens
+
+    failed = False
+
+    @functools.lru_cache(maxsize=4096)
+    def count_tokens(text):
+        nonlocal failed
+        if not failed:
+            try:
+                return llm.get_num_tokens(text)
+            except Exception as e:
+                failed = True
+                logger.warning(f"Counting tokens with the LLM failed, estimating them instead: {str(e)}")
+        return estimate_tokens(text)
+
+    return count_tokens
+
+
 def check_api_key(api_key_env_var):
     if not os.environ.get(api_key_env_var):
         logger.error(f"API key not found for {api_key_env_var}")
@@ -1,38 +1,74 @@
-from langchain_core.messages import SystemMessage
-from langchain_core.tools import tool
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import StructuredTool
 from langgraph.graph import END, StateGraph, MessagesState
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.config import get_config
 from langgraph.prebuilt import ToolNode, tools_condition
 from embedding.vector_db_search import search_vector_db
 from embedding.vector_store_factory import VectorStoreFactory
 from embedding.embedding_factory import EmbeddingFactory
+from embedding.lexical_index import load_lexical_index
+from embedding.reranker import load_reranker
 from utils import get_logger
 from config import Config
-from model.llm_factory import LLMFactory
+from model.llm_factory import DEFAULT_ANSWER_TOKENS, LLMFactory, get_context_window, get_token_counter
 from model.prompt import *
+from model.retrieval_cache import RetrievalCache
+from model.answer_cache import SemanticAnswerCache
+from model.context_packer import estimate_tokens, pack_context
+from model.intent_router import CLOSING, GREETING, KB_QUESTION, OFF_TOPIC, IntentRouter
+from model.speculative_retrieval import SpeculativeRetriever
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
+import time
 import uuid
 
 logger = get_logger()
 
 
 
-def build_context_prompt(docs):
+def format_context_block(idx, doc):
+    meta = doc.metadata or {}
+    return (
+        f"### Doc {idx}\n"
+        f"Title : {meta.get('title', 'Untitled')}\n"
+        f"URL   : {meta.get('url', 'N/A')}\n"
+        f"{doc.page_content.strip()}"
+    )
 
-    blocks = []
-    for idx, doc in enumerate(docs, start=1):
-        meta = doc.metadata or {}
-        block = (
-            f"### Doc {idx}\n"
-            f"Title : {meta.get('title', 'Untitled')}\n"
-            f"URL   : {meta.get('url', 'N/A')}\n"
-            f"{doc.page_content.strip()}"
-        )
-        blocks.append(block)
+
+def build_context_prompt(docs, token_budget=None, count_tokens=estimate_tokens):
+    """Formats the retrieved chunks (best first) for SYSTEM_MSG, packed into `token_budget` tokens when it is set."""
+    docs = pack_context(docs, token_budget, format_context_block, count_tokens)
+    blocks = [format_context_block(idx, doc) for idx, doc in enumerate(docs, start=1)]
 
     serialized = "\n\n---\n\n".join(blocks)
     return serialized
 
 
+def get_thread_id():
+    """Returns the thread_id of the graph run that calls it."""
+    return get_config().get("configurable", {}).get("thread_id")
+
+
+async def run_blocking(executor, func, *args):
+    """Runs a blocking call (embedding, vector search) in `executor`, keeping the caller's context."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(context.run, func, *args))
+
+
+def get_single_turn_question(messages):
+    """Returns the user's question if the conversation holds exactly one human message, else None."""
+    human_messages = [message for message in messages if message.type == "human"]
+    if len(human_messages) != 1:
+        return None
+    return human_messages[0].content
+
+
 
 class PipelineFactory:
     @staticmethod
@@ -44,65 +80,254 @@ class PipelineFactory:
         llm = LLMFactory.get_llm_from_config(config=config)
 
         logger.info("Setting up vector store...")
+        # Read before loading: if the index is rewritten meanwhile, the version is older than the
+        # loaded store and cached results are dropped at the next restart rather than kept.
+        index_version = VectorStoreFactory.get_index_version(config)
         vector_store = VectorStoreFactory.get_vector_store_from_config(
             embedding, config=config
         )
 
 
+        lexical_index = None
+        if config.sim_search_type == "hybrid":
+            logger.info("Loading lexical index...")
+            lexical_index = load_lexical_index(config)
+
+        reranker = None
+        if config.rerank_enabled:
+            logger.info("Loading reranker...")
+            reranker = load_reranker(config)
+
         logger.info("Building RAG pipeline...")
 
         # Build RAG graph (retriever + LLM pipeline)
-        graph = PipelineFactory.build_RAG_pipeline(llm, vector_store, config=config)
+        graph = PipelineFactory.build_RAG_pipeline(llm, vector_store, config=config, lexical_index=lexical_index,
+                                                   reranker=reranker, index_version=index_version)
 
         logger.info("Pipeline successfully built.")
 
         return graph
     
     @staticmethod
-    def build_RAG_pipeline(llm, vector_store, config=None):
+    def build_RAG_pipeline(llm, vector_store, config=None, lexical_index=None, reranker=None, index_version=None):
 
         if config is None:
             config = Config.default_config()
 
-        @tool(response_format="content_and_artifact")
+        # The store is loaded once and never reloaded, so the caches are keyed to the index as it was
+        # loaded: a rebuilt index (and fresh cache entries) is only served after a restart.
+        if index_version is None:
+            index_version = VectorStoreFactory.get_index_version(config)
+
+        # Async runs of the graph await the LLM and do embedding and vector search work here.
+        blocking_executor = ThreadPoolExecutor(max_workers=config.blocking_workers, thread_name_prefix="rag-blocking")
+
+        def offloaded(func):
+            async def afunc(state: MessagesState):
+                return await run_blocking(blocking_executor, func, state)
+            return afunc
+
+        retrieval_cache = None
+        if config.retrieval_cache_enabled:
+            retrieval_cache = RetrievalCache(
+                max_size=config.retrieval_cache_max_size,
+                ttl_seconds=config.retrieval_cache_ttl,
+                version_fn=lambda: index_version,
+            )
+
+        answer_cache = None
+        if config.answer_cache_enabled:
+            answer_cache = SemanticAnswerCache(
+                vector_store.embeddings,
+                threshold=config.answer_cache_threshold,
+                max_entries=config.answer_cache_max_entries,
+                ttl_seconds=config.answer_cache_ttl,
+                persist_path=config.default_data_path / config.answer_cache_file_name if config.answer_cache_persist else None,
+                version_fn=lambda: index_version,
+                documents_exist_fn=lambda ids: len(vector_store.get_by_ids(ids)) == len(ids),
+            )
+
+        intent_router = None
+        if config.intent_router_enabled:
+            intent_router = IntentRouter(
+                vector_store.embeddings,
+                threshold=config.intent_router_threshold,
+                margin=config.intent_router_margin,
+            )
+
+        count_tokens = get_token_counter(llm)
+        context_window = get_context_window(llm, config)
+        # Everything in the answer prompt but the retrieved context and the conversation
+        fixed_tokens = count_tokens(SYSTEM_MSG.format(CONTEXT_BLOCK="")) + (config.max_tokens or DEFAULT_ANSWER_TOKENS)
+
+        def get_context_budget(conversation_messages=()):
+            """Tokens left for retrieved context next to the conversation, capped by `context_token_budget`."""
+            budget = config.context_token_budget
+            if context_window is not None:
+                used_tokens = fixed_tokens + sum(count_tokens(message.content) for message in conversation_messages
+                                                 if isinstance(message.content, str))
+                available = max(context_window - used_tokens, 0)
+                budget = available if budget is None else min(budget, available)
+            return budget
+
+        def search_documents(query):
+            return search_vector_db(query, vector_store, k=config.num_documents, search_type=config.sim_search_type, keep_with_score=config.keep_with_score,
+                                    lexical_index=lexical_index, fetch_k=config.hybrid_fetch_k, rrf_k=config.rrf_k,
+                                    reranker=reranker)
+
+        speculative_retriever = None
+        if config.speculative_retrieval_enabled:
+            speculative_retriever = SpeculativeRetriever(
+                search_documents,
+                min_overlap=config.speculative_min_overlap,
+                max_workers=config.speculative_max_workers,
+            )
+
         def retrieve(query: str):
             """Retrieve relevant information from the University of Connecticut knowledge base based on the user's query and provide context to help answer the question effectively."""
             
             logger.debug(f"Received query: {query}")
+            thread_id = get_thread_id()
+
+            cache_key = None
+            if retrieval_cache is not None:
+                cache_key = RetrievalCache.make_key(
+                    query, k=config.num_documents, search_type=config.sim_search_type, keep_with_score=config.keep_with_score,
+                    fetch_k=config.hybrid_fetch_k, rrf_k=config.rrf_k,
+                    rerank=(reranker.model_name, reranker.fetch_k, reranker.top_n) if reranker is not None else None,
+                    token_budget=get_context_budget(),
+                )
+                cached = retrieval_cache.get(cache_key)
+                if cached is not None:
+                    logger.debug(f"Retrieval cache hit for query: {query}")
+                    if speculative_retriever is not None:
+                        speculative_retriever.cancel(thread_id)
+                    return cached
             
             try:
-                retrieved_docs = search_vector_db(query, vector_store, k=config.num_documents, search_type=config.sim_search_type, keep_with_score=config.keep_with_score)
+                retrieved_docs = None
+                if speculative_retriever is not None:
+                    retrieved_docs = speculative_retriever.take(thread_id, query)
+                if retrieved_docs is None:
+                    retrieved_docs = search_documents(query)
                 logger.debug(f"Found {len(retrieved_docs)} documents for query: {query}")
             except Exception as e:
                 logger.error(f"Error occurred while retrieving documents for query: {query} - {str(e)}")
-                retrieved_docs = []
+                return build_context_prompt([]), []
             
-            serialized = build_context_prompt(retrieved_docs)
+            # Packed without the conversation, which the answer node accounts for when it re-packs the artifact
+            serialized = build_context_prompt(retrieved_docs, token_budget=get_context_budget(), count_tokens=count_tokens)
 
             logger.debug(f"Serialized retrieval result: {serialized}...") 
+            if cache_key is not None:
+                retrieval_cache.put(cache_key, (serialized, retrieved_docs))
             return serialized, retrieved_docs
 
-        def query_or_respond(state: MessagesState):
-            """Generate tool call for retrieval or respond."""       
-        
+        async def aretrieve(query: str):
+            return await run_blocking(blocking_executor, retrieve, query)
+
+        retrieve_tool = StructuredTool.from_function(func=retrieve, coroutine=aretrieve, response_format="content_and_artifact")
+
+        def answer_from_cache(state: MessagesState):
+            """Answer single-turn questions from the semantic answer cache."""
+            question = get_single_turn_question(state["messages"])
+            if question is None:
+                return {"messages": []}
+
+            try:
+                answer = answer_cache.lookup(question)
+            except Exception as e:
+                logger.error(f"Error occurred while looking up the answer cache: {str(e)}")
+                answer = None
+
+            if answer is None:
+                return {"messages": []}
+            return {"messages": [AIMessage(answer)]}
+
+        # First node after the answer cache.
+        routing_node = "route_intent" if intent_router is not None else "query_or_respond"
+
+        def route_after_cache(state: MessagesState):
+            return END if state["messages"][-1].type == "ai" else routing_node
+
+        def route_intent(state: MessagesState):
+            """Answer greetings, closings and off-topic messages, or call retrieve for clear KB questions, without the LLM."""
+            message = state["messages"][-1]
+            if message.type != "human" or not isinstance(message.content, str):
+                return {"messages": []}
+
+            try:
+                intent, _ = intent_router.classify(message.content)
+            except Exception as e:
+                logger.error(f"Error occurred while classifying the user intent: {str(e)}")
+                return {"messages": []}
+
+            if intent == GREETING:
+                return {"messages": [AIMessage(GREETING_RESPONSE)]}
+            if intent == CLOSING:
+                return {"messages": [AIMessage(CLOSING_RESPONSE)]}
+            if intent == OFF_TOPIC:
+                return {"messages": [AIMessage(OFF_TOPIC_RESPONSE)]}
+            # Follow-up questions need the conversation to be rewritten into a query, which the LLM does.
+            if intent == KB_QUESTION and get_single_turn_question(state["messages"]) is not None:
+                tool_call = {"name": "retrieve", "args": {"query": message.content}, "id": f"call_{uuid.uuid4().hex}"}
+                return {"messages": [AIMessage("", tool_calls=[tool_call])]}
+            return {"messages": []}
+
+        def route_after_intent(state: MessagesState):
+            message = state["messages"][-1]
+            if message.type != "ai":
+                return "query_or_respond"
+            return "tools" if message.tool_calls else END
+
+        def start_routing(state: MessagesState):
+            """Builds the routing prompt and starts the speculative search."""
             logger.debug(f"Starting query_or_respond with state: {state}")
 
-            llm_with_tools = llm.bind_tools([retrieve])
+            # Search with the raw message while the LLM decides on the query.
+            last_message = state["messages"][-1]
+            speculating = (speculative_retriever is not None and last_message.type == "human"
+                           and isinstance(last_message.content, str))
+            if speculating:
+                speculative_retriever.start(get_thread_id(), last_message.content)
+
             prompt = [SystemMessage(SYSTEM_TOOL_MSG)] + state['messages']
             logger.debug(f"Input prompt for LLM: {prompt[-1]}")
+            return prompt, speculating
+
+        def finish_routing(response, speculating):
+            if speculating and not getattr(response, "tool_calls", None):
+                speculative_retriever.cancel(get_thread_id())
+            return {"messages": [response]}
+
+        def query_or_respond(state: MessagesState):
+            """Generate tool call for retrieval or respond."""       
+            prompt, speculating = start_routing(state)
             
             try:
-                response = llm_with_tools.invoke(prompt)
+                response = llm.bind_tools([retrieve_tool]).invoke(prompt)
                 logger.debug(f"query_or_respond Node Received response from LLM: {response}")
             except Exception as e:
                 logger.error(f"Error occurred while invoking LLM: {str(e)}")
                 response = "Error occurred during processing."
-            
-            return {"messages": [response]}
 
+            return finish_routing(response, speculating)
 
-        def generate(state: MessagesState):
-            """Generate answer."""
+        async def aquery_or_respond(state: MessagesState):
+            prompt, speculating = start_routing(state)
+
+            try:
+                response = await llm.bind_tools([retrieve_tool]).ainvoke(prompt)
+                logger.debug(f"query_or_respond Node Received response from LLM: {response}")
+            except Exception as e:
+                logger.error(f"Error occurred while invoking LLM: {str(e)}")
+                response = "Error occurred during processing."
+
+            return finish_routing(response, speculating)
+
+
+        def build_generation_prompt(state: MessagesState):
+            """Returns the answer prompt and the ToolMessages of the last retrieval."""
             logger.debug(f"Generating response with state: {state}")
 
             # Get generated ToolMessages
@@ -114,13 +339,6 @@ class PipelineFactory:
                     break
             tool_messages = recent_tool_messages[::-1]
             logger.debug(f"Found {len(tool_messages)} recent tool messages.")
-            recent_tool_messages = []        
-
-            # Format into prompt
-            docs_content = "\n\n".join(doc.content for doc in tool_messages)
-            system_message_content = SYSTEM_MSG.format(CONTEXT_BLOCK=docs_content)
-
-            logger.debug(f"System message content: {system_message_content}...")
 
             conversation_messages = [
                 message
@@ -128,8 +346,35 @@ class PipelineFactory:
                 if message.type in ("human", "system")
                 or (message.type == "ai" and not message.tool_calls)
             ]
+
+            # Format into prompt, re-packing the retrieved chunks into the room the conversation leaves
+            retrieved_docs = [doc for message in tool_messages for doc in (message.artifact or []) if isinstance(doc, Document)]
+            token_budget = get_context_budget(conversation_messages)
+            if retrieved_docs and token_budget is not None:
+                docs_content = build_context_prompt(retrieved_docs, token_budget=token_budget, count_tokens=count_tokens)
+            else:
+                docs_content = "\n\n".join(doc.content for doc in tool_messages)
+            system_message_content = SYSTEM_MSG.format(CONTEXT_BLOCK=docs_content)
+
+            logger.debug(f"System message content: {system_message_content}...")
+
             prompt = [SystemMessage(system_message_content)] + conversation_messages
             logger.debug(f"Formatted prompt for LLM: {prompt}")
+            return prompt, tool_messages
+
+        def store_answer(state: MessagesState, response, tool_messages):
+            question = get_single_turn_question(state["messages"])
+            if answer_cache is not None and question is not None and isinstance(response.content, str):
+                doc_ids = [doc.id for message in tool_messages for doc in (message.artifact or [])
+                           if isinstance(doc, Document) and doc.id]
+                try:
+                    answer_cache.store(question, response.content, doc_ids)
+                except Exception as e:
+                    logger.error(f"Error occurred while storing the answer in the cache: {str(e)}")
+
+        def generate(state: MessagesState):
+            """Generate answer."""
+            prompt, tool_messages = build_generation_prompt(state)
 
             # Run LLM
             try:
@@ -138,16 +383,55 @@ class PipelineFactory:
             except Exception as e:
                 logger.error(f"Error occurred while invoking LLM for final response: {str(e)}")
                 response = "Error occurred during processing."
+                return {"messages": [response]}
+
+            store_answer(state, response, tool_messages)
+            return {"messages": [response]}
+
+        async def agenerate(state: MessagesState):
+            prompt, tool_messages = build_generation_prompt(state)
+
+            try:
+                response = await llm.ainvoke(prompt)
+                logger.debug(f"Received response from LLM: {response}")
+            except Exception as e:
+                logger.error(f"Error occurred while invoking LLM for final response: {str(e)}")
+                response = "Error occurred during processing."
+                return {"messages": [response]}
 
+            if answer_cache is not None:
+                await run_blocking(blocking_executor, store_answer, state, response, tool_messages)
             return {"messages": [response]}
 
+        # Nodes have a sync and an async implementation: `invoke`/`stream` use the first,
+        # `ainvoke`/`astream` the second.
+        def node(func, afunc):
+            return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
         graph_builder = StateGraph(MessagesState)
-        tools = ToolNode([retrieve])
-        graph_builder.add_node(query_or_respond)
+        tools = ToolNode([retrieve_tool])
+        graph_builder.add_node("query_or_respond", node(query_or_respond, aquery_or_respond))
         graph_builder.add_node(tools)
-        graph_builder.add_node(generate)
-
-        graph_builder.set_entry_point("query_or_respond")
+        graph_builder.add_node("generate", node(generate, agenerate))
+
+        if intent_router is not None:
+            graph_builder.add_node("route_intent", node(route_intent, offloaded(route_intent)))
+            graph_builder.add_conditional_edges(
+                "route_intent",
+                route_after_intent,
+                {END: END, "tools": "tools", "query_or_respond": "query_or_respond"},
+            )
+
+        if answer_cache is not None:
+            graph_builder.add_node("answer_from_cache", node(answer_from_cache, offloaded(answer_from_cache)))
+            graph_builder.set_entry_point("answer_from_cache")
+            graph_builder.add_conditional_edges(
+                "answer_from_cache",
+                route_after_cache,
+                {END: END, routing_node: routing_node},
+            )
+        else:
+            graph_builder.set_entry_point(routing_node)
         graph_builder.add_conditional_edges(
             "query_or_respond",
             tools_condition,
@@ -168,6 +452,69 @@ class PipelineFactory:
 
 
 
+def get_answer_token(message):
+    """Returns the reply text carried by a streamed message, or None for tool results and tool calls."""
+    if message.type not in ("ai", "AIMessageChunk") or getattr(message, "tool_call_chunks", None) or message.tool_calls:
+        return None
+    if not isinstance(message.content, str) or not message.content:
+        return None
+    return message.content
+
+
+class StreamTimer:
+    """Logs the time to first token and the total time of a streamed request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token_ms = None
+
+    def on_token(self, metadata):
+        if self.first_token_ms is None:
+            self.first_token_ms = (time.perf_counter() - self.start) * 1000
+            logger.info(f"Time to first token: {self.first_token_ms:.0f} ms (node {metadata.get('langgraph_node')})")
+
+    def finish(self):
+        total_ms = (time.perf_counter() - self.start) * 1000
+        if self.first_token_ms is None:
+            logger.warning(f"No answer was streamed for the request ({total_ms:.0f} ms)")
+        else:
+            logger.info(f"Answer streamed in {total_ms:.0f} ms")
+
+
+def stream_answer(pipeline, input_message, thread_config):
+    """
+    Yields the text of the reply as the LLM generates it. Replies produced without
+    streaming (answer cache, intent router) are yielded in one piece. Logs the
+    time to first token and the total time of the request.
+    """
+    timer = StreamTimer()
+    for message, metadata in pipeline.stream(
+            {"messages": [{ "role": "user", "content": input_message }]},
+            stream_mode="messages",
+            config=thread_config,
+            ):
+        token = get_answer_token(message)
+        if token is not None:
+            timer.on_token(metadata)
+            yield token
+    timer.finish()
+
+
+async def astream_answer(pipeline, input_message, thread_config):
+    """Async version of `stream_answer`, running the async graph nodes."""
+    timer = StreamTimer()
+    async for message, metadata in pipeline.astream(
+            {"messages": [{ "role": "user", "content": input_message }]},
+            stream_mode="messages",
+            config=thread_config,
+            ):
+        token = get_answer_token(message)
+        if token is not None:
+            timer.on_token(metadata)
+            yield token
+    timer.finish()
+
+
 def run_terminal_chatbot(config=None):   
 
     if config is None:
@@ -180,10 +527,7 @@ def run_terminal_chatbot(config=None):
         input_message = input("Enter Query: - ")
         if input_message == "exit":
             break
-        
-        for step in pipeline.stream(
-                {"messages": [{ "role": "user", "content": input_message }]},
-                stream_mode="values",
-                config=thread_config,
-                ):
-            step["messages"][-1].pretty_print()
+
+        for token in stream_answer(pipeline, input_message, thread_config):
+            print(token, end="", flush=True)
+        print()
@@ -118,4 +118,12 @@ Your mission is to deliver the most accurate, well - sourced answer possible whi
 Context - 
 
 {CONTEXT_BLOCK}
-""")
\ No newline at end of file
+""")
+
+# Replies sent by the intent router without calling the LLM
+
+GREETING_RESPONSE = "Hi! I'm HuskyBot. How can I help you with UConn today?"
+
+CLOSING_RESPONSE = "You're welcome! Feel free to come back anytime you have questions about UConn."
+
+OFF_TOPIC_RESPONSE = "I specialize in information about the University of Connecticut and education topics. I'm sorry, but I can't help with that."
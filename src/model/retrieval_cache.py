@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+from utils import get_logger
+
+logger = get_logger()
+
+
+def normalize_query(query):
+    """Lower-cases the query, collapses whitespace and drops trailing punctuation."""
+    return " ".join(query.lower().split()).rstrip("?.! ")
+
+
+class RetrievalCache:
+    """
+    In-process LRU cache with a time-to-live for retrieval results.
+
+    Keys are the normalized query plus the search parameters. `version_fn` returns a token
+    for the index being searched; the cache is cleared as soon as it changes.
+    """
+
+    def __init__(self, max_size=512, ttl_seconds=3600, version_fn=None, log_every=100):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.version_fn = version_fn
+        self.log_every = log_every
+        self.version = version_fn() if version_fn else None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query, **params):
+        return normalize_query(query), tuple(sorted(params.items()))
+
+    def get(self, key):
+        with self._lock:
+            self._check_version()
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self.entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            self._log_stats()
+            return None if entry is None else entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self.entries),
+        }
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self.version:
+            logger.info(f"Index version changed ({self.version} -> {version}), clearing retrieval cache.")
+            self.entries.clear()
+            self.version = version
+
+    def _log_stats(self):
+        total = self.hits + self.misses
+        if self.log_every and total % self.log_every == 0:
+            logger.info(f"Retrieval cache stats: {self.stats()}")
@@ -0,0 +1,114 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from embedding.lexical_index import tokenize
+from utils import get_logger
+
+logger = get_logger()
+
+# Words the routing LLM usually drops when it rewrites a question into a search query.
+STOP_WORDS = {
+    "a", "an", "and", "are", "at", "be", "can", "could", "do", "does", "for", "how", "i", "in", "is",
+    "it", "me", "my", "of", "on", "or", "please", "should", "the", "to", "what", "when", "where",
+    "which", "who", "why", "will", "with", "would", "you",
+}
+
+
+def get_query_terms(query):
+    return {token for token in tokenize(query) if token not in STOP_WORDS}
+
+
+def query_overlap(first, second):
+    """Jaccard similarity of the terms of two queries, ignoring stop words."""
+    first_tokens, second_tokens = get_query_terms(first), get_query_terms(second)
+    if not first_tokens or not second_tokens:
+        return 0.0
+    return len(first_tokens & second_tokens) / len(first_tokens | second_tokens)
+
+
+class SpeculativeRetriever:
+    """
+    Runs the document search for the raw user message while the routing LLM call decides
+    whether to retrieve and rewrites the query.
+
+    `start` submits the search to a small thread pool under a key (the conversation thread).
+    `take` is called by the retrieve tool with the rewritten query: the speculative result
+    is reused when the two queries overlap by at least `min_overlap`, otherwise it is
+    cancelled and the tool searches normally. `cancel` drops a speculation that is not
+    needed, e.g. when the LLM answers without retrieving.
+    """
+
+    def __init__(self, search_fn, min_overlap=0.5, max_workers=4, log_every=100):
+        self.search_fn = search_fn
+        self.min_overlap = min_overlap
+        self.log_every = log_every
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative-retrieval")
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def start(self, key, query):
+        future = self.executor.submit(self.search_fn, query)
+        with self._lock:
+            previous = self.pending.pop(key, None)
+            self.pending[key] = (query, future)
+        if previous is not None:
+            previous[1].cancel()
+
+    def take(self, key, query):
+        """Returns the speculative result for `key` if it was searched with a query close to `query`, else None."""
+        with self._lock:
+            speculation = self.pending.pop(key, None)
+        if speculation is None:
+            return None
+
+        speculative_query, future = speculation
+        overlap = query_overlap(speculative_query, query)
+        if overlap < self.min_overlap:
+            future.cancel()
+            logger.debug(f"Speculative retrieval discarded (overlap {overlap:.2f}): {speculative_query!r} -> {query!r}")
+            self._count("misses")
+            return None
+
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"Speculative retrieval failed for query: {speculative_query} - {str(e)}")
+            self._count("misses")
+            return None
+
+        logger.debug(f"Speculative retrieval reused (overlap {overlap:.2f}): {speculative_query!r} -> {query!r}")
+        self._count("hits")
+        return result
+
+    def cancel(self, key):
+        with self._lock:
+            speculation = self.pending.pop(key, None)
+        if speculation is not None:
+            speculation[1].cancel()
+            self._count("cancelled")
+
+    def stats(self):
+        used = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "cancelled": self.cancelled,
+            "hit_rate": self.hits / used if used else 0.0,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            pending = list(self.pending.values())
+            self.pending.clear()
+        for _, future in pending:
+            future.cancel()
+        self.executor.shutdown(wait=False)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            total = self.hits + self.misses + self.cancelled
+        if self.log_every and total % self.log_every == 0:
+            logger.info(f"Speculative retrieval stats: {self.stats()}")
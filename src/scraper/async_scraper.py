@@ -0,0 +1,238 @@
+import asyncio
+import base64
+import urllib.request
+from urllib.parse import urlparse
+from scraper.html_extract import build_markdown_document, extract_kb_page, html_to_markdown
+
+PAGE_TREE_XPATH = ".//ul[contains(@class,'children_container') and contains(@class, 'page_tree_container')]//a"
+
+
+class PageResult:
+    """Content captured for one page plus the child links found on it."""
+
+    def __init__(self, content, suffix, title, links):
+        self.content = content
+        self.suffix = suffix
+        self.title = title
+        self.links = links
+
+
+def get_markdown_result(page_html, url, capture):
+    """Builds a Markdown capture of the page's `printable_document`, or None when it is missing."""
+    document_html, title, links = extract_kb_page(page_html, url)
+    if document_html is None:
+        return None
+    content = None
+    if capture:
+        markdown = html_to_markdown(document_html, url)
+        content = build_markdown_document(markdown, url, title).encode("utf-8")
+    return PageResult(content, ".md", title, links)
+
+
+class HttpFetcher:
+    """
+    Fetches pages with plain HTTP requests. Works for pages whose `printable_document`
+    is present in the served HTML; the element is kept as HTML or converted to Markdown.
+    """
+
+    def __init__(self, timeout=30, output_format="html"):
+        self.timeout = timeout
+        self.output_format = output_format
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def fetch(self, url, capture):
+        html = await asyncio.to_thread(self._get, url)
+        if self.output_format == "markdown":
+            return get_markdown_result(html, url, capture)
+
+        document_html, title, links = extract_kb_page(html, url)
+        if document_html is None:
+            return None
+        content = document_html.encode("utf-8") if capture else None
+        return PageResult(content, ".html", title, links)
+
+    def _get(self, url):
+        request = urllib.request.Request(url, headers={"User-Agent": "HuskyBot-Scraper"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            charset = response.headers.get_content_charset() or "utf-8"
+            return response.read().decode(charset, errors="replace")
+
+
+class SeleniumFetcher:
+    """
+    Pool of headless Chrome sessions. Each fetch borrows a session, renders the page in a
+    worker thread and prints it to PDF like the sequential scraper, or converts the
+    rendered `printable_document` to Markdown.
+    """
+
+    def __init__(self, num_sessions, output_format="pdf"):
+        self.num_sessions = num_sessions
+        self.output_format = output_format
+        self.sessions = asyncio.Queue()
+        self.drivers = []
+
+    async def start(self):
+        for _ in range(self.num_sessions):
+            driver = await asyncio.to_thread(self._create_driver)
+            self.drivers.append(driver)
+            self.sessions.put_nowait(driver)
+
+    async def close(self):
+        for driver in self.drivers:
+            await asyncio.to_thread(driver.quit)
+
+    async def fetch(self, url, capture):
+        driver = await self.sessions.get()
+        try:
+            return await asyncio.to_thread(self._render, driver, url, capture, self.output_format)
+        finally:
+            self.sessions.put_nowait(driver)
+
+    @staticmethod
+    def _create_driver():
+        from selenium import webdriver
+
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
+        return webdriver.Chrome(options=options)
+
+    @staticmethod
+    def _render(driver, url, capture, output_format):
+        from selenium.common.exceptions import NoSuchElementException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.print_page_options import PrintOptions
+        from scraper.utils import confirm_cookies_if_present, scroll_down, wait_until_all_image_load, \
+            wait_until_knowledge_based_page_load
+
+        driver.get(url)
+        driver.implicitly_wait(2)
+        confirm_cookies_if_present(driver)
+        wait_until_knowledge_based_page_load(driver)
+
+        if output_format == "markdown":
+            return get_markdown_result(driver.page_source, url, capture)
+
+        try:
+            printable_div = driver.find_element(By.ID, "printable_document")
+        except NoSuchElementException:
+            return None
+
+        content = None
+        if capture:
+            wait_until_all_image_load(driver)
+            scroll_down(driver)
+            content = base64.b64decode(driver.print_page(PrintOptions()))
+
+        links = [link.get_attribute("href") for link in printable_div.find_elements(By.XPATH, PAGE_TREE_XPATH)]
+        return PageResult(content, ".pdf", driver.title, links)
+
+
+class ConcurrentKBCrawler:
+    """
+    Crawls knowledge base spaces with a pool of asyncio workers.
+
+    Workers share one queue of (space, relative URL) items and a fetcher (HTTP or a pool
+    of headless browser sessions); a semaphore per host caps the requests in flight
+    against each server. The crawl state (pending URLs, visited URLs, file counters and
+    the file-to-URL rows) is the same as the sequential scraper's, so runs can resume
+    from each other's CSV files.
+    """
+
+    def __init__(self, fetcher, base_url, base_path, data_to_scrape, already_visited_url,
+                 visited_space_next_file_number, completed_links_file, num_workers=4, per_host_limit=2):
+        self.fetcher = fetcher
+        self.base_url = base_url
+        self.base_path = base_path
+        self.data_to_scrape = data_to_scrape
+        self.already_visited_url = already_visited_url
+        self.visited_space_next_file_number = visited_space_next_file_number
+        self.completed_links_file = completed_links_file
+        self.num_workers = num_workers
+        self.per_host_limit = per_host_limit
+        self.host_semaphores = {}
+        self.queue = None
+        self.seen_this_run = set()
+
+    async def crawl(self):
+        """Crawls every pending URL. URLs left unfetched are put back into `data_to_scrape`."""
+        self.queue = asyncio.Queue()
+        for space, rel_urls in self.data_to_scrape.items():
+            self.visited_space_next_file_number.setdefault(space, 0)
+            while rel_urls:
+                self._enqueue(space, rel_urls.pop())
+
+        await self.fetcher.start()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+        try:
+            await self.queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self.fetcher.close()
+            self._requeue_pending()
+
+    def _enqueue(self, space, rel_url):
+        if rel_url in self.seen_this_run:
+            return
+        self.seen_this_run.add(rel_url)
+        self.queue.put_nowait((space, rel_url))
+
+    async def _worker(self):
+        while True:
+            space, rel_url = await self.queue.get()
+            try:
+                await self._crawl_page(space, rel_url)
+            except Exception as e:
+                print(f"Exception while fetching {self.base_url + rel_url}: {e}")
+                self.data_to_scrape.setdefault(space, []).append(rel_url)
+            finally:
+                self.queue.task_done()
+
+    async def _crawl_page(self, space, rel_url):
+        url = self.base_url + rel_url
+        capture = url not in self.already_visited_url
+
+        print(f"Fetching - {url}")
+        async with self._host_semaphore(url):
+            result = await self.fetcher.fetch(url, capture)
+
+        if result is None:
+            print(f"printable_document not found for {url}")
+            return
+
+        if capture:
+            self.save_page(space, url, result)
+        else:
+            print(f"Skipping Download Already visited URL - {url}")
+
+        print(f"{len(result.links)} - New link extracted from {url}")
+        for link in result.links:
+            if link.count(self.base_url) and link not in self.already_visited_url:
+                self._enqueue(space, link.replace(self.base_url, ""))
+
+    def save_page(self, space, url, result):
+        self.visited_space_next_file_number[space] += 1
+        file_path = self.base_path / f"{space}_{self.visited_space_next_file_number[space]}{result.suffix}"
+        print(f"Writing -{url} - into {file_path}")
+        file_path.write_bytes(result.content)
+
+        self.completed_links_file.append({"file": file_path.stem, "URL": url})
+        self.already_visited_url.add(url)
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self.host_semaphores[host]
+
+    def _requeue_pending(self):
+        while not self.queue.empty():
+            space, rel_url = self.queue.get_nowait()
+            self.data_to_scrape.setdefault(space, []).append(rel_url)
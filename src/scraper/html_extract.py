@@ -0,0 +1,276 @@
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+import yaml
+
+# Elements that never have a closing tag, so they must not change the nesting depth.
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# Open elements whose closing tag is optional and that are implicitly closed by the start of the key element.
+IMPLIED_END_TAGS = {
+    "li": {"li", "p"}, "dt": {"dt", "dd", "p"}, "dd": {"dt", "dd", "p"},
+    "tr": {"tr", "td", "th"}, "td": {"td", "th"}, "th": {"td", "th"}, "option": {"option"},
+}
+# Block elements whose start closes an open paragraph.
+PARAGRAPH_CLOSERS = {
+    "address", "article", "aside", "blockquote", "div", "dl", "fieldset", "figure", "footer", "form", "h1", "h2",
+    "h3", "h4", "h5", "h6", "header", "hr", "main", "nav", "ol", "p", "pre", "section", "table", "ul",
+}
+
+
+class KBPageParser(HTMLParser):
+    """
+    Extracts the `printable_document` element of a knowledge base page together with the
+    child page links listed in its `page_tree_container`.
+
+    Open elements are kept on a stack and an end tag closes every element opened after its
+    start tag, so elements whose closing tag is optional (`li`, `p`, `td`, ...) do not leave
+    the document or the page tree open.
+    """
+
+    def __init__(self, page_url):
+        super().__init__(convert_charrefs=True)
+        self.page_url = page_url
+        self.title = None
+        self.document_html = []
+        self.links = []
+        self.found_document = False
+        # Tags open inside printable_document, starting with the element itself.
+        self._open_tags = []
+        # Position of the page tree `ul` in `_open_tags`, or None outside of it.
+        self._page_tree_level = None
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        classes = (attributes.get("class") or "").split()
+
+        if tag == "title":
+            self._in_title = True
+
+        if not self._open_tags and not self.found_document and attributes.get("id") == "printable_document":
+            self.found_document = True
+            self._open_tags.append(tag)
+            return
+
+        if not self._open_tags:
+            return
+
+        implied_end = IMPLIED_END_TAGS.get(tag, {"p"} if tag in PARAGRAPH_CLOSERS else set())
+        while len(self._open_tags) > 1 and self._open_tags[-1] in implied_end:
+            self._close_from(len(self._open_tags) - 1)
+
+        self.document_html.append(self.get_starttag_text())
+        if tag in VOID_ELEMENTS:
+            return
+        self._open_tags.append(tag)
+
+        if self._page_tree_level is None and tag == "ul" and "children_container" in classes \
+                and "page_tree_container" in classes:
+            self._page_tree_level = len(self._open_tags) - 1
+
+        if tag == "a" and self._page_tree_level is not None and attributes.get("href"):
+            self.links.append(urljoin(self.page_url, attributes["href"]))
+
+    def handle_startendtag(self, tag, attrs):
+        if self._open_tags:
+            self.document_html.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+
+        # Stray end tags (no matching open element) are dropped.
+        if tag in VOID_ELEMENTS or tag not in self._open_tags:
+            return
+
+        self._close_from(len(self._open_tags) - 1 - self._open_tags[::-1].index(tag))
+
+    def _close_from(self, level):
+        """Closes the open element at `level` of the stack and every element opened inside it."""
+        closed = self._open_tags[level:]
+        del self._open_tags[level:]
+        if self._page_tree_level is not None and self._page_tree_level >= level:
+            self._page_tree_level = None
+        # The closing tag of printable_document itself is not part of its inner HTML.
+        if not self._open_tags:
+            closed = closed[1:]
+        self.document_html.extend(f"</{closed_tag}>" for closed_tag in reversed(closed))
+
+    def handle_data(self, data):
+        if self._in_title and self.title is None and data.strip():
+            self.title = data.strip()
+        if self._open_tags:
+            self.document_html.append(escape(data, quote=False))
+
+
+def extract_kb_page(html, page_url):
+    """
+    Parses a knowledge base page. Returns the inner HTML of `printable_document` (or None
+    when the page does not contain it), the page title and the absolute child page links.
+    """
+    parser = KBPageParser(page_url)
+    parser.feed(html)
+    parser.close()
+
+    if not parser.found_document:
+        return None, parser.title, []
+    return "".join(parser.document_html), parser.title, parser.links
+
+
+class MarkdownConverter(HTMLParser):
+    """Converts the HTML of a knowledge base article to Markdown, keeping headings, lists, links, code and tables."""
+
+    HEADINGS = {"h1": "#", "h2": "##", "h3": "###", "h4": "####", "h5": "#####", "h6": "######"}
+    BLOCKS = {"p", "div", "section", "article", "blockquote", "ul", "ol", "table", "pre", "hr"}
+    SKIPPED = {"script", "style", "noscript", "button", "svg"}
+
+    def __init__(self, page_url=None):
+        super().__init__(convert_charrefs=True)
+        self.page_url = page_url
+        self.output = []
+        self.lists = []
+        self.link_href = None
+        self.skip_depth = 0
+        self.pre_depth = 0
+        self.row = None
+        self.table_rows = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self.skip_depth or tag in self.SKIPPED:
+            if tag not in VOID_ELEMENTS:
+                self.skip_depth += 1
+            return
+
+        attributes = dict(attrs)
+        if self.row is not None and tag not in ("td", "th", "tr"):
+            # Table cells keep plain text only.
+            return
+        if tag in self.HEADINGS:
+            self._new_block()
+            self.output.append(self.HEADINGS[tag] + " ")
+        elif tag in ("ul", "ol"):
+            self._new_line()
+            self.lists.append([tag, 0])
+        elif tag == "li":
+            self._new_line()
+            indent = "  " * (len(self.lists) - 1)
+            if self.lists and self.lists[-1][0] == "ol":
+                self.lists[-1][1] += 1
+                self.output.append(f"{indent}{self.lists[-1][1]}. ")
+            else:
+                self.output.append(f"{indent}- ")
+        elif tag == "pre":
+            self._new_block()
+            self.pre_depth += 1
+            self.output.append("```\n")
+        elif tag == "code" and not self.pre_depth:
+            self.output.append("`")
+        elif tag in ("strong", "b"):
+            self.output.append("**")
+        elif tag in ("em", "i"):
+            self.output.append("*")
+        elif tag == "a":
+            self.link_href = attributes.get("href")
+            if self.link_href and self.page_url:
+                self.link_href = urljoin(self.page_url, self.link_href)
+            self.output.append("[")
+        elif tag == "br":
+            self.output.append("\n")
+        elif tag == "hr":
+            self._new_block()
+            self.output.append("---")
+        elif tag == "table":
+            self._new_block()
+            self.table_rows = 0
+        elif tag == "tr":
+            self.row = []
+        elif tag in ("td", "th") and self.row is not None:
+            self.row.append("")
+        elif tag in self.BLOCKS:
+            self._new_block()
+
+    def handle_endtag(self, tag):
+        if self.skip_depth:
+            if tag not in VOID_ELEMENTS:
+                self.skip_depth -= 1
+            return
+
+        if self.row is not None and tag not in ("td", "th", "tr"):
+            return
+        if tag in self.HEADINGS:
+            self._new_block()
+        elif tag in ("ul", "ol"):
+            if self.lists:
+                self.lists.pop()
+            self._new_block()
+        elif tag == "pre":
+            self.pre_depth = max(0, self.pre_depth - 1)
+            self._new_line()
+            self.output.append("```")
+            self._new_block()
+        elif tag == "code" and not self.pre_depth:
+            self.output.append("`")
+        elif tag in ("strong", "b"):
+            self.output.append("**")
+        elif tag in ("em", "i"):
+            self.output.append("*")
+        elif tag == "a":
+            self.output.append(f"]({self.link_href})" if self.link_href else "]")
+            self.link_href = None
+        elif tag == "tr" and self.row is not None:
+            self._new_line()
+            self.output.append("| " + " | ".join(cell.strip() for cell in self.row) + " |")
+            if self.table_rows == 0:
+                self.output.append("\n|" + " --- |" * len(self.row))
+            self.table_rows += 1
+            self.row = None
+        elif tag in self.BLOCKS:
+            self._new_block()
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if self.row is not None:
+            if self.row:
+                self.row[-1] += " ".join(data.split()) + " "
+            return
+        if self.pre_depth:
+            self.output.append(data)
+            return
+        text = " ".join(data.split())
+        if text:
+            previous = self.output[-1] if self.output else ""
+            if data[:1].isspace() and previous and not previous[-1:].isspace():
+                text = " " + text
+            if data[-1:].isspace():
+                text += " "
+            self.output.append(text)
+
+    def _new_line(self):
+        if self.output and not self.output[-1].endswith("\n"):
+            self.output.append("\n")
+
+    def _new_block(self):
+        self._new_line()
+        if len(self.output) > 1 and not "".join(self.output[-2:]).endswith("\n\n"):
+            self.output.append("\n")
+
+    def get_markdown(self):
+        lines = [line.rstrip() for line in "".join(self.output).splitlines()]
+        markdown = "\n".join(lines)
+        while "\n\n\n" in markdown:
+            markdown = markdown.replace("\n\n\n", "\n\n")
+        return markdown.strip() + "\n"
+
+
+def html_to_markdown(html, page_url=None):
+    converter = MarkdownConverter(page_url)
+    converter.feed(html)
+    converter.close()
+    return converter.get_markdown()
+
+
+def build_markdown_document(markdown, url, title):
+    """Prepends a YAML front matter block holding the page URL and title."""
+    front_matter = yaml.safe_dump({"url": url, "title": title or ""}, sort_keys=False, allow_unicode=True)
+    return f"---\n{front_matter}---\n\n{markdown}"
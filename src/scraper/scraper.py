@@ -1,8 +1,10 @@
+import asyncio
 import base64
 from selenium import webdriver
 from selenium.webdriver.common.print_page_options import PrintOptions
 from config import Config
 from scraper.utils import *
+from scraper.html_extract import build_markdown_document, extract_kb_page, html_to_markdown
 
 def create_save_pdf(driver, url, file_path):
     wait_until_all_image_load(driver)
@@ -19,7 +21,19 @@ def create_save_pdf(driver, url, file_path):
     already_visited_url.add(url)
 
 
-def scrapper(driver, base_url, base_path):
+def create_save_markdown(driver, url, file_path):
+    document_html, title, _ = extract_kb_page(driver.page_source, url)
+    markdown = html_to_markdown(document_html or "", url)
+
+    with open(file_path, 'w', encoding='utf-8') as f:
+        print(f"Writing -{url} - into {file_path}")
+        f.write(build_markdown_document(markdown, url, title))
+
+    completed_links_file.append({"file": file_path.stem, "URL": url})
+    already_visited_url.add(url)
+
+
+def scrapper(driver, base_url, base_path, output_format="pdf"):
     for space in data_to_scrape:
 
         if space not in visited_space_next_file_number:
@@ -43,6 +57,8 @@ def scrapper(driver, base_url, base_path):
                 if url in already_visited_url:
                     print(f"Skipping Download Already visited URL - {url}")
                     visited_space_next_file_number[space] -= 1
+                elif output_format == "markdown":
+                    create_save_markdown(driver, url, base_path / f"{space}_{visited_space_next_file_number[space]}.md")
                 else:
                     create_save_pdf(driver, url, base_path / f"{space}_{visited_space_next_file_number[space]}.pdf")
 
@@ -105,31 +121,66 @@ def main_scraper(config=None):
                 data_to_scrape[space].append(row["URL"])
 
 
+    if config.crawl_mode == "concurrent":
+        run_concurrent_scraper(config, BASE_URL, BASE_FOLDER, unfetched_csv, csv_file)
+    else:
+        run_sequential_scraper(BASE_URL, BASE_FOLDER, unfetched_csv, csv_file, output_format=config.scraper_output_format)
+
+    print("SUMMARY OF DOWNLOADED FILE")
+    print(f"Total Download - {len(completed_links_file)}")
+
+
+def write_unfetched_urls(unfetched_csv):
+    unfetched_url = []
+
+    for key in data_to_scrape:
+        for u in data_to_scrape[key]:
+            unfetched_url.append({"space": key, "URL": u})
+
+    with open(unfetched_csv, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=["space", "URL"])
+        writer.writeheader()
+        writer.writerows(unfetched_url)
+    print("Write unfetched URL to UnFetchedURL.csv.")
+
+
+def run_sequential_scraper(base_url, base_folder, unfetched_csv, csv_file, output_format="pdf"):
     web_driver = webdriver.Chrome()
     web_driver.maximize_window()
 
     try:
-        scrapper(web_driver, BASE_URL, BASE_FOLDER)
+        scrapper(web_driver, base_url, base_folder, output_format=output_format)
     except Exception as e:
         print(e)
-        unfetched_url = []
-
-        for key in data_to_scrape:
-            for u in data_to_scrape[key]:
-                unfetched_url.append({"space": key, "URL": u})
-
-        with open(unfetched_csv, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=["space", "URL"])
-            writer.writeheader()
-            writer.writerows(unfetched_url)
-        print("Write unfetched URL to UnFetchedURL.csv.")
+        write_unfetched_urls(unfetched_csv)
         write_into_csv(completed_links_file, csv_file)
         raise e
 
     write_into_csv(completed_links_file, csv_file)
 
-    print("SUMMARY OF DOWNLOADED FILE")
-    print(f"Total Download - {len(completed_links_file)}")
+
+def run_concurrent_scraper(config, base_url, base_folder, unfetched_csv, csv_file):
+    from scraper.async_scraper import ConcurrentKBCrawler, HttpFetcher, SeleniumFetcher
+
+    base_folder.mkdir(parents=True, exist_ok=True)
+    if config.scraper_fetcher == "http":
+        fetcher = HttpFetcher(output_format="markdown" if config.scraper_output_format == "markdown" else "html")
+    else:
+        fetcher = SeleniumFetcher(config.scraper_num_sessions, output_format=config.scraper_output_format)
+
+    crawler = ConcurrentKBCrawler(
+        fetcher, base_url, base_folder,
+        data_to_scrape, already_visited_url, visited_space_next_file_number, completed_links_file,
+        num_workers=config.scraper_num_workers, per_host_limit=config.scraper_per_host_limit,
+    )
+
+    try:
+        asyncio.run(crawler.crawl())
+    finally:
+        # URLs that failed or were still queued are kept for the next run.
+        if any(data_to_scrape.values()):
+            write_unfetched_urls(unfetched_csv)
+        write_into_csv(completed_links_file, csv_file)
 
 
 
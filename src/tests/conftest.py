@@ -0,0 +1,10 @@
+import os
+import pathlib
+import sys
+
+SRC_PATH = pathlib.Path(__file__).resolve().parents[1]
+
+# Modules import each other from src, as when running `python src/main.py`.
+sys.path.insert(0, str(SRC_PATH))
+# The default config is read from ../config/config.yaml relative to the working directory, as when running from src.
+os.chdir(SRC_PATH)
@@ -0,0 +1,122 @@
+"""
+Crawls a stand-in knowledge base served by `http.server` on localhost.
+
+    python -m pytest src/tests
+"""
+import asyncio
+import pathlib
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from scraper.async_scraper import ConcurrentKBCrawler, HttpFetcher
+from scraper.html_extract import extract_kb_page
+
+CHILDREN = [f"/kb/child-{i}" for i in range(6)]
+
+
+def render_page(path):
+    """KB page markup with optional closing tags left out, as served by the real site."""
+    links = "".join(f'<li><a href="{child}">{child}</a>' for child in CHILDREN) if path == "/kb/root" else ""
+    return (
+        f"<html><head><title>{path}</title></head><body>"
+        f'<div id="printable_document"><p>Article {path}'
+        f'<ul class="children_container page_tree_container">{links}</ul>'
+        f'<p>Related: <a href="/kb/related">related</a>'
+        f"<table><tr><td>cell<td>cell</table>"
+        f"</div>"
+        f'<div id="footer">Footer <a href="/kb/footer">footer</a></div>'
+        f"</body></html>"
+    )
+
+
+class StandInKBHandler(BaseHTTPRequestHandler):
+    delay = 0.1
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requested.append(self.path)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(self.delay)
+            body = render_page(self.path).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ExtractKBPageTest(unittest.TestCase):
+    def test_optional_closing_tags(self):
+        document_html, title, links = extract_kb_page(render_page("/kb/root"), "http://localhost/kb/root")
+
+        self.assertEqual(title, "/kb/root")
+        self.assertEqual(links, [f"http://localhost{child}" for child in CHILDREN])
+        self.assertIn("Related", document_html)
+        self.assertNotIn("Footer", document_html)
+        self.assertTrue(document_html.endswith("<tr><td>cell</td><td>cell</td></tr></table>"))
+
+
+class ConcurrentKBCrawlerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInKBHandler)
+        self.server.lock = threading.Lock()
+        self.server.requested = []
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.base_path = pathlib.Path(temp_dir.name)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def crawl(self, already_visited_url, per_host_limit=2):
+        crawler = ConcurrentKBCrawler(
+            HttpFetcher(timeout=5), self.base_url, self.base_path,
+            data_to_scrape={"kb": ["/kb/root"]}, already_visited_url=already_visited_url,
+            visited_space_next_file_number={}, completed_links_file=[],
+            num_workers=4, per_host_limit=per_host_limit,
+        )
+        asyncio.run(crawler.crawl())
+        return crawler
+
+    def test_crawls_page_tree_links(self):
+        crawler = self.crawl(set())
+
+        self.assertCountEqual(self.server.requested, ["/kb/root", *CHILDREN])
+        self.assertEqual(crawler.already_visited_url, {self.base_url + path for path in ["/kb/root", *CHILDREN]})
+        self.assertEqual(len(list(self.base_path.glob("kb_*.html"))), 1 + len(CHILDREN))
+        self.assertEqual(crawler.data_to_scrape, {"kb": []})
+
+    def test_per_host_limit(self):
+        self.crawl(set(), per_host_limit=2)
+
+        self.assertEqual(self.server.max_in_flight, 2)
+
+    def test_skips_visited_urls(self):
+        visited = {self.base_url + "/kb/root", self.base_url + CHILDREN[0]}
+        crawler = self.crawl(set(visited))
+
+        # The visited root is still fetched for its links but not saved again; a visited child is not fetched.
+        self.assertCountEqual(self.server.requested, ["/kb/root", *CHILDREN[1:]])
+        self.assertEqual(len(crawler.completed_links_file), len(CHILDREN) - 1)
+        self.assertNotIn(self.base_url + "/kb/root", [row["URL"] for row in crawler.completed_links_file])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+Retrieval cache and semantic answer cache, using a deterministic fake embedding.
+
+    python -m pytest src/tests
+"""
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from model.answer_cache import SemanticAnswerCache
+from model.retrieval_cache import RetrievalCache
+
+
+class RetrievalCacheTest(unittest.TestCase):
+    def test_key_normalizes_query(self):
+        self.assertEqual(RetrievalCache.make_key("  How do I reset my NetID? ", k=5),
+                         RetrievalCache.make_key("how do i reset my netid", k=5))
+        self.assertNotEqual(RetrievalCache.make_key("reset netid", k=5), RetrievalCache.make_key("reset netid", k=10))
+
+    def test_evicts_least_recently_used(self):
+        cache = RetrievalCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_entries_expire(self):
+        cache = RetrievalCache(ttl_seconds=10)
+        with mock.patch("model.retrieval_cache.time.monotonic", return_value=100.0):
+            cache.put("a", 1)
+        with mock.patch("model.retrieval_cache.time.monotonic", return_value=105.0):
+            self.assertEqual(cache.get("a"), 1)
+        with mock.patch("model.retrieval_cache.time.monotonic", return_value=111.0):
+            self.assertIsNone(cache.get("a"))
+
+    def test_cleared_when_index_version_changes(self):
+        version = ["v1"]
+        cache = RetrievalCache(version_fn=lambda: version[0])
+        cache.put("a", 1)
+        version[0] = "v2"
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+
+class SemanticAnswerCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.embedding = DeterministicFakeEmbedding(size=16)
+        self.version = "v1"
+        self.live_ids = {"doc-1", "doc-2"}
+
+    def make_cache(self, **kwargs):
+        return SemanticAnswerCache(
+            self.embedding, threshold=0.95, version_fn=lambda: self.version,
+            documents_exist_fn=lambda ids: set(ids) <= self.live_ids, **kwargs,
+        )
+
+    def test_hit_for_same_question(self):
+        cache = self.make_cache()
+        cache.store("How do I reset my NetID?", "Go to netid.uconn.edu.", ["doc-1"])
+
+        self.assertEqual(cache.lookup("How do I reset my NetID?"), "Go to netid.uconn.edu.")
+        self.assertIsNone(cache.lookup("Where is the library?"))
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_answers_without_documents_are_not_cached(self):
+        cache = self.make_cache()
+        cache.store("Hello", "Hi!", [])
+
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_miss_when_source_documents_are_gone(self):
+        cache = self.make_cache()
+        cache.store("How do I reset my NetID?", "Go to netid.uconn.edu.", ["doc-1"])
+        self.live_ids.discard("doc-1")
+
+        self.assertIsNone(cache.lookup("How do I reset my NetID?"))
+
+    def test_dropped_when_index_version_changes(self):
+        cache = self.make_cache()
+        cache.store("How do I reset my NetID?", "Go to netid.uconn.edu.", ["doc-1"])
+        self.version = "v2"
+
+        self.assertIsNone(cache.lookup("How do I reset my NetID?"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_evicts_beyond_max_entries(self):
+        cache = self.make_cache(max_entries=1)
+        cache.store("How do I reset my NetID?", "Go to netid.uconn.edu.", ["doc-1"])
+        cache.store("Where do I buy a parking permit?", "Online.", ["doc-2"])
+
+        self.assertIsNone(cache.lookup("How do I reset my NetID?"))
+        self.assertEqual(cache.lookup("Where do I buy a parking permit?"), "Online.")
+
+    def test_persisted_entries_are_restored(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        persist_path = pathlib.Path(temp_dir.name) / "answer_cache.sqlite"
+
+        cache = self.make_cache(persist_path=persist_path)
+        cache.store("How do I reset my NetID?", "Go to netid.uconn.edu.", ["doc-1"])
+        cache._connection.close()
+
+        restored = self.make_cache(persist_path=persist_path)
+        self.addCleanup(restored._connection.close)
+        self.assertEqual(restored.lookup("How do I reset my NetID?"), "Go to netid.uconn.edu.")
+
+
+if __name__ == "__main__":
+    unittest.main()
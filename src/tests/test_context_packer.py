@@ -0,0 +1,84 @@
+"""
+Packing retrieved chunks into the answer prompt's token budget.
+
+    python -m pytest src/tests
+"""
+import unittest
+from langchain_core.documents import Document
+from model.context_packer import MIN_TAIL_TOKENS, estimate_tokens, merge_adjacent_chunks, pack_context, truncate_at_sentence
+
+TEXT = " ".join(f"Sentence {i} explains one step of the NetID reset." for i in range(40))
+
+
+def format_block(idx, doc):
+    return f"### Doc {idx}\n{doc.page_content}"
+
+
+def chunk(text, file_name="netid.pdf", start_index=None, doc_id=None):
+    metadata = {"file_name": file_name}
+    if start_index is not None:
+        metadata["start_index"] = start_index
+    return Document(id=doc_id, page_content=text, metadata=metadata)
+
+
+class MergeAdjacentChunksTest(unittest.TestCase):
+    def test_merges_overlapping_chunks_at_best_rank(self):
+        first, second = chunk(TEXT[:300], start_index=0), chunk(TEXT[250:600], start_index=250)
+        other = chunk("Parking permits are sold online.", file_name="parking.pdf")
+
+        merged = merge_adjacent_chunks([other, second, first])
+
+        self.assertEqual([doc.page_content for doc in merged], [other.page_content, TEXT[:600]])
+
+    def test_keeps_chunks_whose_overlap_differs(self):
+        first, second = chunk(TEXT[:300], start_index=0), chunk("x" * 100, start_index=250)
+
+        self.assertEqual(len(merge_adjacent_chunks([first, second])), 2)
+
+
+class PackContextTest(unittest.TestCase):
+    def test_no_budget_keeps_every_chunk(self):
+        docs = [chunk(TEXT, file_name=f"{i}.pdf") for i in range(3)]
+
+        self.assertEqual(pack_context(docs, None, format_block), docs)
+
+    def test_fits_budget_and_truncates_tail_at_sentence(self):
+        docs = [chunk(TEXT[:400], file_name="a.pdf", doc_id="a"), chunk(TEXT, file_name="b.pdf", doc_id="b"),
+                chunk(TEXT, file_name="c.pdf", doc_id="c")]
+        budget = 250
+
+        packed = pack_context(docs, budget, format_block)
+
+        self.assertEqual([doc.id for doc in packed], ["a", "b"])
+        self.assertEqual(packed[0].page_content, TEXT[:400])
+        self.assertTrue(packed[1].page_content.endswith("reset."))
+        self.assertLessEqual(sum(estimate_tokens(format_block(i, doc)) for i, doc in enumerate(packed, start=1)), budget)
+
+    def test_drops_tail_with_little_room(self):
+        docs = [chunk(TEXT[:400], file_name="a.pdf"), chunk(TEXT, file_name="b.pdf")]
+        budget = estimate_tokens(format_block(1, docs[0])) + MIN_TAIL_TOKENS // 2
+
+        self.assertEqual(pack_context(docs, budget, format_block), docs[:1])
+
+    def test_counts_with_given_tokenizer(self):
+        docs = [chunk(TEXT, file_name="a.pdf")]
+
+        def count_words(text):
+            return len(text.split())
+
+        packed = pack_context(docs, 100, format_block, count_tokens=count_words)
+
+        self.assertLessEqual(count_words(format_block(1, packed[0])), 100)
+        self.assertGreater(count_words(packed[0].page_content), 100 - MIN_TAIL_TOKENS)
+
+
+class TruncateAtSentenceTest(unittest.TestCase):
+    def test_cuts_at_last_sentence_end(self):
+        self.assertEqual(truncate_at_sentence("One two. Three four five six.", 3), "One two.")
+
+    def test_cuts_at_word_without_sentence_end(self):
+        self.assertEqual(truncate_at_sentence("alpha beta gamma delta epsilon", 4), "alpha beta ...")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+SimHash near-duplicate detection at ingestion.
+
+    python -m pytest src/tests
+"""
+import unittest
+from langchain_core.documents import Document
+from embedding.dedup import NearDuplicateDetector, simhash
+
+BOILERPLATE = (
+    "Information Technology Services provides support to students, faculty and staff. Contact the Technology "
+    "Support Center by phone or email, or visit us in person during business hours for help with your account, "
+    "wireless network access, software downloads and classroom technology."
+)
+OTHER = (
+    "Parking permits for commuter students are sold online before each semester. Visitors pay at the garage "
+    "entrance, and overnight parking in the surface lots requires a resident permit."
+)
+
+
+def chunk(doc_id, text, url):
+    return doc_id, Document(page_content=text, metadata={"url": url})
+
+
+class SimHashTest(unittest.TestCase):
+    def test_near_identical_texts_are_close(self):
+        edited = BOILERPLATE + " Last updated in May."
+
+        self.assertLessEqual(bin(simhash(BOILERPLATE) ^ simhash(edited)).count("1"), 7)
+        self.assertGreater(bin(simhash(BOILERPLATE) ^ simhash(OTHER)).count("1"), 7)
+
+    def test_normalizes_case_and_whitespace(self):
+        self.assertEqual(simhash(BOILERPLATE), simhash("  " + BOILERPLATE.upper().replace(" ", "\n")))
+
+
+class NearDuplicateDetectorTest(unittest.TestCase):
+    def test_collapses_near_duplicates(self):
+        detector = NearDuplicateDetector(max_distance=7)
+        kept = detector.filter([
+            chunk("a", BOILERPLATE, "https://kb.example.edu/a"),
+            chunk("b", OTHER, "https://kb.example.edu/b"),
+            chunk("c", BOILERPLATE + " Last updated in May.", "https://kb.example.edu/c"),
+        ])
+        kept += detector.filter([chunk("d", BOILERPLATE, "https://kb.example.edu/d")])
+
+        self.assertEqual([doc_id for doc_id, _ in kept], ["a", "b"])
+        self.assertEqual(detector.duplicate_of, {"c": "a", "d": "a"})
+        self.assertEqual(detector.duplicate_sources, {"c": "https://kb.example.edu/c", "d": "https://kb.example.edu/d"})
+        self.assertEqual(detector.get_collapsed_sources(), {
+            "a": ["https://kb.example.edu/a", "https://kb.example.edu/c", "https://kb.example.edu/d"],
+        })
+
+    def test_report(self):
+        detector = NearDuplicateDetector()
+        detector.filter([chunk("a", BOILERPLATE, "u1"), chunk("b", BOILERPLATE, "u2"), chunk("c", OTHER, "u3")])
+
+        report = detector.report(vector_dim=16)
+
+        self.assertEqual(report["chunks_seen"], 3)
+        self.assertEqual(report["chunks_collapsed"], 1)
+        self.assertEqual(report["vector_bytes_saved"], 16 * 4)
+        self.assertEqual(report["most_duplicated"], [{"id": "a", "duplicates": 1, "urls": ["u1", "u2"]}])
+
+
+if __name__ == "__main__":
+    unittest.main()
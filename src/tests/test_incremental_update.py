@@ -0,0 +1,185 @@
+"""
+Incremental re-indexing with the per-file manifest, using a deterministic fake embedding.
+
+    python -m pytest src/tests
+"""
+import json
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+import yaml
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from config import Config
+from embedding.embedding_factory import EmbeddingFactory
+from embedding.processPDF import compute_file_hash, delete_stale_vectors, main_process_pdf, plan_incremental_update
+from embedding.vector_store_factory import VectorStoreFactory
+
+PARKING = "Parking permits are sold online. Students pick them up at the transportation office before the semester starts."
+HOUSING = "Housing applications open in March. Returning students choose rooms by lottery number in April."
+
+
+# Texts embedded as documents during the last ingestion run.
+embedded_texts = []
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    def embed_documents(self, texts):
+        embedded_texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+def write_page(path, url, text):
+    path.write_text(f"---\nurl: {url}\ntitle: {path.stem}\n---\n\n{text}\n")
+
+
+class PlanIncrementalUpdateTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.raw_path = pathlib.Path(temp_dir.name)
+
+    def page(self, name, text):
+        path = self.raw_path / name
+        write_page(path, f"https://kb.example.edu/{path.stem}", text)
+        return path
+
+    def entry(self, path, ids, duplicates=None):
+        return {"hash": compute_file_hash(path), "ids": ids, "duplicates": duplicates or {}, "duplicate_sources": {}}
+
+    def test_changed_and_removed_files(self):
+        unchanged = self.page("a.md", PARKING)
+        changed = self.page("b.md", HOUSING)
+        manifest = {
+            "a.md": self.entry(unchanged, ["a0"]),
+            "b.md": {**self.entry(changed, ["b0", "b1"]), "hash": "outdated"},
+            "c.md": {"hash": "removed", "ids": ["c0"], "duplicates": {}, "duplicate_sources": {}},
+        }
+
+        changed_files, stale_ids, unchanged_entries, file_hashes = plan_incremental_update([unchanged, changed], manifest)
+
+        self.assertEqual(changed_files, [changed])
+        self.assertCountEqual(stale_ids, ["b0", "b1", "c0"])
+        self.assertEqual(unchanged_entries, {"a.md": manifest["a.md"]})
+        self.assertEqual(file_hashes, {"a.md": compute_file_hash(unchanged), "b.md": compute_file_hash(changed)})
+
+    def test_reprocesses_files_collapsed_into_changed_file(self):
+        kept = self.page("a.md", PARKING)
+        duplicate = self.page("b.md", PARKING)
+        other = self.page("c.md", HOUSING)
+        manifest = {
+            "a.md": {**self.entry(kept, ["a0"]), "hash": "outdated"},
+            "b.md": self.entry(duplicate, [], duplicates={"b0": "a0"}),
+            "c.md": self.entry(other, ["c0"]),
+        }
+
+        changed_files, stale_ids, unchanged_entries, _ = plan_incremental_update([kept, duplicate, other], manifest)
+
+        self.assertCountEqual(changed_files, [kept, duplicate])
+        self.assertEqual(stale_ids, ["a0"])
+        self.assertEqual(list(unchanged_entries), ["c.md"])
+
+
+class DeleteStaleVectorsTest(unittest.TestCase):
+    def test_deletes_only_present_ids(self):
+        vector_store = FAISS.from_texts([PARKING, HOUSING], DeterministicFakeEmbedding(size=16), ids=["a0", "b0"])
+
+        delete_stale_vectors(vector_store, ["b0", "missing"])
+
+        self.assertEqual(list(vector_store.index_to_docstore_id.values()), ["a0"])
+        self.assertEqual(vector_store.index.ntotal, 1)
+
+
+class MainProcessPdfTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.data_path = pathlib.Path(temp_dir.name)
+        self.raw_path = self.data_path / "raw"
+        self.raw_path.mkdir()
+        write_page(self.raw_path / "parking.md", "https://kb.example.edu/parking", PARKING)
+        write_page(self.raw_path / "housing.md", "https://kb.example.edu/housing", HOUSING)
+
+        patcher = mock.patch.object(EmbeddingFactory, "get_embeddings_from_config",
+                                    side_effect=lambda config=None: CountingEmbedding(size=16))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_ingestion(self, chunk_size=1000, deduplicate=False):
+        config_path = self.data_path / "config.yaml"
+        config_path.write_text(yaml.safe_dump({
+            "splitter": {"chunk_size": chunk_size, "chunk_overlap": 0},
+            "pdf_processing": {"incremental": True, "dedup": {"enabled": deduplicate}},
+            "vector_store": {"file_name": "index", "docstore": "sqlite"},
+            "data_files": {"default_data_path": str(self.data_path)},
+        }))
+        config = Config(str(config_path))
+        embedded_texts.clear()
+        main_process_pdf(config)
+
+        with open(self.data_path / config.vector_ids_file_name) as file:
+            manifest = json.load(file)
+        vector_store = VectorStoreFactory.load_vector_db_from_local_if_exist(
+            self.data_path / "index", CountingEmbedding(size=16), docstore_type="sqlite")
+        self.addCleanup(vector_store.docstore.close)
+        return manifest, vector_store
+
+    def manifest_ids(self, manifest):
+        return {doc_id for entry in manifest["files"].values() for doc_id in entry["ids"]}
+
+    def test_only_changed_files_are_embedded(self):
+        first_manifest, _ = self.run_ingestion()
+        write_page(self.raw_path / "housing.md", "https://kb.example.edu/housing", HOUSING + " Deposits are refundable.")
+
+        manifest, vector_store = self.run_ingestion()
+
+        self.assertEqual(len(embedded_texts), 1)
+        self.assertIn("Deposits are refundable.", embedded_texts[0])
+        self.assertEqual(manifest["files"]["parking.md"], first_manifest["files"]["parking.md"])
+        self.assertNotEqual(manifest["files"]["housing.md"]["ids"], first_manifest["files"]["housing.md"]["ids"])
+        self.assertEqual(set(vector_store.index_to_docstore_id.values()), self.manifest_ids(manifest))
+
+    def test_removed_file_vectors_are_deleted(self):
+        self.run_ingestion()
+        (self.raw_path / "housing.md").unlink()
+
+        manifest, vector_store = self.run_ingestion()
+
+        self.assertEqual(embedded_texts, [])
+        self.assertEqual(list(manifest["files"]), ["parking.md"])
+        self.assertEqual(set(vector_store.index_to_docstore_id.values()), self.manifest_ids(manifest))
+
+    def test_settings_change_rebuilds(self):
+        self.run_ingestion()
+
+        manifest, vector_store = self.run_ingestion(chunk_size=500)
+
+        self.assertEqual(len(embedded_texts), 2)
+        self.assertEqual(manifest["settings"]["chunk_size"], 500)
+        self.assertEqual(set(vector_store.index_to_docstore_id.values()), self.manifest_ids(manifest))
+
+    def test_collapsed_duplicates_are_reprocessed(self):
+        write_page(self.raw_path / "parking-copy.md", "https://kb.example.edu/parking-copy", PARKING)
+        first_manifest, vector_store = self.run_ingestion(deduplicate=True)
+        # Which of the two copies is kept depends on the order the files are listed in.
+        duplicate_name = next(file_name for file_name, entry in first_manifest["files"].items() if entry["duplicates"])
+        kept_id = next(iter(first_manifest["files"][duplicate_name]["duplicates"].values()))
+        kept_name = next(file_name for file_name, entry in first_manifest["files"].items() if kept_id in entry["ids"])
+        self.assertEqual(len(vector_store.index_to_docstore_id), 2)
+        self.assertIn(f"https://kb.example.edu/{pathlib.Path(duplicate_name).stem}",
+                      vector_store.docstore.search(kept_id).metadata["urls"])
+
+        write_page(self.raw_path / kept_name, f"https://kb.example.edu/{pathlib.Path(kept_name).stem}",
+                   PARKING + " Permits are not refundable.")
+        manifest, vector_store = self.run_ingestion(deduplicate=True)
+
+        # The duplicate's content now lives in its own chunk, written because its file was reprocessed.
+        self.assertEqual(len(manifest["files"][duplicate_name]["ids"]), 1)
+        self.assertEqual(manifest["files"][duplicate_name]["duplicates"], {})
+        self.assertEqual(len(vector_store.index_to_docstore_id), 3)
+        self.assertEqual(set(vector_store.index_to_docstore_id.values()), self.manifest_ids(manifest))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -38,6 +38,11 @@ def setup_logger(config=None):
     logger = logging.getLogger(name)
     logger.setLevel(getattr(logging, config.log_level, logging.INFO))
 
+    # Called again by processes that import the app directly (API workers); keep a single handler per file.
+    if any(isinstance(handler, logging.FileHandler) and handler.baseFilename == os.path.abspath(log_file_path)
+           for handler in logger.handlers):
+        return logger
+
     fh = logging.FileHandler(log_file_path)
     fh.setLevel(getattr(logging, config.log_level, logging.INFO))
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import uuid
+from contextlib import asynccontextmanager
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from config import Config
+from model.model import PipelineFactory, astream_answer
+from utils import get_logger, setup_logger
+
+logger = get_logger()
+
+
+class ChatRequest(BaseModel):
+    message: str
+    # Conversation to continue; a new one is started when it is missing.
+    thread_id: str | None = None
+
+
+class ChatResponse(BaseModel):
+    thread_id: str
+    answer: str
+
+
+def get_thread_config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def create_app(config=None):
+    """
+    HTTP API over the RAG pipeline. The pipeline is built once per worker process, in a
+    background thread started at startup, and shared by all requests; its async nodes let
+    one worker serve many conversations while they wait on the LLM. The server accepts
+    connections while the models load: `/health` answers at once and `/ready` reports
+    the build.
+    """
+    if config is None:
+        config = Config.default_config()
+    # Worker processes spawned by uvicorn import this module without going through main.
+    setup_logger(config)
+
+    def on_pipeline_built(task):
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.error(f"Failed to load the RAG pipeline: {str(task.exception())}")
+            return
+        app.state.pipeline = task.result()
+        logger.info("RAG pipeline loaded, API worker ready.")
+
+    @asynccontextmanager
+    async def lifespan(app):
+        app.state.pipeline = None
+        logger.info("Loading RAG pipeline for the API worker...")
+        app.state.pipeline_task = asyncio.create_task(asyncio.to_thread(PipelineFactory.build_pipeline, config))
+        app.state.pipeline_task.add_done_callback(on_pipeline_built)
+        yield
+        app.state.pipeline_task.cancel()
+
+    app = FastAPI(title=config.app_name, version=str(config.version), lifespan=lifespan)
+
+    def get_pipeline():
+        pipeline = getattr(app.state, "pipeline", None)
+        if pipeline is None:
+            raise HTTPException(status_code=503, detail="Pipeline is not loaded yet")
+        return pipeline
+
+    @app.get("/health")
+    async def health():
+        """Liveness: the process is up."""
+        return {"status": "ok"}
+
+    @app.get("/ready")
+    async def ready():
+        """Readiness: the pipeline is loaded and requests can be served."""
+        task = getattr(app.state, "pipeline_task", None)
+        if task is None or not task.done():
+            return JSONResponse(status_code=503, content={"status": "loading"})
+        if task.cancelled() or task.exception() is not None:
+            detail = "cancelled" if task.cancelled() else str(task.exception())
+            return JSONResponse(status_code=503, content={"status": "failed", "detail": detail})
+        return {"status": "ready"}
+
+    @app.post("/chat", response_model=ChatResponse)
+    async def chat(request: ChatRequest):
+        pipeline = get_pipeline()
+        thread_id = request.thread_id or str(uuid.uuid4())
+        try:
+            state = await pipeline.ainvoke(
+                {"messages": [{ "role": "user", "content": request.message }]},
+                config=get_thread_config(thread_id),
+            )
+        except Exception as e:
+            logger.error(f"Error occurred while answering the chat request of thread {thread_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Error occurred during processing.")
+
+        answer = state["messages"][-1].content
+        return ChatResponse(thread_id=thread_id, answer=answer if isinstance(answer, str) else str(answer))
+
+    @app.post("/chat/stream")
+    async def chat_stream(request: ChatRequest):
+        """
+        Server-sent events: a `token` event per chunk of the reply, then `done` (or `error`).
+        Every event carries the thread_id to use for the next message.
+        """
+        pipeline = get_pipeline()
+        thread_id = request.thread_id or str(uuid.uuid4())
+
+        async def events():
+            try:
+                async for token in astream_answer(pipeline, request.message, get_thread_config(thread_id)):
+                    yield format_sse("token", {"thread_id": thread_id, "text": token})
+            except Exception as e:
+                logger.error(f"Error occurred while streaming the chat request of thread {thread_id}: {str(e)}")
+                yield format_sse("error", {"thread_id": thread_id, "detail": "Error occurred during processing."})
+                return
+            yield format_sse("done", {"thread_id": thread_id})
+
+        return StreamingResponse(events(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    return app
+
+
+def run_api_server(config=None):
+    if config is None:
+        config = Config.default_config()
+
+    logger.info(f"Starting API on {config.api_host}:{config.api_port} with {config.api_workers} worker(s)")
+    # Workers are separate processes, so uvicorn needs an import string; each one calls create_app().
+    uvicorn.run(
+        "web.api:create_app",
+        factory=True,
+        host=config.api_host,
+        port=config.api_port,
+        workers=config.api_workers,
+    )
@@ -2,7 +2,7 @@ import streamlit as st
 import uuid
 import logging
 from config import Config
-from model.model import PipelineFactory
+from model.model import PipelineFactory, stream_answer
 from utils import get_logger
 
 logger = get_logger()
@@ -38,14 +38,7 @@ if logger.level == logging.DEBUG:
 thread_config = {"configurable": {"thread_id": st.session_state.session_token}}
 
 def answer(prompt):
-    for step in RAGpipeline.stream(
-                {"messages": [{ "role": "user", "content": prompt }]},
-                stream_mode="values",
-                config=thread_config,
-                ):
-        message = step["messages"][-1]
-        if message.type == "ai" and not message.tool_calls:
-            return message.content
+    return stream_answer(RAGpipeline, prompt, thread_config)
 
 
 
@@ -70,7 +63,7 @@ if prompt := st.chat_input("Say something"):
     st.session_state.messages.append({"role": "user", "content": prompt})
     
     with st.chat_message("assistant", avatar=role_img["assistant"]):
-        response = answer(prompt)
-        st.markdown(response)
+        # Renders the Markdown incrementally and returns the full text.
+        response = st.write_stream(answer(prompt))
 
     st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file